@@ -1,7 +1,9 @@
 import os
 import time
+import shutil
 import logging
 import yaml
+from datetime import datetime
 from typing import List, Optional
 import psutil
 import pyautogui
@@ -10,6 +12,16 @@ import win32gui
 import win32api
 import win32con
 import configparser
+import numpy as np
+import relax3d_io
+import relax_solver
+import slab_solver
+import residual_check
+import result_cache
+import completion
+import dxf_geometry
+import electrode_grid
+import field_map
 
 # Set up logging
 # logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,6 +39,16 @@ R3D_PATH = config.get('Paths', 'R3D_PATH')
 SOFTWARE_NAMES = ['1_GEOMETRY', '2_initial', '3_convert', '4_clip', '5_exam', '6_divide']
 CONFIG_PATH = 'config_layers.yaml'
 
+def preprocess_cache_key(layers_config: dict, filename: str, option: str, native: bool) -> str:
+    """Result cache key of one divided layer file (DXF bytes, slice entry, exec_cmd and tool version)"""
+    if native:
+        version = result_cache.native_version(result_cache.NATIVE_PREPROCESS_SOURCES)
+    else:
+        version = result_cache.tool_version([os.path.join(R3D_PATH, f"{name}.exe") for name in SOFTWARE_NAMES])
+    slice_name = filename.replace('.dxf', '')
+    return result_cache.preprocess_key(os.path.join(R3D_PATH, filename), layers_config['slices'][slice_name],
+                                       layers_config['options'][option]['exec_cmd'], option, version)
+
 class AutoPre3D:
     def __init__(self, mode: str):
         self.mode = mode
@@ -173,10 +195,33 @@ class AutoPre3D:
             # # Close the application
             win32gui.PostMessage(window_handle, win32con.WM_CLOSE, 0, 0) # 关闭主窗口
 
+    def cached_layer(self, filename: str, option: str, native: bool):
+        """(cache, key, outputs) of the divided layer file of a slice; cache is None when caching is off"""
+        cache = result_cache.get_cache(config)
+        if cache is None or self.mode != 'R':
+            return None, None, None
+        output_path = os.path.join(R3D_PATH, electrode_grid.layer_output_name(filename, option))
+        return cache, preprocess_cache_key(self.config, filename, option, native), \
+            {result_cache.LAYER_FILE: output_path}
+
+    @staticmethod
+    def release_layer(filename: str, option: str):
+        """Remove a layer file hard-linked to a duplicate slice's file, so rewriting it leaves the other intact"""
+        output_path = os.path.join(R3D_PATH, electrode_grid.layer_output_name(filename, option))
+        if os.path.exists(output_path) and os.stat(output_path).st_nlink > 1:
+            os.remove(output_path)
+
     def run(self, filename: str, option: str):
         """Main execution logic"""
         logging.info("Starting automated task")
         name = filename.replace('.dxf', '')
+        if self.mode == 'R':
+            self.release_layer(filename, option)
+        cache, key, outputs = self.cached_layer(filename, option, native=False)
+        if cache and cache.fetch('preprocess', key, outputs):
+            logging.info("Automated task completed")
+            return
+        start_time = time.perf_counter()
 
         self.run_1_geometry(filename)
         self.run_2_initial(option, name)
@@ -191,6 +236,31 @@ class AutoPre3D:
             
             # Run 6_divide with the generated output filename
             self.run_6_divide(output_filename)
+            if cache:
+                cache.store('preprocess', key, outputs, time.perf_counter() - start_time)
+
+        logging.info("Automated task completed")
+
+    def run_native(self, filename: str, option: str):
+        """Native execution logic: DXF reader and rasterizer instead of the WIN32 software"""
+        logging.info("Starting automated task")
+        dxf_path = os.path.join(R3D_PATH, filename)
+
+        if self.mode == 'R': # Run
+            self.release_layer(filename, option)
+            cache, key, outputs = self.cached_layer(filename, option, native=True)
+            if not (cache and cache.fetch('preprocess', key, outputs)):
+                start_time = time.perf_counter()
+                electrode_grid.preprocess_layer(dxf_path, option, self.config, R3D_PATH)
+                if cache:
+                    cache.store('preprocess', key, outputs, time.perf_counter() - start_time)
+        else: # Preview: geometry and electrode count only
+            geometry = dxf_geometry.load_geometry(dxf_path)
+            slice_name = filename.replace('.dxf', '')
+            potentials = self.config['slices'][slice_name]['potential']
+            logging.info(f"{filename}: {len(geometry)} electrode outlines, {len(potentials)} potential markers")
+            if len(geometry) != len(potentials):
+                logging.warning(f"Electrode count of {filename} does not match the potential markers of {slice_name}")
 
         logging.info("Automated task completed")
 
@@ -199,9 +269,14 @@ class AutoPre3D:
 class AutoRe3D:
     """Class to handle automated Relax3D operations"""
     
-    def __init__(self, config_file='config_main.ini'):
-        """Initialize with the config file path"""
+    def __init__(self, config_file='config_main.ini', work_dir: str = None):
+        """Initialize with the config file path.
+
+        relax3d.dat is read from and RELAX3D_V.OUT written to `work_dir`
+        (default: R3D_PATH); the latest solution per area stays in R3D_PATH.
+        """
         self.config = self.load_config(config_file)
+        self.work_dir = work_dir or self.config.get('Paths', 'R3D_PATH', fallback='.')
         self.process = None
         self.relax_process = None
         self.should_terminate = False
@@ -212,11 +287,11 @@ class AutoRe3D:
         config.read(config_file)
         return config
         
-    def run_software(self, path: str) -> subprocess.Popen:
-        """Run the specified software and return the process."""
+    def run_software(self, path: str, cwd: str = None) -> subprocess.Popen:
+        """Run the specified software (in its own folder unless `cwd` is given) and return the process."""
         logging.info(f"Running software: {path}")
         try:
-            self.process = subprocess.Popen(path, cwd=os.path.dirname(path))
+            self.process = subprocess.Popen(path, cwd=cwd or os.path.dirname(path))
             time.sleep(3)  # Wait for the software to start
             return self.process
         except subprocess.SubprocessError as e:
@@ -262,6 +337,49 @@ class AutoRe3D:
         logging.error(f"Timeout waiting for CPU usage to drop (after {timeout} seconds)")
         return False
         
+    def run_phase(self, phase: str, commands: List[str], detector, outputs: List[str], software_name: str,
+                  cpu_threshold: float, check_interval: int, timeout: int) -> bool:
+        """Send the commands of an INIT / ITER / OUTPUT phase and wait until it completes.
+
+        With [Completion] STRATEGY = events, a phase ends as soon as its
+        output files are written, the residual log matches (ITER) or
+        relax2000 exits (OUTPUT). Phases without any of these signals, and
+        STRATEGY = cpu, fall back to waiting for the CPU usage to drop.
+        OUTPUT without events ends when relax2000 exits (see the caller).
+        """
+        use_log = phase == 'ITER'
+        events = detector is not None and bool(outputs or phase == 'OUTPUT' or
+                                                (use_log and detector.log_pattern))
+        if events:
+            detector.start(outputs, use_log)
+        self.exec_cmd(commands)
+        if self.should_terminate:
+            return False
+        if not events and phase == 'OUTPUT':
+            return True
+
+        logging.info(f"Waiting for {phase} process to complete...")
+        start_time = time.perf_counter()
+        if events:
+            reason = detector.wait(timeout)
+            if reason in ('output', 'log') or (reason == 'exit' and phase == 'OUTPUT'):
+                logging.info(f"{phase} process completed ({reason} event after {time.perf_counter() - start_time:.2f} s)")
+                return True
+            if reason == 'exit':
+                logging.error(f"{software_name} exited during {phase}")
+            elif reason == 'timeout':
+                logging.error(f"{phase} process did not complete within {timeout} seconds")
+            else:
+                logging.info("Process termination requested - stopping completion monitoring")
+            return False
+
+        relax_process = self.get_relax2000_process(software_name)
+        if relax_process and self.wait_for_cpu_usage_drop(relax_process, cpu_threshold, check_interval, timeout):
+            logging.info(f"{phase} process completed")
+            return True
+        logging.error(f"{phase} process did not complete within the expected time")
+        return False
+
     def run_relax2000_task(self, option: str):
         """Run the Relax2000 task with the specified option (L or S)."""
         if option not in ['L', 'S']:
@@ -281,49 +399,281 @@ class AutoRe3D:
         output_command = self.config.get(commands_section, 'OUTPUT_COMMAND')
 
         software_path = os.path.join(r3d_path, software_name)
+        output_path = os.path.join(self.work_dir, relax3d_io.RELAX3D_OUT)
 
         logging.info("Starting automated task")
+        cache, key = self.solve_cache(option, 'relax2000', {}, result_cache.tool_version([software_path]))
+        if cache and cache.fetch('solve', key, {relax3d_io.RELAX3D_OUT: output_path}):
+            logging.info("Automated task completed")
+            return self.run_relax2000_checks(option) is not False
+        start_time = time.perf_counter()
 
-        if not self.run_software(software_path):
+        if not self.run_software(software_path, self.work_dir):
             logging.error("Failed to start the software")
             return False
 
-        pyautogui.press('space')
-        time.sleep(3)
-        self.exec_cmd(init_commands)
+        settings = completion.get_completion_settings(self.config)
+        detector = None
+        if settings['strategy'] == 'events':
+            detector = completion.CompletionDetector(self.work_dir, self.process, settings['log_file'],
+                                                     settings['log_pattern'], settings['stable_seconds'],
+                                                     lambda: self.should_terminate)
+        try:
+            pyautogui.press('space')
+            time.sleep(3)
+            for phase, commands in (('INIT', init_commands), ('ITER', [iter_command]), ('OUTPUT', [output_command])):
+                if not self.run_phase(phase, commands, detector, settings['outputs'][phase], software_name,
+                                      cpu_threshold, check_interval, process_timeout):
+                    return False
+        finally:
+            if detector:
+                detector.close()
 
-        if self.should_terminate:
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            logging.error(f"{software_name} did not exit within 30 seconds after OUTPUT, terminating")
+            self.process.terminate()
+
+        logging.info("Automated task completed")
+        checked = self.run_relax2000_checks(option)
+        if checked and cache:
+            cache.store('solve', key, {relax3d_io.RELAX3D_OUT: output_path}, time.perf_counter() - start_time)
+        return checked is not False
+
+    def run_relax2000_checks(self, option: str) -> Optional[bool]:
+        """Verify, keep and differentiate relax2000's RELAX3D_V.OUT when [Solver] RELAX2000_CHECKS is on.
+
+        These stages read RELAX3D_V.OUT with the layout assumed by
+        relax3d_io.read_potential, which has not been confirmed against
+        relax2000 output; when it is off (default) or the file cannot be
+        read, the output is left as written. Returns None when the stages
+        were skipped, otherwise whether they passed.
+        """
+        if not relax2000_checks(self.config):
+            logging.info("relax2000 output kept as written ([Solver] RELAX2000_CHECKS is off)")
+            return self.record_unchecked("not checked ([Solver] RELAX2000_CHECKS is off)")
+        try:
+            return self.run_verify_stage(option, 'relax2000') and self.save_latest_solution(option) and \
+                self.run_field_stage(option)
+        except (ValueError, OSError) as e:
+            logging.warning(f"Could not read the relax2000 output ({e}); kept as written without checks")
+            return self.record_unchecked(f"could not be read ({e})")
+
+    def record_unchecked(self, reason: str) -> None:
+        """Record relax2000 as the producer of an unchecked RELAX3D_V.OUT, which the rename step publishes as written"""
+        output_path = os.path.join(self.work_dir, relax3d_io.RELAX3D_OUT)
+        if os.path.exists(output_path):
+            residual_check.record_unchecked(output_path, 'relax2000', reason)
+        return None
+    
+    def run_native_task(self, option: str, method: str = 'sor', nested: bool = False, symmetry: str = None,
+                        warm_start: bool = False):
+        """Solve relax3d.dat in-process ('sor', 'parallel', 'multigrid' or 'slab') instead of running relax2000.
+
+        With `nested` (S only) the outer faces and initial guess come from
+        the latest L solution, so only the fine region is relaxed.
+        `symmetry` ('off', 'auto' or 'on') overrides [Solver] SYMMETRY.
+        With `warm_start` the last solution of the same area is the initial
+        guess (it takes precedence over `nested`). 'slab' keeps the potential
+        in a memory-mapped file within [Solver] MEMORY_BUDGET_MB (grids larger
+        than RAM); it supports warm starts and a symmetry plane at z = 0, not nesting.
+        """
+        if option not in ['L', 'S']:
+            logging.error("Invalid option. Please choose L or S.")
             return False
 
-        logging.info("Waiting for INIT process to complete...")
-        relax_process = self.get_relax2000_process(software_name)
-        if relax_process and self.wait_for_cpu_usage_drop(relax_process, cpu_threshold, check_interval, process_timeout):
-            logging.info("INIT process completed")
-            self.exec_cmd([iter_command])
+        r3d_path = self.config.get('Paths', 'R3D_PATH')
+        dat_path = os.path.join(self.work_dir, relax3d_io.RELAX3D_DAT)
+        output_path = os.path.join(self.work_dir, relax3d_io.RELAX3D_OUT)
 
-            if self.should_terminate:
+        if not os.path.exists(dat_path):
+            logging.error(f"relax3d.dat not found: {dat_path}")
+            return False
+
+        logging.info("Starting automated task")
+        spec = relax3d_io.load_grid_spec(option, self.config)
+        settings = relax_solver.get_solver_settings(self.config)
+        if symmetry:
+            settings['symmetry'] = symmetry
+        logging.info(f"Grid: {spec}")
+        try:
+            relax_solver.check_median_plane(spec, settings['symmetry'])
+        except ValueError as e:
+            logging.error(str(e))
+            return False
+
+        previous_path = relax3d_io.latest_solution_path(r3d_path, option)
+        if warm_start and not os.path.exists(previous_path):
+            logging.warning(f"No previous {option} solution ({previous_path}); starting cold")
+            warm_start = False
+
+        coarse_path = None
+        if nested and option == 'S' and not warm_start:
+            coarse_path = self.config.get('Solver', 'NESTED_SOURCE', fallback='').strip() or \
+                relax3d_io.latest_solution_path(r3d_path, 'L')
+            if not os.path.exists(coarse_path):
+                logging.error(f"No L solution to nest in: {coarse_path} (solve the L area first)")
                 return False
-                
-            logging.info("Waiting for ITER process to complete...")
-            if self.wait_for_cpu_usage_drop(relax_process, cpu_threshold, check_interval, process_timeout):
-                logging.info("ITER process completed")
-                self.exec_cmd([output_command])
-            else:
-                logging.error("ITER process did not complete within the expected time")
+            try:
+                relax_solver.check_nested_source(coarse_path, relax3d_io.load_grid_spec('L', self.config))
+            except ValueError as e:
+                logging.error(str(e))
                 return False
+
+        # Cold and nested in-memory solves are cached (warm starts depend on the last solution)
+        cache, key = None, None
+        if method != 'slab' and not warm_start:
+            key_settings = {name: value for name, value in settings.items() if name != 'workers'}
+            cache, key = self.solve_cache(option, method, key_settings,
+                                          result_cache.native_version(result_cache.NATIVE_SOLVE_SOURCES), coarse_path)
+            if cache and cache.fetch('solve', key, {relax3d_io.RELAX3D_OUT: output_path}):
+                logging.info("Automated task completed")
+                return self.run_verify_stage(option, method) and \
+                    self.save_latest_solution(option, stats=cache.entry(key).get('stats') or {'method': method}) and \
+                    self.run_field_stage(option)
+
+        if method == 'slab':
+            if nested and option == 'S':
+                logging.warning("The out-of-core engine solves the full grid: nested option ignored")
+            return self.run_out_of_core_task(option, dat_path, spec, settings, previous_path if warm_start else None)
+        if warm_start:
+            potential, _, stats = relax_solver.solve_warm(dat_path, spec, previous_path, settings, method,
+                                                          lambda: self.should_terminate,
+                                                          relax_solver.load_solution_stats(previous_path))
+        elif coarse_path:
+            coarse_spec = relax3d_io.load_grid_spec('L', self.config)
+            potential, _, stats = relax_solver.solve_nested(dat_path, spec, coarse_path, coarse_spec, settings,
+                                                            method, lambda: self.should_terminate)
         else:
-            logging.error("INIT process did not complete within the expected time")
+            potential, _, stats = relax_solver.solve_relax3d_dat(dat_path, spec, settings, method,
+                                                                 lambda: self.should_terminate)
+        if self.should_terminate:
             return False
 
+        relax3d_io.write_potential(output_path, potential)
+        logging.info(f"Potential written to {output_path}")
+        logging.info("Automated task completed")
+        if not self.run_verify_stage(option, method):
+            return False
+        if cache:
+            cache.store('solve', key, {relax3d_io.RELAX3D_OUT: output_path}, stats['seconds'], {'stats': stats})
+        return self.save_latest_solution(option, potential, stats) and self.run_field_stage(option)
+
+    def solve_cache(self, option: str, engine: str, settings: dict, version: str, source_path: str = None):
+        """Result cache and key of a solve of relax3d.dat in the work folder ((None, None) when caching is off)"""
+        cache = result_cache.get_cache(self.config)
+        dat_path = os.path.join(self.work_dir, relax3d_io.RELAX3D_DAT)
+        if cache is None or not os.path.exists(dat_path):
+            return None, None
+        commands = [self.config.get(f'Commands-{option}', name, fallback='')
+                    for name in ('INIT_COMMANDS', 'ITER_COMMAND', 'OUTPUT_COMMAND')]
+        return cache, result_cache.solve_key(dat_path, commands, engine, settings, version, source_path)
+
+    def run_out_of_core_task(self, option: str, dat_path: str, spec: relax3d_io.GridSpec, settings: dict,
+                             previous_path: str = None) -> bool:
+        """Solve with the out-of-core slab solver and write the outputs without loading the grid"""
+        slab_settings = slab_solver.get_slab_settings(self.config)
+        if not self.config.get('Solver', 'SLAB_WORK_DIR', fallback='').strip():
+            slab_settings['work_dir'] = self.work_dir
         try:
-            self.process.wait(timeout=30)
-        except subprocess.TimeoutExpired:
-            logging.error(f"{software_name} did not exit within 30 seconds after OUTPUT, terminating")
-            self.process.terminate()
+            potential, stats = slab_solver.solve_relax3d_dat_out_of_core(dat_path, spec, settings, slab_settings,
+                                                                         option, previous_path,
+                                                                         lambda: self.should_terminate)
+            if self.should_terminate:
+                return False
+            output_path = os.path.join(self.work_dir, relax3d_io.RELAX3D_OUT)
+            relax3d_io.write_potential(output_path, potential)
+            logging.info(f"Potential written to {output_path}")
+            logging.info("Automated task completed")
+            fixed = np.load(slab_solver.work_paths(slab_settings['work_dir'], option)[1], mmap_mode='r')
+            planes = slab_solver.slab_planes(spec.shape, slab_settings['memory_budget'], 1)
+            saved = self.run_verify_stage(option, 'slab', potential, fixed, planes) and \
+                self.save_latest_solution(option, potential, stats)
+            del potential, fixed
+        finally:
+            slab_solver.remove_work_files(slab_settings['work_dir'], option)
+
+        if spec.nx * spec.ny * spec.nz * slab_solver.FIELD_BYTES_PER_POINT > slab_settings['memory_budget']:
+            logging.info("E field cache skipped: the grid does not fit in the memory budget")
+            return saved
+        return saved and self.run_field_stage(option)
+
+    def run_verify_stage(self, option: str, engine: str, potential=None, fixed=None, planes: int = None) -> bool:
+        """Check RELAX3D_V.OUT against relax3d.dat before it is kept or renamed ([Solver] VERIFY).
+
+        The report (RELAX3D_V.verify.json) is what the rename step checks;
+        it records `engine` as the producer. Memory-mapped solves pass their
+        `potential` and `fixed` arrays, which are checked `planes` z planes
+        at a time.
+        """
+        if not self.config.getboolean('Solver', 'VERIFY', fallback=True):
+            return True
 
-        logging.info("Automated task completed")
+        output_path = os.path.join(self.work_dir, relax3d_io.RELAX3D_OUT)
+        spec = relax3d_io.load_grid_spec(option, self.config)
+        tolerance = residual_check.get_verify_tolerance(self.config)
+        logging.info("Verifying the potential against relax3d.dat...")
+        if potential is None:
+            dat_path = os.path.join(self.work_dir, relax3d_io.RELAX3D_DAT)
+            report = residual_check.verify_files(dat_path, output_path, spec, tolerance, engine)
+        else:
+            report = residual_check.verify_potential(potential, fixed, spec.spacing, tolerance, planes=planes)
+            report.update({'digest': relax3d_io.file_digest(output_path), 'engine': engine})
+            residual_check.save_report(output_path, report)
+        residual_check.log_report(report)
+        return report['ok']
+
+    def save_latest_solution(self, option: str, potential=None, stats: dict = None) -> bool:
+        """Keep a binary copy of the solution per area (RELAX3D_V_L.r3dg / RELAX3D_V_S.r3dg) and its solve stats"""
+        r3d_path = self.config.get('Paths', 'R3D_PATH')
+        output_path = os.path.join(self.work_dir, relax3d_io.RELAX3D_OUT)
+        spec = relax3d_io.load_grid_spec(option, self.config)
+        if potential is None:
+            if not os.path.exists(output_path):
+                logging.error(f"{relax3d_io.RELAX3D_OUT} not found: {output_path}")
+                return False
+            potential = relax3d_io.read_potential(output_path, spec)
+
+        latest_path = relax3d_io.latest_solution_path(r3d_path, option)
+        previous_stats = relax_solver.load_solution_stats(latest_path)
+        # Replaced in one step: concurrent jobs of the same area never leave a mixed file
+        temp_path = f"{latest_path}.{os.path.basename(self.work_dir)}.tmp"
+        relax3d_io.write_grid(temp_path, potential, spec, dtype=np.float32)
+        os.replace(temp_path, latest_path)
+        record = dict(stats or self.relax2000_stats(option))
+        # Only called once the verify stage passed (it passes without checking when VERIFY is off)
+        record['verified'] = self.config.getboolean('Solver', 'VERIFY', fallback=True)
+        relax_solver.save_solution_stats(latest_path, record, previous_stats)
+        logging.info(f"Latest {option} solution kept in {latest_path}")
         return True
-    
+
+    def relax2000_stats(self, option: str) -> dict:
+        """Solve record of a relax2000 run: OPT 1 in INIT_COMMANDS makes z = 0 a symmetry plane"""
+        init_commands = self.config.get(f'Commands-{option}', 'INIT_COMMANDS', fallback='')
+        return {'method': 'relax2000', 'symmetric': 'OPT 1' in [command.strip() for command in init_commands.split(',')]}
+
+    def run_field_stage(self, option: str) -> bool:
+        """Compute E = -grad V of RELAX3D_V.OUT once and cache it next to it ([Solver] E_FIELD).
+
+        The cache only speeds up later field map queries, so a failure is
+        logged as a warning and never fails the task (always returns True).
+        """
+        if not self.config.getboolean('Solver', 'E_FIELD', fallback=False):
+            return True
+
+        output_path = os.path.join(self.work_dir, relax3d_io.RELAX3D_OUT)
+        if not os.path.exists(output_path):
+            logging.warning(f"E field not cached: {relax3d_io.RELAX3D_OUT} not found ({output_path})")
+            return True
+
+        logging.info("Computing E field from the potential...")
+        try:
+            field_map.cache_field(output_path, relax3d_io.load_grid_spec(option, self.config))
+        except (ValueError, OSError, MemoryError) as e:
+            logging.warning(f"E field not cached ({e}); field maps will differentiate the potential instead")
+        return True
+
     def terminate(self):
         """Request termination of the running task"""
         self.should_terminate = True
@@ -342,11 +692,84 @@ class AutoRe3D:
             except:
                 pass
 
+def relax2000_checks(config: configparser.ConfigParser) -> bool:
+    """Whether relax2000 output goes through the verify, keep-solution and E field stages"""
+    return config.getboolean('Solver', 'RELAX2000_CHECKS', fallback=False)
+
+
+def publish_outputs(model: str, label: str, config: configparser.ConfigParser, source_dir: str = '.',
+                    log=None) -> bool:
+    """Rename RELAX3D_V.OUT / convert.dat to their cyc_* names and move them to TARGET_OUTPUT_PATH.
+
+    `log(message, level)` receives the progress messages (default: logging).
+    Returns False if the potential did not pass the residual check, which
+    is not required of output recorded as relax2000's (see
+    residual_check.recorded_engine) unless RELAX2000_CHECKS is on.
+    """
+    log = log or (lambda message, level: logging.log(level, message))
+    current_date = datetime.now().strftime("%m%d")
+    cyclotron_type = config.get('Paths', 'CYCLOTRON_TYPE')
+    target_directory = config.get('Paths', 'TARGET_OUTPUT_PATH')
+    log(f"Using Model: {model}, Label: {label}, Date: {current_date}", logging.INFO)
+
+    file_mappings = {
+        relax3d_io.RELAX3D_OUT: f"cyc_{cyclotron_type}_C{model}{current_date}{label}.efld",
+        "convert.dat": f"cyc_{cyclotron_type}_C{model}{current_date}{label}.head"
+    }
+    potential_path = os.path.join(source_dir, relax3d_io.RELAX3D_OUT)
+
+    # Refuse to publish a field that did not pass the residual check, judged by the engine that produced it
+    unchecked = not relax2000_checks(config) and residual_check.recorded_engine(potential_path) == 'relax2000'
+    if config.getboolean('Solver', 'VERIFY', fallback=True) and not unchecked:
+        verified, message = residual_check.check_verified(potential_path)
+        if not verified:
+            log(f"{message}; files not renamed (check it with: python residual_check.py {model})", logging.ERROR)
+            return False
+        log(message, logging.INFO)
+
+    os.makedirs(target_directory, exist_ok=True)
+    for old_name, new_name in file_mappings.items():
+        old_path = os.path.join(source_dir, old_name)
+        if os.path.exists(old_path):
+            new_path = os.path.join(source_dir, new_name)
+            os.rename(old_path, new_path)
+            log(f"Renamed '{old_path}' to '{new_path}'", logging.INFO)
+
+            target_path = os.path.join(target_directory, new_name)
+            shutil.move(new_path, target_path)
+            log(f"Moved '{new_path}' to '{target_path}'", logging.INFO)
+        else:
+            log(f"File '{old_path}' not found", logging.ERROR)
+
+    # Keep the cached E field with its field map (same content hash, new stem)
+    efld_name = file_mappings[relax3d_io.RELAX3D_OUT]
+    for cache_path in field_map.gradient_cache_files(potential_path):
+        cache_name = os.path.basename(cache_path)
+        new_cache_name = os.path.splitext(efld_name)[0] + cache_name[len("RELAX3D_V"):]
+        target_path = os.path.join(target_directory, new_cache_name)
+        shutil.move(cache_path, target_path)
+        log(f"Moved E field '{cache_path}' to '{target_path}'", logging.INFO)
+
+    # Keep the verification report with its field map as well
+    report_name = residual_check.report_path(potential_path)
+    if os.path.exists(report_name):
+        target_path = os.path.join(target_directory, residual_check.report_path(efld_name))
+        shutil.move(report_name, target_path)
+        log(f"Moved verification report '{report_name}' to '{target_path}'", logging.INFO)
+    return True
+
+
 # Main function for direct script execution
 def main():
     option = input("Choose option (L or S): ").upper()
     auto_re3d = AutoRe3D()
-    auto_re3d.run_relax2000_task(option)
+    engine = auto_re3d.config.get('Solver', 'ENGINE', fallback='relax2000')
+    if engine == 'relax2000':
+        auto_re3d.run_relax2000_task(option)
+    else:
+        nested = auto_re3d.config.getboolean('Solver', 'NESTED', fallback=False)
+        warm_start = auto_re3d.config.getboolean('Solver', 'WARM_START', fallback=False)
+        auto_re3d.run_native_task(option, engine, nested, warm_start=warm_start)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import configparser
+from typing import Dict, List, Tuple
+import numpy as np
+import relax3d_io
+import relax_solver
+import residual_check
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Configuration
+MANIFEST_NAME = 'basis.json'
+BASIS_DTYPE = np.float32
+
+
+def basis_folder(r3d_path: str, option: str) -> str:
+    """Folder holding the basis fields of the L or S area"""
+    return os.path.join(r3d_path, f'basis_{option}')
+
+
+def basis_method(config: configparser.ConfigParser) -> str:
+    """In-process method used for the basis solves (multigrid unless sor is configured)"""
+    engine = config.get('Solver', 'ENGINE', fallback='multigrid')
+    return engine if engine in ('sor', 'multigrid') else 'multigrid'
+
+
+def compute_basis_fields(dat_path: str, spec: relax3d_io.GridSpec, settings: dict, output_dir: str,
+                         method: str = 'multigrid', should_terminate=lambda: False) -> dict:
+    """Solve once per electrode group at unit potential and store the basis fields.
+
+    The electrode potentials in relax3d.dat are the markers from
+    config_layers.yaml, so every distinct marker value is one group. Basis
+    field g is the solution with group g at 1 V and every other electrode
+    (and the outer faces, except a z = 0 symmetry plane) at 0 V; by
+    linearity any voltage assignment is the weighted sum of the basis fields.
+    """
+    fixed, markers = relax3d_io.read_electrodes(dat_path, spec)
+    labels = np.unique(markers[fixed])
+    logging.info(f"Found {len(labels)} electrode groups in {dat_path}: {', '.join(f'{label:g}' for label in labels)}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    files = {}
+    for label in labels:
+        if should_terminate():
+            return None
+        logging.info(f"Solving basis field for electrode group {label:g}")
+        potential = np.where(fixed & (markers == label), 1.0, 0.0)
+        potential, _ = relax_solver.solve_grid(potential, fixed, spec, settings, method, should_terminate)
+
+        file_name = f"basis_{label:g}.npy"
+        np.save(os.path.join(output_dir, file_name), potential.astype(BASIS_DTYPE))
+        files[f'{label:g}'] = file_name
+
+    manifest = {
+        'source': os.path.abspath(dat_path),
+        'source_sha256': relax3d_io.file_digest(dat_path),
+        'dims': [spec.nx, spec.ny, spec.nz],
+        'spacing': list(spec.spacing),
+        'origin': list(spec.origin),
+        'method': method,
+        'files': files,
+    }
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    logging.info(f"Basis fields stored in {output_dir}")
+    return manifest
+
+
+def load_basis_fields(output_dir: str) -> Tuple[dict, Dict[str, np.ndarray]]:
+    """Open the stored basis fields memory-mapped, keyed by group label"""
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'r') as file:
+        manifest = json.load(file)
+    fields = {label: np.load(os.path.join(output_dir, file_name), mmap_mode='r')
+              for label, file_name in manifest['files'].items()}
+    return manifest, fields
+
+
+def parse_voltages(text: str) -> Dict[str, float]:
+    """Parse a voltage assignment such as '1=45000, 0=0' (group label = volts)"""
+    voltages = {}
+    for item in text.replace(';', ',').split(','):
+        if not item.strip():
+            continue
+        label, _, volts = item.partition('=')
+        if not volts:
+            raise ValueError(f"Expected label=volts, got '{item.strip()}'")
+        voltages[f'{float(label):g}'] = float(volts)
+    return voltages
+
+
+def compose_potential(fields: Dict[str, np.ndarray], voltages: Dict[str, float]) -> np.ndarray:
+    """Weighted sum of basis fields; groups missing from `voltages` keep their marker value as volts"""
+    potential = None
+    for label, basis in fields.items():
+        volts = voltages.get(label, float(label))
+        if potential is None:
+            potential = np.zeros(basis.shape, dtype=np.float64)
+        if volts:
+            potential += volts * basis
+    return potential
+
+
+def compose_to_file(output_dir: str, voltages: Dict[str, float], output_path: str, dat_path: str = None,
+                    tolerance: float = residual_check.DEFAULT_VERIFY_TOLERANCE) -> np.ndarray:
+    """Compose a new potential from stored basis fields and write it as RELAX3D_V.OUT.
+
+    relax3d.dat (`dat_path`, default: the one the basis was computed from)
+    must be unchanged since then. The result is verified against the
+    composed electrode voltages, not the markers in relax3d.dat, and the
+    report is saved next to it for the rename step.
+    """
+    manifest, fields = load_basis_fields(output_dir)
+    unknown = set(voltages) - set(fields)
+    if unknown:
+        raise ValueError(f"No basis field for electrode groups: {', '.join(sorted(unknown))}")
+
+    dat_path = dat_path or manifest['source']
+    if not os.path.exists(dat_path):
+        raise ValueError(f"{dat_path} not found: the composed potential cannot be verified")
+    if relax3d_io.file_digest(dat_path) != manifest['source_sha256']:
+        raise ValueError(f"{dat_path} changed since the basis fields were computed; recompute them first")
+
+    potential = compose_potential(fields, voltages)
+    relax3d_io.write_potential(output_path, potential)
+    assignment = ', '.join(f"{label}={voltages.get(label, float(label)):g} V" for label in fields)
+    logging.info(f"Composed potential ({assignment}) written to {output_path}")
+
+    spec = relax3d_io.GridSpec(manifest['dims'], manifest['spacing'], manifest['origin'])
+    fixed, markers = relax3d_io.read_electrodes(dat_path, spec)
+    values = np.zeros(spec.shape)
+    for label in fields:
+        values[fixed & (markers == float(label))] = voltages.get(label, float(label))
+    report = residual_check.verify_potential(potential, fixed, spec.spacing, tolerance, values)
+    report.update({'potential': os.path.abspath(output_path), 'electrodes': os.path.abspath(dat_path),
+                   'voltages': {label: voltages.get(label, float(label)) for label in fields},
+                   'digest': relax3d_io.file_digest(output_path), 'engine': 'basis'})
+    residual_check.save_report(output_path, report)
+    residual_check.log_report(report)
+    return potential
+
+
+# Main function for direct script execution
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Electrode basis fields for instant voltage recalibration")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    compute_parser = subparsers.add_parser('compute', help="Solve one unit-potential field per electrode group")
+    compute_parser.add_argument('option', choices=['L', 'S'])
+
+    compose_parser = subparsers.add_parser('compose', help="Write RELAX3D_V.OUT for a voltage assignment")
+    compose_parser.add_argument('option', choices=['L', 'S'])
+    compose_parser.add_argument('voltages', help="Group voltages, e.g. '1=45000, 0=0'")
+    compose_parser.add_argument('--output', default=None, help="Output path (default: R3D_PATH/RELAX3D_V.OUT)")
+
+    for sub in (compute_parser, compose_parser):
+        sub.add_argument('--config', default='config_main.ini')
+    args = parser.parse_args(argv)
+
+    config = relax_solver.load_config(args.config)
+    r3d_path = config.get('Paths', 'R3D_PATH', fallback='.')
+    dat_path = os.path.join(r3d_path, relax3d_io.RELAX3D_DAT)
+    output_dir = basis_folder(r3d_path, args.option)
+
+    if args.command == 'compute':
+        spec = relax3d_io.load_grid_spec(args.option, config)
+        settings = relax_solver.get_solver_settings(config)
+        compute_basis_fields(dat_path, spec, settings, output_dir, basis_method(config))
+    else:
+        output_path = args.output or os.path.join(r3d_path, relax3d_io.RELAX3D_OUT)
+        compose_to_file(output_dir, parse_voltages(args.voltages), output_path, dat_path,
+                        residual_check.get_verify_tolerance(config))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,488 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import shutil
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Tuple
+import yaml
+import relax3d_io
+import dxf_geometry
+import electrode_grid
+import result_cache
+import build_manifest
+import scratch_jobs
+import auto_relax3d
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Configuration
+STAGES = ['preprocess', 'divide', 'combine', 'solve', 'rename', 'collect']
+DEFAULT_WORKERS = 4
+DESKTOP = 'desktop'      # WIN32 software driven through its windows and the keyboard: one at a time
+
+
+class Task:
+    """One node of the batch DAG"""
+
+    def __init__(self, name: str, stage: str, func, args: tuple = (), deps: List[str] = (),
+                 resources: List[str] = (), process: bool = False):
+        self.name = name
+        self.stage = stage
+        self.func = func
+        self.args = args
+        self.deps = list(deps)
+        self.resources = list(resources)
+        self.process = process  # CPU-bound native step: run in the process pool
+        self.status = 'pending'  # pending, running, done, failed or skipped
+        self.start = None
+        self.end = None
+        self.error = None
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start if self.start is not None and self.end is not None else 0.0
+
+
+def slice_key(slice_name: str) -> float:
+    """Numeric position of a slice (L2.5 -> 2.5), the order of generate_file_list"""
+    return float(slice_name[1:])
+
+
+def batch_slices(layers_config: dict, dxf_dir: str, slices: List[str] = None) -> List[str]:
+    """Slices of config_layers.yaml (or the given ones) that have a DXF file, in layer order"""
+    names = slices or list(layers_config['slices'])
+    unknown = [name for name in names if name not in layers_config['slices']]
+    if unknown:
+        raise ValueError(f"Slices not in config_layers.yaml: {', '.join(unknown)}")
+    available = []
+    for name in sorted(names, key=slice_key):
+        if os.path.exists(os.path.join(dxf_dir, f"{name}.dxf")):
+            available.append(name)
+        else:
+            logging.warning(f"{name}.dxf not found in {dxf_dir}, slice skipped")
+    return available
+
+
+def preprocess_slice(dxf_path: str) -> int:
+    """Parse a DXF file once; the divide steps of every area read it back from the geometry cache"""
+    return len(dxf_geometry.load_geometry(dxf_path))
+
+
+def divide_slice(filename: str, option: str, native: bool):
+    """Divided layer file of one slice and area (result cache, then the native or WIN32 preprocessing)"""
+    if native:
+        auto_relax3d.AutoPre3D('R').run_native(filename, option)
+    else:
+        auto_relax3d.AutoPre3D('R').run(filename, option)
+
+
+def link_layer(source_path: str, target_path: str):
+    """Layer file of a duplicate slice: hard link (or copy) of the file built for an identical slice"""
+    how = relax3d_io.link_or_copy(source_path, target_path)
+    logging.info(f"{os.path.basename(target_path)} {how} from {os.path.basename(source_path)}")
+
+
+def duplicate_slices(records: Dict[str, dict], slices: List[str]) -> Dict[str, str]:
+    """Map each slice to the first earlier slice with the same DXF content, zmin, zmax and potential"""
+    leaders, duplicates = {}, {}
+    for name in slices:
+        group = (records[name]['dxf_digest'], records[name]['entry_digest'])
+        if group in leaders:
+            duplicates[name] = leaders[group]
+        else:
+            leaders[group] = name
+    return duplicates
+
+
+def combine_area(r3d_path: str, file_list: List[str], work_dir: str, stage_files: List[str],
+                 cache: result_cache.ResultCache = None, key: str = None) -> str:
+    """Stage the scratch folder of one area and merge its divided layer files into relax3d.dat there.
+
+    relax3d.dat is restored from the cache if possible.
+    """
+    scratch_jobs.stage_job(r3d_path, work_dir, stage_files)
+    outputs = {relax3d_io.RELAX3D_DAT: os.path.join(work_dir, relax3d_io.RELAX3D_DAT)}
+    if cache and cache.fetch('combine', key, outputs):
+        return outputs[relax3d_io.RELAX3D_DAT]
+    start_time = time.perf_counter()
+    output_path = relax3d_io.combine_layer_files(r3d_path, file_list, outputs[relax3d_io.RELAX3D_DAT])
+    if cache:
+        cache.store('combine', key, outputs, time.perf_counter() - start_time)
+    return output_path
+
+
+def solve_scratch(config_file: str, option: str, work_dir: str, *args):
+    """Native solve of one area's scratch folder in a pool process (see scratch_jobs.solve_job)"""
+    if not scratch_jobs.solve_job(config_file, option, work_dir, *args):
+        raise RuntimeError(f"Relax3D {option} run did not complete")
+
+
+def build_pipeline(option_list: List[str], slices: List[str], r3d_path: str,
+                   native: bool = True, label: str = '', rebuild: Dict[str, List[str]] = None,
+                   duplicates: Dict[str, Dict[str, str]] = None, scratch: dict = None,
+                   nested: bool = False) -> Dict[str, Task]:
+    """Build the DAG: preprocess -> divide -> combine -> solve -> rename (label given) or collect.
+
+    `rebuild` limits the divide step of each area to the given slices (the
+    others' layer files are up to date); every slice is still combined.
+    `duplicates` maps, per area, a slice to an identical one built in the
+    same batch: its layer file is linked from that one instead.
+
+    Native slices are parsed once and divided for each area in the process
+    pool. WIN32 runs drive one window at a time, so every slice and area
+    is a single desktop node (1_GEOMETRY .. 6_divide). Each area is
+    combined, solved and published in its own folder under `scratch`
+    ['scratch_dir'], so L and S solve side by side; only a nested S solve
+    waits for the L solve. Without a label the outputs are collected into
+    R3D_PATH as RELAX3D_V_L.OUT / RELAX3D_V_S.OUT. Solve nodes are filled
+    in by BatchPipeline.
+    """
+    tasks = {}
+
+    def add(task: Task):
+        tasks[task.name] = task
+
+    rebuild = rebuild or {option: slices for option in option_list}
+    scratch = scratch or {'scratch_dir': os.path.join(r3d_path, scratch_jobs.DEFAULT_SCRATCH_DIR),
+                          'stage_files': scratch_jobs.DEFAULT_STAGE_FILES}
+    duplicates = duplicates or {option: {} for option in option_list}
+    if native:
+        for name in [name for name in slices
+                     if any(name in rebuild[option] and name not in duplicates[option] for option in option_list)]:
+            add(Task(f"preprocess:{name}", 'preprocess', preprocess_slice,
+                     (os.path.join(r3d_path, f"{name}.dxf"),), process=True))
+
+    for option in option_list:
+        divides = []
+        for name in rebuild[option]:
+            if name in duplicates[option]:
+                leader = duplicates[option][name]
+                paths = [os.path.join(r3d_path, electrode_grid.layer_output_name(f"{slice_name}.dxf", option))
+                         for slice_name in (leader, name)]
+                add(Task(f"divide:{option}:{name}", 'divide', link_layer, tuple(paths), [f"divide:{option}:{leader}"]))
+            else:
+                add(Task(f"divide:{option}:{name}", 'divide', divide_slice, (f"{name}.dxf", option, native),
+                         [f"preprocess:{name}"] if native else [], [] if native else [DESKTOP], process=native))
+            divides.append(f"divide:{option}:{name}")
+
+        file_list = [electrode_grid.layer_output_name(f"{name}.dxf", option) for name in slices]
+        work_dir = os.path.join(scratch['scratch_dir'], option)
+        add(Task(f"combine:{option}", 'combine', combine_area,
+                 (r3d_path, file_list, work_dir, scratch['stage_files']), divides))
+        nest = ["solve:L"] if nested and option == 'S' and 'L' in option_list else []
+        add(Task(f"solve:{option}", 'solve', None, (option, work_dir), [f"combine:{option}"] + nest))
+        if label:
+            add(Task(f"rename:{option}", 'rename', None, (option, label, work_dir), [f"solve:{option}"]))
+        else:
+            add(Task(f"collect:{option}", 'collect', scratch_jobs.collect_outputs, (work_dir, r3d_path, option),
+                     [f"solve:{option}"]))
+    return tasks
+
+
+def topological_order(tasks: Dict[str, Task]) -> List[Task]:
+    """Tasks ordered so that every task comes after its dependencies"""
+    order, state = [], {}
+
+    def visit(name: str):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError(f"Dependency cycle through {name}")
+        state[name] = 'visiting'
+        for dep in tasks[name].deps:
+            visit(dep)
+        state[name] = 'done'
+        order.append(tasks[name])
+
+    for name in tasks:
+        visit(name)
+    return order
+
+
+def critical_path(tasks: Dict[str, Task]) -> Tuple[List[Task], float]:
+    """Longest chain of dependent tasks by measured duration, and its length in seconds"""
+    finish, previous = {}, {}
+    for task in topological_order(tasks):
+        deps = [dep for dep in task.deps if dep in finish]
+        before = max(deps, key=lambda dep: finish[dep], default=None)
+        finish[task.name] = task.duration + (finish[before] if before else 0.0)
+        previous[task.name] = before
+    if not finish:
+        return [], 0.0
+    name = max(finish, key=finish.get)
+    length = finish[name]
+    path = []
+    while name:
+        path.append(tasks[name])
+        name = previous[name]
+    return path[::-1], length
+
+
+def stage_summary(tasks: Dict[str, Task]) -> List[dict]:
+    """Per stage: task count, summed task time and the wall span from first start to last end"""
+    summary = []
+    for stage in STAGES:
+        timed = [task for task in tasks.values() if task.stage == stage and task.start is not None]
+        if not timed:
+            continue
+        summary.append({'stage': stage, 'tasks': len(timed),
+                        'failed': sum(task.status == 'failed' for task in timed),
+                        'busy': sum(task.duration for task in timed),
+                        'span': max(task.end for task in timed) - min(task.start for task in timed)})
+    return summary
+
+
+def log_summary(tasks: Dict[str, Task], wall: float):
+    """Log per-stage timing and the critical path of a finished batch"""
+    logging.info(f"Batch finished in {wall:.1f} s")
+    for row in stage_summary(tasks):
+        failed = f", {row['failed']} failed" if row['failed'] else ''
+        logging.info(f"   {row['stage']:<10} {row['tasks']:3d} tasks, {row['busy']:8.1f} s task time, "
+                     f"{row['span']:8.1f} s wall{failed}")
+    path, length = critical_path(tasks)
+    if path:
+        logging.info(f"Critical path: {length:.1f} s of {wall:.1f} s wall "
+                     f"({length / wall if wall else 0.0:.0%}); the batch cannot finish faster than this")
+        for task in path:
+            logging.info(f"   {task.name:<24} {task.duration:8.1f} s")
+    skipped = [task.name for task in tasks.values() if task.status == 'skipped']
+    if skipped:
+        logging.warning(f"Not run: {', '.join(skipped)}")
+
+
+class BatchPipeline:
+    """Run every slice of config_layers.yaml through preprocess .. rename for the given areas"""
+
+    def __init__(self, option_list: List[str], slices: List[str] = None, native: bool = True,
+                 engine: str = 'relax2000', label: str = '', nested: bool = False, symmetry: str = None,
+                 warm_start: bool = False, workers: int = DEFAULT_WORKERS, config_file: str = 'config_main.ini',
+                 changed_only: bool = False):
+        self.config_file = config_file
+        self.config = auto_relax3d.load_config(config_file)
+        self.r3d_path = self.config.get('Paths', 'R3D_PATH')
+        with open(auto_relax3d.CONFIG_PATH, 'r') as file:
+            self.layers_config = yaml.safe_load(file)
+        self.engine = engine
+        self.nested = nested
+        self.symmetry = symmetry
+        self.warm_start = warm_start
+        self.workers = max(1, workers)
+        self.should_terminate = False
+        self.stop_event = None  # Stops the solves running in pool processes
+        self.active = []  # AutoRe3D instances of the running solve nodes
+        self.lock = threading.Lock()
+
+        self.slices = batch_slices(self.layers_config, self.r3d_path, slices)
+
+        # Layer files whose DXF and YAML entry match the build manifest are up to date
+        self.manifest = build_manifest.load_manifest(self.r3d_path)
+        self.records = {}
+        rebuild = {}
+        self.duplicates = {}
+        for option in option_list:
+            stale, self.records[option] = build_manifest.stale_slices(
+                self.manifest, self.layers_config, self.r3d_path, self.r3d_path, option, self.slices,
+                'native' if native else 'win32')
+            rebuild[option] = stale if changed_only else self.slices
+            self.duplicates[option] = duplicate_slices(self.records[option], rebuild[option])
+            for name, leader in self.duplicates[option].items():
+                logging.info(f"{option} {name}: same DXF and slice entry as {leader}, built once")
+        if changed_only:
+            for option in option_list:
+                logging.info(f"{option}: {len(rebuild[option])} of {len(self.slices)} slices to rebuild")
+            option_list = [option for option in option_list if rebuild[option]]
+            if not option_list:
+                logging.info("Every layer file is up to date, nothing to rebuild")
+        self.scratch = scratch_jobs.get_scratch_settings(self.config)
+        self.solve_slots = scratch_jobs.max_parallel_jobs(self.scratch['max_jobs'],
+                                                          scratch_jobs.processes_per_job(engine, self.config))
+        self.tasks = build_pipeline(option_list, self.slices, self.r3d_path, native, label, rebuild,
+                                    self.duplicates, self.scratch, nested)
+        self.cache = result_cache.get_cache(self.config)
+        for task in self.tasks.values():
+            if task.stage == 'combine' and self.cache:
+                option = task.name.split(':')[1]
+                key = result_cache.combine_key([auto_relax3d.preprocess_cache_key(self.layers_config, f"{name}.dxf",
+                                                                                   option, native)
+                                                for name in self.slices])
+                task.args += (self.cache, key)
+            elif task.stage == 'solve' and engine == 'relax2000':
+                task.func = self.solve_area
+                task.resources.append(DESKTOP)
+            elif task.stage == 'solve':
+                task.func = solve_scratch
+                task.args += (engine, nested, symmetry, warm_start)
+                task.args = (config_file,) + task.args
+                task.process = True
+            elif task.stage == 'rename':
+                task.func = self.rename_area
+
+    def solve_area(self, option: str, work_dir: str):
+        """Solve relax3d.dat of one area's scratch folder with relax2000 (driven from this process)"""
+        auto_re3d = auto_relax3d.AutoRe3D(self.config_file, work_dir)
+        with self.lock:
+            self.active.append(auto_re3d)
+        try:
+            result = auto_re3d.run_relax2000_task(option)
+        finally:
+            with self.lock:
+                self.active.remove(auto_re3d)
+        if not result:
+            raise RuntimeError(f"Relax3D {option} run did not complete")
+
+    def rename_area(self, option: str, label: str, work_dir: str):
+        """Rename the solved files of one area and move them to TARGET_OUTPUT_PATH"""
+        if not auto_relax3d.publish_outputs(option, label, self.config, work_dir):
+            raise RuntimeError(f"Outputs of {option} not published")
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    def update_manifest(self):
+        """Record the inputs of every layer file this batch built"""
+        for task in self.tasks.values():
+            if task.stage == 'divide' and task.status == 'done':
+                _, option, name = task.name.split(':', 2)
+                build_manifest.record_built(self.manifest, option, name, self.records[option][name])
+        build_manifest.save_manifest(self.r3d_path, self.manifest)
+
+    def log_duplicates(self):
+        """Log the layer files linked from identical slices and the divide time that saved"""
+        linked = [task for task in self.tasks.values() if task.func is link_layer and task.status == 'done']
+        if linked:
+            saved = sum(self.tasks[task.deps[0]].duration for task in linked)
+            logging.info(f"Duplicate slices: {len(linked)} layer files linked instead of built, ~{saved:.1f} s saved")
+
+    def describe(self):
+        """Log the DAG without running it"""
+        logging.info(f"Batch of {len(self.slices)} slices: {', '.join(self.slices)}")
+        for task in topological_order(self.tasks):
+            constraints = f" [{', '.join(task.resources)}]" if task.resources else ''
+            logging.info(f"   {task.name:<24} <- {', '.join(task.deps) or '-'}{constraints}")
+
+    def terminate(self):
+        """Start no further tasks and stop the running solves"""
+        self.should_terminate = True
+        logging.info("Batch termination requested")
+        if self.stop_event is not None:
+            self.stop_event.set()
+        with self.lock:
+            for auto_re3d in self.active:
+                auto_re3d.terminate()
+
+    def run(self) -> bool:
+        """Run the DAG, starting every task whose dependencies are done and whose resources are free.
+
+        Up to `workers` tasks run at once: native preprocess / divide / solve
+        in a process pool, the rest (WIN32 automation, combine, relax2000,
+        rename) in threads. At most `solve_slots` solves run at once, so the
+        solver processes fit the cores. A failed task skips everything that
+        depends on it.
+        """
+        order = topological_order(self.tasks)
+        pending = list(order)
+        running = {}
+        held = set()
+        batch_start = time.perf_counter()
+        started = time.time()
+        threads = ThreadPoolExecutor(max_workers=self.workers)
+        processes = ProcessPoolExecutor(max_workers=self.workers) if any(task.process for task in order) else None
+        manager = None
+        if any(task.process and task.stage == 'solve' for task in order):
+            manager = multiprocessing.Manager()
+            self.stop_event = manager.Event()
+            for task in order:
+                if task.process and task.stage == 'solve':
+                    task.args += (self.stop_event,)
+        try:
+            while pending or running:
+                for task in list(pending):
+                    if any(self.tasks[dep].status in ('failed', 'skipped') for dep in task.deps):
+                        task.status = 'skipped'
+                        pending.remove(task)
+                        logging.warning(f"{task.name} skipped (a dependency did not complete)")
+
+                if not self.should_terminate:
+                    for task in list(pending):
+                        if len(running) >= self.workers:
+                            break
+                        if task.stage == 'solve' and \
+                                sum(other.stage == 'solve' for other in running.values()) >= self.solve_slots:
+                            continue
+                        if (all(self.tasks[dep].status == 'done' for dep in task.deps)
+                                and not held.intersection(task.resources)):
+                            held.update(task.resources)
+                            pending.remove(task)
+                            task.status = 'running'
+                            task.start = time.perf_counter() - batch_start
+                            logging.info(f"▶ {task.name}")
+                            executor = processes if task.process else threads
+                            running[executor.submit(task.func, *task.args)] = task
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    task.end = time.perf_counter() - batch_start
+                    held.difference_update(task.resources)
+                    try:
+                        future.result()
+                        task.status = 'done'
+                        logging.info(f"✔ {task.name} ({task.duration:.1f} s)")
+                    except Exception as e:
+                        task.status = 'failed'
+                        task.error = str(e)
+                        logging.error(f"{task.name} failed: {e}")
+        finally:
+            for task in pending:
+                task.status = 'skipped'
+            threads.shutdown(wait=True)
+            if processes:
+                processes.shutdown(wait=True, cancel_futures=True)
+            if manager:
+                manager.shutdown()
+                self.stop_event = None
+
+        self.update_manifest()
+        log_summary(self.tasks, time.perf_counter() - batch_start)
+        self.log_duplicates()
+        if self.cache:
+            self.cache.log_stats(since=started)
+        return all(task.status == 'done' for task in self.tasks.values())
+
+
+# Main function for direct script execution
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Preprocess, divide, combine, solve and rename all slices")
+    parser.add_argument('--areas', nargs='+', choices=['L', 'S'], default=['L', 'S'],
+                        help="Areas to build, in order (default: L S)")
+    parser.add_argument('--config', default='config_main.ini')
+    parser.add_argument('--slices', nargs='+', default=None, help="Slices of config_layers.yaml (default: all)")
+    parser.add_argument('--label', default='', help="Rename and move the results with this label (default: keep)")
+    parser.add_argument('--engine', default=None, choices=['relax2000', 'sor', 'parallel', 'multigrid', 'slab'],
+                        help="Solver (default: [Solver] ENGINE)")
+    parser.add_argument('--win32', action='store_true', help="Preprocess with the WIN32 software instead of natively")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Tasks run at once")
+    parser.add_argument('--changed', action='store_true',
+                        help="Rebuild only slices whose DXF or YAML entry changed since the last build, then re-combine")
+    parser.add_argument('--dry-run', action='store_true', help="List the tasks and their dependencies only")
+    args = parser.parse_args(argv)
+
+    config = auto_relax3d.load_config(args.config)
+    engine = args.engine or config.get('Solver', 'ENGINE', fallback='relax2000')
+    pipeline = BatchPipeline(args.areas, args.slices, not args.win32, engine, args.label,
+                             config.getboolean('Solver', 'NESTED', fallback=False), None,
+                             config.getboolean('Solver', 'WARM_START', fallback=False),
+                             args.workers, args.config, args.changed)
+    pipeline.describe()
+    if args.dry_run:
+        return 0
+    return 0 if pipeline.run() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
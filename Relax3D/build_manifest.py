@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import shutil
+import logging
+import argparse
+import tempfile
+import configparser
+from typing import Dict, List, Tuple
+import yaml
+import relax3d_io
+import electrode_grid
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Configuration
+MANIFEST_NAME = 'build_manifest.json'  # In R3D_PATH, next to the divided layer files it describes
+
+
+def manifest_path(r3d_path: str) -> str:
+    return os.path.join(r3d_path, MANIFEST_NAME)
+
+
+def load_manifest(r3d_path: str) -> dict:
+    """Build manifest of R3D_PATH ({area: {slice: record}}, empty if never built)"""
+    path = manifest_path(r3d_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def save_manifest(r3d_path: str, manifest: dict):
+    """Write the manifest atomically (a crash never leaves a half-written file)"""
+    path = manifest_path(r3d_path)
+    # Unique temporary name, so concurrent batches never write the same file
+    temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(temp_fd, 'w') as file:
+            json.dump(manifest, file, indent=2, sort_keys=True)
+        if os.path.exists(path):
+            shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def entry_digest(slice_config: dict, exec_cmd: list) -> str:
+    """Digest of what the YAML contributes to a layer file: zmin, zmax, potential and the area's exec_cmd.
+
+    Numbers are normalized to float, so re-saving 0 as 0.0 does not count as a change.
+    """
+    entry = [float(slice_config['zmin']), float(slice_config['zmax']),
+             [float(value) for value in slice_config['potential']], exec_cmd]
+    return hashlib.sha256(json.dumps(entry).encode('utf-8')).hexdigest()
+
+
+def dxf_state(dxf_path: str, previous: dict = None) -> dict:
+    """mtime, size and content hash of a DXF; the hash is reused while mtime and size are unchanged"""
+    stat = os.stat(dxf_path)
+    if previous and previous.get('dxf_mtime') == stat.st_mtime_ns and previous.get('dxf_size') == stat.st_size:
+        digest = previous['dxf_digest']
+    else:
+        digest = relax3d_io.file_digest(dxf_path)
+    return {'dxf_mtime': stat.st_mtime_ns, 'dxf_size': stat.st_size, 'dxf_digest': digest}
+
+
+def slice_record(layers_config: dict, dxf_dir: str, slice_name: str, option: str, backend: str,
+                 previous: dict = None) -> dict:
+    """Current inputs of one slice and area, in the form stored in the manifest"""
+    record = dxf_state(os.path.join(dxf_dir, f"{slice_name}.dxf"), previous)
+    record.update({'entry_digest': entry_digest(layers_config['slices'][slice_name],
+                                                layers_config['options'][option]['exec_cmd']),
+                   'backend': backend,
+                   'output': electrode_grid.layer_output_name(f"{slice_name}.dxf", option)})
+    return record
+
+
+def stale_reason(record: dict, previous: dict, output_dir: str) -> str:
+    """Why a slice must be rebuilt ('' if its layer file is up to date)"""
+    if not previous:
+        return "never built"
+    if not os.path.exists(os.path.join(output_dir, record['output'])):
+        return f"{record['output']} missing"
+    if record['dxf_digest'] != previous.get('dxf_digest'):
+        return "DXF changed"
+    if record['entry_digest'] != previous.get('entry_digest'):
+        return "slice entry or exec_cmd changed"
+    if record['backend'] != previous.get('backend'):
+        return f"built with the {previous.get('backend')} backend"
+    return ''
+
+
+def stale_slices(manifest: dict, layers_config: dict, dxf_dir: str, output_dir: str, option: str,
+                 slices: List[str], backend: str) -> Tuple[List[str], Dict[str, dict]]:
+    """Slices of one area whose layer file is out of date, and the current records of all slices"""
+    stale, records = [], {}
+    built = manifest.get(option, {})
+    for slice_name in slices:
+        previous = built.get(slice_name)
+        records[slice_name] = slice_record(layers_config, dxf_dir, slice_name, option, backend, previous)
+        reason = stale_reason(records[slice_name], previous, output_dir)
+        if reason:
+            logging.info(f"{option} {slice_name}: {reason}")
+            stale.append(slice_name)
+    return stale, records
+
+
+def record_built(manifest: dict, option: str, slice_name: str, record: dict):
+    """Store the inputs a layer file was just built from"""
+    manifest.setdefault(option, {})[slice_name] = dict(record, built=time.time())
+
+
+# Main function for direct script execution
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="List the slices whose layer files are out of date")
+    parser.add_argument('--areas', nargs='+', choices=['L', 'S'], default=['L', 'S'])
+    parser.add_argument('--config', default='config_main.ini')
+    parser.add_argument('--layers', default='config_layers.yaml')
+    parser.add_argument('--win32', action='store_true', help="Compare against the WIN32 backend")
+    args = parser.parse_args(argv)
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    r3d_path = config.get('Paths', 'R3D_PATH')
+    with open(args.layers, 'r') as file:
+        layers_config = yaml.safe_load(file)
+    manifest = load_manifest(r3d_path)
+    slices = [name for name in layers_config['slices'] if os.path.exists(os.path.join(r3d_path, f"{name}.dxf"))]
+
+    for option in args.areas:
+        stale, _ = stale_slices(manifest, layers_config, r3d_path, r3d_path, option, slices,
+                                'win32' if args.win32 else 'native')
+        logging.info(f"{option}: {len(stale)} of {len(slices)} slices out of date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+import os
+import re
+import sys
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+import logging
+import argparse
+import subprocess
+import configparser
+from typing import Dict, List, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Configuration
+TICK = 0.05                     # Max seconds between checks of process exit, log and termination
+DEFAULT_STABLE_SECONDS = 0.5    # An output unchanged this long counts as complete (when its close is not seen)
+PHASES = ('INIT', 'ITER', 'OUTPUT')
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+
+class PollingWatcher:
+    """Fallback watcher: wakes up every `timeout`; the caller re-checks the files"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def wait(self, timeout: float) -> List[Tuple[str, int]]:
+        time.sleep(max(timeout, 0.0))
+        return []
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify on a directory through libc (no extra package)"""
+
+    def __init__(self, directory: str):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout: float) -> List[Tuple[str, int]]:
+        """Block until something changes in the directory or `timeout` passes; returns (name, mask) events"""
+        ready, _, _ = select.select([self.fd], [], [], max(timeout, 0.0))
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        events, offset = [], 0
+        while offset < len(data):
+            _, mask, _, length = IN_EVENT_HEADER.unpack_from(data, offset)
+            offset += IN_EVENT_HEADER.size
+            events.append((data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace'), mask))
+            offset += length
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ChangeNotificationWatcher:
+    """Windows directory change notification (pywin32)"""
+
+    def __init__(self, directory: str):
+        import win32con
+        import win32file
+        import win32event
+        self.win32file, self.win32event = win32file, win32event
+        self.handle = win32file.FindFirstChangeNotification(
+            directory, False, win32con.FILE_NOTIFY_CHANGE_FILE_NAME | win32con.FILE_NOTIFY_CHANGE_SIZE |
+            win32con.FILE_NOTIFY_CHANGE_LAST_WRITE)
+
+    def wait(self, timeout: float) -> List[Tuple[str, int]]:
+        """Block until something changes in the directory or `timeout` passes (names are not reported)"""
+        result = self.win32event.WaitForSingleObject(self.handle, int(max(timeout, 0.0) * 1000))
+        if result != self.win32event.WAIT_OBJECT_0:
+            return []
+        self.win32file.FindNextChangeNotification(self.handle)
+        return [('', 0)]
+
+    def close(self):
+        self.win32file.FindCloseChangeNotification(self.handle)
+
+
+def open_watcher(directory: str, polling: bool = False):
+    """Best available watcher for a directory: inotify, Windows change notification, else polling"""
+    if not polling:
+        for watcher_class in (InotifyWatcher, ChangeNotificationWatcher):
+            try:
+                return watcher_class(directory)
+            except (OSError, ImportError, AttributeError):
+                continue
+    return PollingWatcher(directory)
+
+
+def process_exited(process) -> bool:
+    """Whether a subprocess.Popen or psutil.Process has ended"""
+    if process is None:
+        return False
+    if hasattr(process, 'poll'):
+        return process.poll() is not None
+    try:
+        return not process.is_running() or process.status() == 'zombie'
+    except Exception:
+        return True
+
+
+class CompletionDetector:
+    """Detects the end of a relax2000 phase from output files, process exit and an optional residual log.
+
+    Call start() with the files the phase writes before sending its
+    command, then wait(). A file counts as written once it differs from
+    its state at start(); it is complete when its writer closes it
+    (inotify) or it stays unchanged for `stable_seconds`.
+    """
+
+    def __init__(self, directory: str, process=None, log_path: str = None, log_pattern: str = None,
+                 stable_seconds: float = DEFAULT_STABLE_SECONDS, should_terminate=lambda: False,
+                 polling: bool = False):
+        self.directory = directory
+        self.process = process
+        self.log_path = log_path
+        self.log_pattern = re.compile(log_pattern) if log_pattern else None
+        self.stable_seconds = stable_seconds
+        self.should_terminate = should_terminate
+        self.watcher = open_watcher(directory, polling)
+        self.outputs = []
+        self.baseline = {}
+        self.log_offset = 0
+
+    def _state(self, name: str):
+        try:
+            stat = os.stat(os.path.join(self.directory, name))
+            return stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return None
+
+    def start(self, outputs: List[str], use_log: bool = False):
+        """Record the state of the phase's output files (and the end of the log) before its command is sent"""
+        self.outputs = list(outputs)
+        self.baseline = {name: self._state(name) for name in self.outputs}
+        self.use_log = use_log and self.log_pattern is not None and self.log_path is not None
+        self.log_offset = os.path.getsize(self.log_path) if self.use_log and os.path.exists(self.log_path) else 0
+
+    def log_done(self) -> bool:
+        """Whether text appended to the log since start() matches the completion pattern"""
+        if not self.use_log or not os.path.exists(self.log_path):
+            return False
+        if os.path.getsize(self.log_path) <= self.log_offset:
+            return False
+        with open(self.log_path, 'r', errors='replace') as file:
+            file.seek(self.log_offset)
+            text = file.read()
+        # Keep an incomplete last line for the next check
+        complete = text[:text.rfind('\n') + 1]
+        self.log_offset += len(complete.encode('utf-8', 'replace'))
+        return bool(self.log_pattern.search(complete))
+
+    def wait(self, timeout: float) -> str:
+        """Block until the phase ends. Returns why: 'output', 'log', 'exit', 'timeout' or 'terminated'"""
+        deadline = time.monotonic() + timeout
+        changed_at: Dict[str, Tuple[object, float]] = {}
+        closed = set()
+        while True:
+            if self.should_terminate():
+                return 'terminated'
+            if self.use_log and self.log_done():
+                return 'log'
+            now = time.monotonic()
+            complete = bool(self.outputs)
+            for name in self.outputs:
+                state = self._state(name)
+                if state is None or state == self.baseline[name]:
+                    complete = False
+                    continue
+                if name in closed:
+                    continue
+                if changed_at.get(name, (None,))[0] != state:
+                    changed_at[name] = (state, now)
+                if now - changed_at[name][1] < self.stable_seconds:
+                    complete = False
+            if complete:
+                return 'output'
+            if process_exited(self.process):
+                return 'exit'
+            if now >= deadline:
+                return 'timeout'
+            for name, mask in self.watcher.wait(min(TICK, deadline - now)):
+                if mask & IN_CLOSE_WRITE and name in self.outputs:
+                    closed.add(name)
+
+    def close(self):
+        self.watcher.close()
+
+
+def get_completion_settings(config: configparser.ConfigParser) -> dict:
+    """[Completion] section of config_main.ini (all keys optional)"""
+    log_file = config.get('Completion', 'LOG_FILE', fallback='').strip()
+    return {
+        'strategy': config.get('Completion', 'STRATEGY', fallback='events').strip().lower(),
+        'outputs': {phase: [name.strip() for name in config.get('Completion', f'{phase}_OUTPUTS',
+                                                                fallback='').split(',') if name.strip()]
+                    for phase in PHASES},
+        'stable_seconds': config.getfloat('Completion', 'STABLE_SECONDS', fallback=DEFAULT_STABLE_SECONDS),
+        'log_file': log_file or None,
+        'log_pattern': config.get('Completion', 'ITER_LOG_PATTERN', fallback='').strip() or None,
+    }
+
+
+# Main function for direct script execution
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Measure how fast the end of a write is detected "
+                                                 "(a child process writes a file, closes it, then exits)")
+    parser.add_argument('--folder', default='.')
+    parser.add_argument('--polling', action='store_true', help="Use the polling fallback instead of file events")
+    parser.add_argument('--stable', type=float, default=DEFAULT_STABLE_SECONDS)
+    parser.add_argument('--linger', type=float, default=2.0, help="Seconds the writer lives after closing the file")
+    args = parser.parse_args(argv)
+
+    name = 'completion_probe.out'
+    writer = ("import sys, time\n"
+              "with open(sys.argv[1], 'w') as file:\n"
+              "    for _ in range(5):\n"
+              "        file.write('x' * 100000); file.flush(); time.sleep(0.1)\n"
+              "print(repr(time.time()), flush=True)\n"
+              "time.sleep(float(sys.argv[2]))\n")
+    process = subprocess.Popen([sys.executable, '-c', writer, os.path.join(args.folder, name), str(args.linger)],
+                               stdout=subprocess.PIPE, text=True)
+    detector = CompletionDetector(args.folder, process, stable_seconds=args.stable, polling=args.polling)
+    try:
+        detector.start([name])
+        reason = detector.wait(30)
+        detected = time.time()
+        closed = float(process.stdout.readline())
+        logging.info(f"{type(detector.watcher).__name__}: '{reason}' detected {(detected - closed) * 1000:.0f} ms "
+                     f"after the writer closed the file")
+    finally:
+        detector.close()
+        process.wait()
+        os.remove(os.path.join(args.folder, name))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
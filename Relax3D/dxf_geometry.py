@@ -0,0 +1,274 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from typing import Dict, List, Tuple
+import numpy as np
+import relax3d_io
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Configuration
+GEOMETRY_CACHE_DIR = '.geometry_cache'
+PARSER_VERSION = 1             # Bump to invalidate cached geometry after parser changes
+ARC_STEP_DEGREES = 2.0         # Max angle per straight segment when flattening arcs and circles
+JOIN_TOLERANCE = 1e-6          # Endpoints closer than this are joined into one outline
+SUPPORTED_ENTITIES = ('LINE', 'LWPOLYLINE', 'ARC', 'CIRCLE')
+
+
+class PolygonSet:
+    """Electrode outlines stored as one vertex array plus per-polygon offsets.
+
+    Polygon i is vertices[offsets[i]:offsets[i + 1]] (implicitly closed), in
+    the order the outlines first appear in the DXF ENTITIES section, which
+    is the order of the potential markers in config_layers.yaml.
+    """
+
+    def __init__(self, vertices: np.ndarray, offsets: np.ndarray, layers: List[str] = None):
+        self.vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.layers = list(layers) if layers is not None else [''] * (len(self.offsets) - 1)
+
+    @classmethod
+    def from_polygons(cls, polygons: List[np.ndarray], layers: List[str] = None) -> 'PolygonSet':
+        offsets = np.zeros(len(polygons) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(polygon) for polygon in polygons])
+        vertices = np.concatenate(polygons) if polygons else np.empty((0, 2))
+        return cls(vertices, offsets, layers)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        return self.vertices[self.offsets[index]:self.offsets[index + 1]]
+
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """(xmin, ymin, xmax, ymax) over all outlines"""
+        xmin, ymin = self.vertices.min(axis=0)
+        xmax, ymax = self.vertices.max(axis=0)
+        return (xmin, ymin, xmax, ymax)
+
+    def save(self, file_path: str):
+        np.savez(file_path, vertices=self.vertices, offsets=self.offsets, layers=np.array(self.layers))
+
+    @classmethod
+    def load(cls, file_path: str) -> 'PolygonSet':
+        with np.load(file_path) as data:
+            return cls(data['vertices'], data['offsets'], data['layers'].tolist())
+
+    def __repr__(self):
+        return f"PolygonSet({len(self)} polygons, {len(self.vertices)} vertices)"
+
+
+def _read_pairs(file_path: str) -> List[Tuple[int, str]]:
+    """Read the (group code, value) pairs of an ASCII DXF file"""
+    with open(file_path, 'r', errors='replace') as file:
+        lines = file.read().splitlines()
+    return [(int(lines[i].strip()), lines[i + 1].strip()) for i in range(0, len(lines) - 1, 2)]
+
+
+def _entities(pairs: List[Tuple[int, str]]):
+    """Yield (entity type, [(code, value), ...]) for the ENTITIES section"""
+    in_entities = False
+    current_type, current_codes = None, []
+    for index, (code, value) in enumerate(pairs):
+        if code == 0:
+            if current_type is not None:
+                yield current_type, current_codes
+                current_type, current_codes = None, []
+            if value == 'SECTION' and index + 1 < len(pairs) and pairs[index + 1] == (2, 'ENTITIES'):
+                in_entities = True
+            elif value == 'ENDSEC':
+                in_entities = False
+            elif in_entities:
+                current_type = value
+        elif current_type is not None:
+            current_codes.append((code, value))
+
+
+def _arc_points(cx: float, cy: float, radius: float, start_deg: float, sweep_deg: float) -> np.ndarray:
+    """Flatten an arc into points, start and end included"""
+    steps = max(int(np.ceil(abs(sweep_deg) / ARC_STEP_DEGREES)), 1)
+    angles = np.radians(start_deg + np.linspace(0.0, sweep_deg, steps + 1))
+    return np.column_stack((cx + radius * np.cos(angles), cy + radius * np.sin(angles)))
+
+
+def _bulge_points(p0: np.ndarray, p1: np.ndarray, bulge: float) -> np.ndarray:
+    """Points of a bulged LWPOLYLINE segment from p0 to p1, p1 excluded"""
+    chord = p1 - p0
+    length = np.hypot(*chord)
+    if bulge == 0.0 or length == 0.0:
+        return p0[None, :]
+    sweep = 4.0 * np.arctan(bulge)
+    radius = length / (2.0 * np.sin(sweep / 2.0))
+    # Center lies on the chord bisector, on the left for positive (counter-clockwise) bulge
+    midpoint = (p0 + p1) / 2.0
+    normal = np.array([-chord[1], chord[0]]) / length
+    center = midpoint + normal * radius * np.cos(sweep / 2.0)
+    start = np.degrees(np.arctan2(p0[1] - center[1], p0[0] - center[0]))
+    return _arc_points(center[0], center[1], abs(radius), start, np.degrees(sweep))[:-1]
+
+
+def _lwpolyline(codes: List[Tuple[int, str]]) -> Tuple[np.ndarray, bool]:
+    """Vertices (bulges flattened) and closed flag of an LWPOLYLINE"""
+    closed = False
+    vertices, bulges = [], []
+    for code, value in codes:
+        if code == 70:
+            closed = bool(int(value) & 1)
+        elif code == 10:
+            vertices.append([float(value), 0.0])
+            bulges.append(0.0)
+        elif code == 20 and vertices:
+            vertices[-1][1] = float(value)
+        elif code == 42 and bulges:
+            bulges[-1] = float(value)
+
+    vertices = np.array(vertices, dtype=np.float64)
+    if not any(bulges):
+        return vertices, closed
+
+    count = len(vertices)
+    segments = count if closed else count - 1
+    points = [_bulge_points(vertices[i], vertices[(i + 1) % count], bulges[i]) for i in range(segments)]
+    if not closed:
+        points.append(vertices[-1:])
+    return np.concatenate(points), closed
+
+
+def _entity_path(entity_type: str, codes: List[Tuple[int, str]]) -> Tuple[np.ndarray, bool]:
+    """Flatten one supported entity into (points, closed)"""
+    values: Dict[int, float] = {}
+    for code, value in codes:
+        if code in (10, 20, 11, 21, 40, 50, 51) and code not in values:
+            values[code] = float(value)
+
+    if entity_type == 'LINE':
+        return np.array([[values[10], values[20]], [values[11], values[21]]]), False
+    if entity_type == 'CIRCLE':
+        return _arc_points(values[10], values[20], values[40], 0.0, 360.0)[:-1], True
+    if entity_type == 'ARC':
+        sweep = (values[51] - values[50]) % 360.0 or 360.0
+        return _arc_points(values[10], values[20], values[40], values[50], sweep), False
+    return _lwpolyline(codes)
+
+
+def _join_open_paths(paths: List[np.ndarray]) -> List[np.ndarray]:
+    """Chain LINE/ARC/open-polyline pieces that share endpoints into outlines"""
+    def key(point):
+        return tuple(np.round(point / JOIN_TOLERANCE).astype(np.int64))
+
+    by_endpoint: Dict[tuple, List[int]] = {}
+    for index, path in enumerate(paths):
+        by_endpoint.setdefault(key(path[0]), []).append(index)
+        by_endpoint.setdefault(key(path[-1]), []).append(index)
+
+    used = [False] * len(paths)
+    outlines = []
+    for start in range(len(paths)):
+        if used[start]:
+            continue
+        used[start] = True
+        chain = [paths[start]]
+        first_key, end_key = key(paths[start][0]), key(paths[start][-1])
+        while end_key != first_key:
+            candidates = [i for i in by_endpoint.get(end_key, []) if not used[i]]
+            if not candidates:
+                logging.warning(f"Open electrode outline ending at {chain[-1][-1]}; closing it with a straight edge")
+                break
+            nxt = candidates[0]
+            used[nxt] = True
+            piece = paths[nxt] if key(paths[nxt][0]) == end_key else paths[nxt][::-1]
+            chain.append(piece[1:])
+            end_key = key(piece[-1])
+        outline = np.concatenate(chain)
+        if key(outline[-1]) == key(outline[0]) and len(outline) > 1:
+            outline = outline[:-1]
+        outlines.append(outline)
+    return outlines
+
+
+def parse_dxf(file_path: str) -> PolygonSet:
+    """Extract electrode outlines (LINE/LWPOLYLINE/ARC/CIRCLE) from an ASCII DXF file"""
+    # Closed entities are outlines on their own; open pieces are collected in
+    # order and chained, and the outline list keeps first-appearance order
+    items = []
+    for entity_type, codes in _entities(_read_pairs(file_path)):
+        if entity_type not in SUPPORTED_ENTITIES:
+            continue
+        layer = next((value for code, value in codes if code == 8), '')
+        points, closed = _entity_path(entity_type, codes)
+        if len(points) < 2:
+            continue
+        items.append((points, closed, layer))
+
+    polygons, layers = [], []
+    pending, pending_layers = [], []
+
+    def flush():
+        for outline in _join_open_paths(pending):
+            polygons.append(outline)
+            layers.append(pending_layers[0])
+        pending.clear()
+        pending_layers.clear()
+
+    for points, closed, layer in items:
+        if closed:
+            flush()
+            polygons.append(points)
+            layers.append(layer)
+        else:
+            pending.append(points)
+            pending_layers.append(layer)
+    flush()
+
+    return PolygonSet.from_polygons(polygons, layers)
+
+
+def geometry_cache_key(file_path: str) -> str:
+    """Cache key: content hash of the DXF plus the parser settings"""
+    return f"{relax3d_io.file_digest(file_path)}-v{PARSER_VERSION}-{ARC_STEP_DEGREES:g}"
+
+
+def load_geometry(file_path: str, cache_dir: str = GEOMETRY_CACHE_DIR) -> PolygonSet:
+    """Return the outlines of a DXF file, parsing it only if its content is not cached yet"""
+    cache_path = os.path.join(cache_dir, geometry_cache_key(file_path) + '.npz')
+    if os.path.exists(cache_path):
+        logging.info(f"Geometry cache hit: {os.path.basename(file_path)}")
+        return PolygonSet.load(cache_path)
+
+    geometry = parse_dxf(file_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Unique temporary name: several processes may parse the same DXF at once
+    temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix='.npz')
+    os.close(temp_fd)
+    try:
+        geometry.save(temp_path)
+        os.replace(temp_path, cache_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    logging.info(f"Parsed {os.path.basename(file_path)}: {geometry}")
+    return geometry
+
+
+# Main function for direct script execution
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Native DXF electrode geometry reader")
+    parser.add_argument('files', nargs='+', help="DXF files, e.g. L1.dxf L2.5.dxf")
+    parser.add_argument('--cache-dir', default=GEOMETRY_CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    for file_path in args.files:
+        geometry = load_geometry(file_path, args.cache_dir)
+        logging.info(f"{file_path}: {geometry}")
+    logging.info(f"Loaded {len(args.files)} files in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+import numpy as np
+import yaml
+import relax3d_io
+import dxf_geometry
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Configuration
+CONFIG_PATH = 'config_layers.yaml'
+Z_TOLERANCE = 1e-6             # Grid planes within this distance (mm) of zmin/zmax are included
+
+
+def load_layers_config(config_path: str = CONFIG_PATH) -> dict:
+    """Load config_layers.yaml"""
+    with open(config_path, 'r') as file:
+        return yaml.safe_load(file)
+
+
+def polygon_label_map(geometry: dxf_geometry.PolygonSet, spec: relax3d_io.GridSpec) -> np.ndarray:
+    """Rasterize electrode outlines onto the x-y mesh.
+
+    Returns an (ny, nx) int array holding the index of the outline covering
+    each grid point (-1 for none); later outlines overwrite earlier ones.
+    Uses even-odd scanline filling: every edge crossing of a grid row
+    toggles the inside state from the first grid column right of it.
+    """
+    labels = np.full((spec.ny, spec.nx), -1, dtype=np.int32)
+    ys = spec.y0 + spec.hy * np.arange(spec.ny)
+
+    for index in range(len(geometry)):
+        polygon = geometry[index] * relax3d_io.CM_TO_MM
+        start = polygon
+        end = np.roll(polygon, -1, axis=0)
+
+        # Rows within the outline's y range
+        row_min = max(int(np.ceil((polygon[:, 1].min() - spec.y0) / spec.hy)), 0)
+        row_max = min(int(np.floor((polygon[:, 1].max() - spec.y0) / spec.hy)), spec.ny - 1)
+        if row_max < row_min:
+            continue
+        rows = np.arange(row_min, row_max + 1)
+        y = ys[rows][None, :]
+
+        # Half-open rule (y0 <= y < y1) so shared vertices are counted once
+        y_start, y_end = start[:, 1:2], end[:, 1:2]
+        crosses = (y_start <= y) != (y_end <= y)
+        edge, row = np.nonzero(crosses)
+        t = (y[0, row] - y_start[edge, 0]) / (y_end[edge, 0] - y_start[edge, 0])
+        x_cross = start[edge, 0] + t * (end[edge, 0] - start[edge, 0])
+
+        column = np.clip(np.ceil((x_cross - spec.x0) / spec.hx).astype(np.int64), 0, spec.nx)
+        toggles = np.zeros((len(rows), spec.nx + 1), dtype=np.int32)
+        np.add.at(toggles, (row, column), 1)
+        inside = (np.cumsum(toggles[:, :-1], axis=1) % 2).astype(bool)
+
+        labels[rows] = np.where(inside, index, labels[rows])
+
+    return labels
+
+
+def z_plane_range(spec: relax3d_io.GridSpec, zmin: float, zmax: float) -> np.ndarray:
+    """Indices of the z planes within [zmin, zmax] (given in cm)"""
+    zs = spec.z0 + spec.hz * np.arange(spec.nz)
+    lo, hi = zmin * relax3d_io.CM_TO_MM, zmax * relax3d_io.CM_TO_MM
+    return np.nonzero((zs >= lo - Z_TOLERANCE) & (zs <= hi + Z_TOLERANCE))[0]
+
+
+def rasterize_slice(geometry: dxf_geometry.PolygonSet, slice_config: dict, spec: relax3d_io.GridSpec) -> np.ndarray:
+    """Electrode records ('i j k potential', 1-based) of one slice of config_layers.yaml.
+
+    Outline n of the DXF gets potential[n] of the slice and is extruded over
+    the z planes between zmin and zmax.
+    """
+    potentials = np.asarray(slice_config['potential'], dtype=np.float64)
+    if len(potentials) != len(geometry):
+        raise ValueError(f"Slice has {len(potentials)} potential markers but the DXF has {len(geometry)} electrode outlines")
+
+    labels = polygon_label_map(geometry, spec)
+    j, i = np.nonzero(labels >= 0)
+    planes = z_plane_range(spec, slice_config['zmin'], slice_config['zmax'])
+    values = potentials[labels[j, i]]
+
+    count = len(i)
+    records = np.empty((count * len(planes), 4), dtype=np.float64)
+    for n, k in enumerate(planes):
+        block = records[n * count:(n + 1) * count]
+        block[:, 0] = i + 1
+        block[:, 1] = j + 1
+        block[:, 2] = k + 1
+        block[:, 3] = values
+    return records
+
+
+def layer_output_name(filename: str, option: str) -> str:
+    """Divided layer file name for a DXF file, e.g. L2.5.dxf -> S2.5.txt"""
+    name_suffix = filename.replace('.dxf', '').replace('L', '')
+    return f"{option}{name_suffix}.txt"
+
+
+def preprocess_layer(dxf_path: str, option: str, layers_config: dict, output_dir: str) -> str:
+    """Native replacement for 1_GEOMETRY .. 4_clip: DXF + slice config -> layer electrode file"""
+    filename = os.path.basename(dxf_path)
+    slice_name = filename.replace('.dxf', '')
+    slice_config = layers_config['slices'][slice_name]
+    spec = relax3d_io.grid_spec_from_exec_cmd(layers_config['options'][option]['exec_cmd'])
+
+    geometry = dxf_geometry.load_geometry(dxf_path)
+    records = rasterize_slice(geometry, slice_config, spec)
+
+    output_path = os.path.join(output_dir, layer_output_name(filename, option))
+    relax3d_io.write_electrodes(output_path, records)
+    logging.info(f"{slice_name}: {len(geometry)} electrodes, {len(records)} grid points -> {output_path}")
+    return output_path
+
+
+def preprocess_layers(slice_names: List[str], option: str, layers_config: dict, dxf_dir: str,
+                      output_dir: str, workers: int = 1) -> List[str]:
+    """Native preprocess + divide for several slices, optionally in parallel across a process pool"""
+    dxf_paths = [os.path.join(dxf_dir, f"{slice_name}.dxf") for slice_name in slice_names]
+    if workers <= 1 or len(dxf_paths) <= 1:
+        return [preprocess_layer(dxf_path, option, layers_config, output_dir) for dxf_path in dxf_paths]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(preprocess_layer, dxf_path, option, layers_config, output_dir)
+                   for dxf_path in dxf_paths]
+        return [future.result() for future in futures]
+
+
+def verify_against_golden(output_paths: List[str], golden_dir: str) -> bool:
+    """Compare written layer files byte for byte with golden files of the same name"""
+    all_match = True
+    for output_path in output_paths:
+        golden_path = os.path.join(golden_dir, os.path.basename(output_path))
+        if not os.path.exists(golden_path):
+            logging.warning(f"No golden file for {os.path.basename(output_path)}")
+            all_match = False
+        elif relax3d_io.files_identical(output_path, golden_path):
+            logging.info(f"{os.path.basename(output_path)} matches golden file")
+        else:
+            logging.error(f"{os.path.basename(output_path)} differs from golden file {golden_path}")
+            all_match = False
+    return all_match
+
+
+# Main function for direct script execution
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Native electrode rasterizer (DXF + config_layers.yaml -> layer files)")
+    parser.add_argument('option', choices=['L', 'S'])
+    parser.add_argument('slices', nargs='*', help="Slice names (default: all slices in config_layers.yaml)")
+    parser.add_argument('--dxf-dir', default='.', help="Folder containing the L{n}.dxf files")
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--config', default=CONFIG_PATH)
+    parser.add_argument('--workers', type=int, default=1, help="Process pool size (layers in parallel)")
+    parser.add_argument('--golden', default=None, help="Folder of golden L{n}.txt / S{n}.txt files to verify against")
+    args = parser.parse_args(argv)
+
+    layers_config = load_layers_config(args.config)
+    slices = args.slices or list(layers_config['slices'])
+
+    start_time = time.perf_counter()
+    output_paths = preprocess_layers(slices, args.option, layers_config, args.dxf_dir, args.output_dir, args.workers)
+    logging.info(f"Preprocessed {len(slices)} slices in {time.perf_counter() - start_time:.2f} s")
+
+    if args.golden and not verify_against_golden(output_paths, args.golden):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
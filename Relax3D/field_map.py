@@ -0,0 +1,610 @@
+import os
+import sys
+import glob
+import mmap
+import time
+import logging
+import argparse
+from collections import OrderedDict
+from typing import List, Tuple
+import numpy as np
+import relax3d_io
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Configuration
+PLANE_CACHE_SIZE = 8           # Decoded z planes kept per open field map
+INDEX_SCAN_BLOCK = 16 * 1024 * 1024  # Bytes scanned per block when indexing a ragged text file
+INTERPOLATION_METHODS = ('linear', 'cubic')
+QUERY_CHUNK = 65536            # Points interpolated per batch (keeps the temporaries in cache)
+BENCHMARK_POINTS = 1000000
+GRADIENT_TAG = '.E-'           # <stem>.E-<source hash>.npy holds -grad V next to the field map
+GRADIENT_KEY_LENGTH = 16       # Hex digits of the source SHA-256 kept in the file name
+GRADIENT_DTYPE = np.float32
+MEDIAN_PLANE_TOLERANCE = 1e-6  # mm; a grid starting this close to z = 0 is the upper half of a symmetric problem
+
+
+def head_path_for(field_path: str) -> str:
+    """The grid description stored next to a field map: .efld -> .head, RELAX3D_V.OUT -> convert.dat"""
+    root, extension = os.path.splitext(field_path)
+    if extension.lower() == '.efld':
+        return root + '.head'
+    return os.path.join(os.path.dirname(field_path), 'convert.dat')
+
+
+def resolve_grid_spec(field_path: str, spec: relax3d_io.GridSpec = None) -> relax3d_io.GridSpec:
+    """Grid of a field map: explicit spec, else the binary header, else the .head / convert.dat file"""
+    if spec is not None:
+        return spec
+    if relax3d_io.is_grid_file(field_path):
+        return relax3d_io.open_grid(field_path)[0]
+    head_path = head_path_for(field_path)
+    if not os.path.exists(head_path):
+        raise FileNotFoundError(f"No grid description for {field_path}: {head_path} not found and no spec given")
+    return relax3d_io.read_convert_dat(head_path)
+
+
+class EfldFile:
+    """Lazy, read-only (z, y, x) view of a RELAX3D_V.OUT / .efld potential file.
+
+    Opening builds a byte-offset index of the first and last text line of
+    every z plane; planes are decoded on first access and kept in a bounded
+    LRU cache, so memory scales with the planes actually touched. Binary
+    .r3dg grids are memory-mapped directly. Supports numpy-style indexing
+    with the z index first, e.g. efld[10], efld[:, 300, 300], efld[5:8, ::2].
+    """
+
+    def __init__(self, file_path: str, spec: relax3d_io.GridSpec = None, cache_size: int = PLANE_CACHE_SIZE):
+        self.file_path = file_path
+        self.spec = resolve_grid_spec(file_path, spec)
+        self.shape = self.spec.shape
+        self.cache_size = max(int(cache_size), 1)
+        self.hits = 0
+        self.misses = 0
+        self._planes = OrderedDict()
+        self._file = None
+        self._mmap = None
+        self._grid = None
+
+        if relax3d_io.is_grid_file(file_path):
+            grid_spec, _, self._grid = relax3d_io.open_grid(file_path)
+            if grid_spec.shape != self.shape:
+                raise ValueError(f"{file_path}: grid is {grid_spec.shape}, expected {self.shape}")
+            return
+
+        self._file = open(file_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._build_index()
+
+    # Index
+
+    def _plane_lines(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """First line, one-past-last line and leading values to skip for every z plane"""
+        nz, ny, nx = self.shape
+        plane_values = nx * ny
+        first_value = np.arange(nz, dtype=np.int64) * plane_values
+        first_line = first_value // relax3d_io.VALUES_PER_LINE
+        end_line = -(-(first_value + plane_values) // relax3d_io.VALUES_PER_LINE)
+        return first_line, end_line, first_value - first_line * relax3d_io.VALUES_PER_LINE
+
+    def _build_index(self):
+        """Byte offsets of the lines each z plane spans"""
+        first_line, end_line, self._skip = self._plane_lines()
+        total_lines = int(end_line[-1])
+        line_length = self._mmap.find(b'\n') + 1
+
+        # Fixed-width layout (every full line the same length): offsets are arithmetic
+        if line_length > 0 and self._is_fixed_width(line_length, total_lines):
+            self._start = first_line * line_length
+            self._end = np.minimum(end_line * line_length, len(self._mmap))
+            return
+
+        # Ragged layout: one pass over the newlines, keeping only the offsets needed
+        wanted = np.union1d(first_line, end_line)
+        line_offsets = self._line_offsets(wanted)
+        if len(line_offsets) < len(wanted):
+            raise ValueError(f"{self.file_path}: expected {total_lines} lines of values for a "
+                             f"{self.spec.nx}x{self.spec.ny}x{self.spec.nz} grid")
+        self._start = line_offsets[np.searchsorted(wanted, first_line)]
+        self._end = line_offsets[np.searchsorted(wanted, end_line)]
+
+    def _is_fixed_width(self, line_length: int, total_lines: int) -> bool:
+        total_values = self.spec.nx * self.spec.ny * self.spec.nz
+        full_lines, remainder = divmod(total_values, relax3d_io.VALUES_PER_LINE)
+        newline = 2 if self._mmap[line_length - 2:line_length] == b'\r\n' else 1
+        width, extra = divmod(line_length - newline, relax3d_io.VALUES_PER_LINE)
+        if extra:
+            return False
+        expected = full_lines * line_length + (remainder * width + newline if remainder else 0)
+        size = len(self._mmap)
+        # Tolerate a missing final newline or trailing blank lines
+        return expected - newline <= size <= expected + 2 * newline
+
+    def _line_offsets(self, wanted: np.ndarray) -> np.ndarray:
+        """Byte offsets of the (sorted) line numbers in `wanted`; line N starts after newline N-1"""
+        offsets = np.empty(len(wanted), dtype=np.int64)
+        found = 0
+        if wanted[0] == 0:
+            offsets[0] = 0
+            found = 1
+        lines_before = 0
+        size = len(self._mmap)
+        for block_start in range(0, size, INDEX_SCAN_BLOCK):
+            block = np.frombuffer(self._mmap, dtype=np.uint8, count=min(INDEX_SCAN_BLOCK, size - block_start),
+                                  offset=block_start)
+            newlines = np.flatnonzero(block == 10) + block_start
+            lines_after = lines_before + len(newlines)
+            while found < len(wanted) and wanted[found] <= lines_after:
+                offsets[found] = newlines[wanted[found] - lines_before - 1] + 1
+                found += 1
+            lines_before = lines_after
+            if found == len(wanted):
+                break
+        # A last line without a trailing newline ends at the end of the file
+        if found == len(wanted) - 1 and wanted[found] == lines_before + 1:
+            offsets[found] = size
+            found += 1
+        return offsets[:found]
+
+    # Plane access
+
+    def _decode_plane(self, k: int) -> np.ndarray:
+        nz, ny, nx = self.shape
+        text = self._mmap[self._start[k]:self._end[k]]
+        values = np.array(text.split(), dtype=np.float64)
+        skip = int(self._skip[k])
+        plane = values[skip:skip + nx * ny]
+        if plane.size != nx * ny:
+            raise ValueError(f"{self.file_path}: z plane {k} has {plane.size} values, expected {nx * ny}")
+        return plane.reshape(ny, nx)
+
+    def plane(self, k: int) -> np.ndarray:
+        """Decoded z plane k as a read-only (ny, nx) array"""
+        nz = self.shape[0]
+        if not -nz <= k < nz:
+            raise IndexError(f"z index {k} out of range for {nz} planes")
+        k = int(k) % nz
+        if self._grid is not None:
+            return self._grid[k]
+
+        plane = self._planes.get(k)
+        if plane is not None:
+            self._planes.move_to_end(k)
+            self.hits += 1
+            return plane
+
+        self.misses += 1
+        plane = self._decode_plane(k)
+        plane.flags.writeable = False
+        self._planes[k] = plane
+        if len(self._planes) > self.cache_size:
+            self._planes.popitem(last=False)
+        return plane
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        z_key, rest = key[0], key[1:]
+        if z_key is Ellipsis:
+            z_key, rest = slice(None), (Ellipsis,) + rest
+
+        if isinstance(z_key, (int, np.integer)):
+            return self.plane(int(z_key))[rest] if rest else self.plane(int(z_key))
+
+        planes = np.arange(self.shape[0])[z_key]
+        return np.stack([self.plane(int(k))[rest] for k in np.atleast_1d(planes)])
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[:]
+        return values if dtype is None else values.astype(dtype)
+
+    def cache_info(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'cached': len(self._planes), 'max': self.cache_size}
+
+    def close(self):
+        self._planes.clear()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return f"EfldFile({self.file_path!r}, {self.spec})"
+
+
+def starts_at_median_plane(spec: relax3d_io.GridSpec) -> bool:
+    """True for a grid starting at z = 0, the upper half of a problem symmetric about the median plane"""
+    return abs(spec.z0) < MEDIAN_PLANE_TOLERANCE
+
+
+def _axis_stencil(u: np.ndarray, n: int, method: str,
+                  mirror: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Tap indices, weights and derivative weights (per grid step) along one axis.
+
+    `u` is the fractional grid coordinate. Linear uses 2 taps; cubic uses
+    the 4-tap Catmull-Rom kernel, with taps past the edge clamped to it.
+    With `mirror` the taps below index 0 are kept (negative) for the caller
+    to reflect about plane 0 instead (see _mirror_taps).
+    """
+    base = np.clip(np.floor(u).astype(np.int64), 0, max(n - 2, 0))
+    t = u - base
+    if method == 'linear':
+        taps = np.stack((base, np.minimum(base + 1, n - 1)), axis=1)
+        weights = np.stack((1.0 - t, t), axis=1)
+        derivatives = np.empty_like(weights)
+        derivatives[:, 0] = -1.0
+        derivatives[:, 1] = 1.0
+        return taps, weights, derivatives
+
+    t2 = t * t
+    t3 = t2 * t
+    taps = np.clip(base[:, None] + np.arange(-1, 3), -1 if mirror else 0, n - 1)
+    weights = 0.5 * np.stack((-t3 + 2.0 * t2 - t,
+                              3.0 * t3 - 5.0 * t2 + 2.0,
+                              -3.0 * t3 + 4.0 * t2 + t,
+                              t3 - t2), axis=1)
+    derivatives = 0.5 * np.stack((-3.0 * t2 + 4.0 * t - 1.0,
+                                  9.0 * t2 - 10.0 * t,
+                                  -9.0 * t2 + 8.0 * t + 1.0,
+                                  3.0 * t2 - 2.0 * t), axis=1)
+    return taps, weights, derivatives
+
+
+def _mirror_taps(taps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Reflect tap indices about plane 0: the reflected taps and the sign of an odd quantity (Ez) there"""
+    return np.abs(taps), np.where(taps < 0, -1.0, 1.0)
+
+
+class FieldMap:
+    """Potential and E field at arbitrary points of a solved grid.
+
+    Points are (N, 3) arrays of x, y, z in mm (the GridSpec frame); the
+    potential is in V and E = -grad V in V/mm. Interpolation is fully
+    vectorized over the points: 'linear' is trilinear, 'cubic' is the
+    tensor-product Catmull-Rom (tricubic convolution) kernel. E is the
+    exact gradient of the chosen interpolant, or, when a cached `gradient`
+    ((3, nz, ny, nx) from cache_field) is given, that field interpolated
+    with the same kernel. Points outside the grid give NaN.
+
+    A `symmetric` map is the upper half of a problem mirror-symmetric about
+    z = 0, as solved from a grid starting at z = 0 (relax2000 OPT 1, the
+    default [Solver] SYMMETRY auto): near z = 0 the kernel taps are
+    reflected about it (V even, Ez odd) and points below it are answered by
+    reflection. By default a map is symmetric when its grid starts at z = 0.
+    """
+
+    def __init__(self, values: np.ndarray, spec: relax3d_io.GridSpec, gradient: np.ndarray = None,
+                 symmetric: bool = None):
+        self.spec = spec
+        self.values = np.asarray(values).reshape(spec.shape)
+        self._flat = self.values.reshape(-1)
+        self.gradient = None if gradient is None else gradient.reshape((3,) + spec.shape)
+        self._gradient_flat = None if gradient is None else self.gradient.reshape(3, -1)
+        if symmetric is None:
+            symmetric = starts_at_median_plane(spec)
+        self.symmetric = symmetric
+
+    @classmethod
+    def open(cls, file_path: str, spec: relax3d_io.GridSpec = None, symmetric: bool = None) -> 'FieldMap':
+        """Load an .efld/.head pair, RELAX3D_V.OUT (+ convert.dat) or a binary .r3dg grid.
+
+        The E field cached next to the file for its current content (see
+        cache_field) is used when present.
+        """
+        gradient = load_field(file_path)
+        if relax3d_io.is_grid_file(file_path):
+            grid_spec, _, values = relax3d_io.open_grid(file_path)
+        else:
+            grid_spec = resolve_grid_spec(file_path, spec)
+            values = relax3d_io.read_potential(file_path, grid_spec)
+        if gradient is not None and gradient.shape != (3,) + grid_spec.shape:
+            logging.warning(f"Ignoring the cached E field of {file_path}: shape {gradient.shape} does not match")
+            gradient = None
+        return cls(values, grid_spec, gradient, symmetric)
+
+    def bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Lowest and highest grid corner, (x, y, z) in mm, including the mirrored half of a symmetric map"""
+        lower = np.array(self.spec.origin)
+        upper = lower + np.array(self.spec.spacing) * (np.array([self.spec.nx, self.spec.ny, self.spec.nz]) - 1)
+        if self.symmetric:
+            lower[2] = -upper[2]
+        return lower, upper
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        """Mask of the points inside the grid"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        lower, upper = self.bounds()
+        return np.all((points >= lower) & (points <= upper), axis=1)
+
+    def potential(self, points: np.ndarray, method: str = 'linear') -> np.ndarray:
+        """Potential (V) at the points"""
+        return self.evaluate(points, method, gradient=False)[0]
+
+    def field(self, points: np.ndarray, method: str = 'linear') -> np.ndarray:
+        """E field (V/mm) at the points, shape (N, 3)"""
+        return self.evaluate(points, method)[1]
+
+    def evaluate(self, points: np.ndarray, method: str = 'linear', gradient: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Potential (N,) and, if `gradient`, E field (N, 3) at the points"""
+        if method not in INTERPOLATION_METHODS:
+            raise ValueError(f"Unknown interpolation method '{method}', expected one of {INTERPOLATION_METHODS}")
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        potential = np.empty(len(points))
+        field = np.empty((len(points), 3)) if gradient else None
+        for start in range(0, len(points), QUERY_CHUNK):
+            chunk = slice(start, start + QUERY_CHUNK)
+            self._evaluate_chunk(points[chunk], method, potential[chunk], field[chunk] if gradient else None)
+        return potential, field
+
+    def _evaluate_chunk(self, points: np.ndarray, method: str, potential: np.ndarray, field: np.ndarray):
+        spec = self.spec
+        grid = (points - np.array(spec.origin)) / np.array(spec.spacing)
+        xi, xw, xd = _axis_stencil(grid[:, 0], spec.nx, method)
+        yi, yw, yd = _axis_stencil(grid[:, 1], spec.ny, method)
+        if self.symmetric:
+            below = grid[:, 2] < 0.0
+            zi, zw, zd = _axis_stencil(np.abs(grid[:, 2]), spec.nz, method, mirror=True)
+            zi, z_sign = _mirror_taps(zi)
+        else:
+            zi, zw, zd = _axis_stencil(grid[:, 2], spec.nz, method)
+
+        # Accumulate tap by tap: the x sums of each (z, y) row are shared by
+        # the potential and all three gradient components
+        potential[:] = 0.0
+        if field is not None:
+            field[:] = 0.0
+        cached = field is not None and self._gradient_flat is not None
+        taps = xi.shape[1]
+        for c in range(taps):
+            plane_row = zi[:, c] * spec.ny
+            for b in range(taps):
+                row = (plane_row + yi[:, b]) * spec.nx
+                row_sum = np.zeros(len(points))
+                row_slope = np.zeros(len(points)) if field is not None and not cached else None
+                row_field = np.zeros((3, len(points))) if cached else None
+                for a in range(taps):
+                    index = row + xi[:, a]
+                    v = self._flat[index]
+                    row_sum += xw[:, a] * v
+                    if cached:
+                        row_field += xw[:, a] * self._gradient_flat[:, index]
+                    elif field is not None:
+                        row_slope += xd[:, a] * v
+                weight = zw[:, c] * yw[:, b]
+                potential += weight * row_sum
+                if cached:
+                    if self.symmetric:
+                        row_field[2] *= z_sign[:, c]
+                    field += (weight * row_field).T
+                elif field is not None:
+                    field[:, 0] -= weight * row_slope
+                    field[:, 1] -= zw[:, c] * yd[:, b] * row_sum
+                    field[:, 2] -= zd[:, c] * yw[:, b] * row_sum
+
+        if field is not None and not cached:
+            field /= np.array(spec.spacing)
+        if field is not None and self.symmetric:
+            field[below, 2] *= -1.0
+        outside = ~self.contains(points)
+        potential[outside] = np.nan
+        if field is not None:
+            field[outside] = np.nan
+
+    def __repr__(self):
+        return (f"FieldMap({self.spec}{', cached E' if self.gradient is not None else ''}"
+                f"{', symmetric about z = 0' if self.symmetric else ''})")
+
+
+class CompositeFieldMap:
+    """Nested field maps queried as one: each point is answered by the first map that contains it.
+
+    Maps are given finest first, e.g. CompositeFieldMap([small_area, large_area]):
+    points inside the S grid get S resolution and everything else falls
+    back to L. Bounds checks are vectorized and every map interpolates its
+    own points in one batch (from its cached E field when it has one).
+    A symmetric map also contains the mirror image of its grid below z = 0.
+    Points outside all maps give NaN.
+    """
+
+    def __init__(self, maps: List[FieldMap]):
+        if not maps:
+            raise ValueError("CompositeFieldMap needs at least one field map")
+        self.maps = list(maps)
+
+    @classmethod
+    def open(cls, file_paths: List[str], specs: List[relax3d_io.GridSpec] = None) -> 'CompositeFieldMap':
+        """Load field maps with their cached E fields, finest first (e.g. the S .efld, then the L .efld)"""
+        specs = specs or [None] * len(file_paths)
+        return cls([FieldMap.open(file_path, spec) for file_path, spec in zip(file_paths, specs)])
+
+    def region(self, points: np.ndarray) -> np.ndarray:
+        """Index of the map answering each point (-1 outside all of them)"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        region = np.full(len(points), -1, dtype=np.int64)
+        for index in reversed(range(len(self.maps))):
+            region[self.maps[index].contains(points)] = index
+        return region
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        return self.region(points) >= 0
+
+    def potential(self, points: np.ndarray, method: str = 'linear') -> np.ndarray:
+        """Potential (V) at the points"""
+        return self.evaluate(points, method, gradient=False)[0]
+
+    def field(self, points: np.ndarray, method: str = 'linear') -> np.ndarray:
+        """E field (V/mm) at the points, shape (N, 3)"""
+        return self.evaluate(points, method)[1]
+
+    def evaluate(self, points: np.ndarray, method: str = 'linear', gradient: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Potential (N,) and, if `gradient`, E field (N, 3), each point from its finest map"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        region = self.region(points)
+        potential = np.full(len(points), np.nan)
+        field = np.full((len(points), 3), np.nan) if gradient else None
+        for index, field_map in enumerate(self.maps):
+            selected = np.flatnonzero(region == index)
+            if not len(selected):
+                continue
+            map_potential, map_field = field_map.evaluate(points[selected], method, gradient)
+            potential[selected] = map_potential
+            if gradient:
+                field[selected] = map_field
+        return potential, field
+
+    def __repr__(self):
+        return f"CompositeFieldMap({self.maps})"
+
+
+def gradient_cache_path(field_path: str, digest: str) -> str:
+    """E field cache file for a field map with the given source SHA-256"""
+    stem = os.path.splitext(field_path)[0]
+    return f"{stem}{GRADIENT_TAG}{digest[:GRADIENT_KEY_LENGTH]}.npy"
+
+
+def gradient_cache_files(field_path: str) -> List[str]:
+    """All E field cache files next to a field map, whatever source hash they belong to"""
+    stem = os.path.splitext(field_path)[0]
+    return glob.glob(f"{glob.escape(stem)}{GRADIENT_TAG}*.npy")
+
+
+def compute_field(potential: np.ndarray, spacing: Tuple[float, float, float], out: np.ndarray = None,
+                  symmetric: bool = False) -> np.ndarray:
+    """E = -grad V (V/mm) as a (3, nz, ny, nx) array of Ex, Ey, Ez.
+
+    Second-order central differences inside the grid and second-order
+    one-sided differences on the faces. With `symmetric` the bottom face is
+    the median plane z = 0 of a mirror-symmetric problem, where the central
+    difference with the mirrored plane gives Ez = 0.
+    """
+    if out is None:
+        out = np.empty((3,) + potential.shape, dtype=GRADIENT_DTYPE)
+    # potential is (z, y, x): component c (x, y, z) differentiates along axis 2 - c
+    for component, h in enumerate(spacing):
+        out[component] = np.gradient(potential, h, axis=2 - component, edge_order=2)
+        np.negative(out[component], out=out[component])
+    if symmetric:
+        out[2, 0] = 0.0
+    return out
+
+
+def load_field(field_path: str) -> np.ndarray:
+    """Memory-mapped cached E field of a field map, or None if it is missing or stale"""
+    if not gradient_cache_files(field_path):
+        return None  # Spares hashing the field map
+    digest = relax3d_io.file_digest(field_path)
+    cache_path = gradient_cache_path(field_path, digest)
+    if not os.path.exists(cache_path):
+        return None
+    return np.load(cache_path, mmap_mode='r')
+
+
+def cache_field(field_path: str, spec: relax3d_io.GridSpec = None) -> str:
+    """Compute -grad V of a field map once and store it next to it, keyed by the source hash"""
+    digest = relax3d_io.file_digest(field_path)
+    cache_path = gradient_cache_path(field_path, digest)
+    if os.path.exists(cache_path):
+        logging.info(f"E field cache hit: {os.path.basename(cache_path)}")
+        return cache_path
+
+    spec = resolve_grid_spec(field_path, spec)
+    start_time = time.perf_counter()
+    if relax3d_io.is_grid_file(field_path):
+        potential = relax3d_io.open_grid(field_path)[2]
+    else:
+        potential = relax3d_io.read_potential(field_path, spec)
+
+    temp_path = cache_path + '.tmp.npy'
+    field = np.lib.format.open_memmap(temp_path, mode='w+', dtype=GRADIENT_DTYPE, shape=(3,) + spec.shape)
+    compute_field(potential, spec.spacing, field, starts_at_median_plane(spec))
+    field.flush()
+    del field
+    os.replace(temp_path, cache_path)
+
+    # Results of earlier solves are stale now
+    for stale_path in gradient_cache_files(field_path):
+        if stale_path != cache_path:
+            os.remove(stale_path)
+    logging.info(f"E field written to {cache_path} in {time.perf_counter() - start_time:.2f} s")
+    return cache_path
+
+
+def benchmark(field_map: FieldMap, count: int = BENCHMARK_POINTS, seed: int = 0) -> dict:
+    """Query throughput (points per second) of each interpolation method at random points in the grid"""
+    lower, upper = field_map.bounds()
+    points = np.random.default_rng(seed).uniform(lower, upper, size=(count, 3))
+    results = {}
+    for method in INTERPOLATION_METHODS:
+        for gradient in (False, True):
+            start_time = time.perf_counter()
+            field_map.evaluate(points, method, gradient)
+            elapsed = time.perf_counter() - start_time
+            label = f"{method}{' + E' if gradient else ''}"
+            results[label] = count / elapsed
+            logging.info(f"{label:>10}: {count / elapsed / 1e6:.2f} M points/s ({elapsed:.3f} s for {count} points)")
+    return results
+
+
+# Main function for direct script execution
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Inspect and query RELAX3D_V.OUT / .efld field maps")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    info_parser = subparsers.add_parser('info', help="Open a field map lazily and summarize z planes")
+    query_parser = subparsers.add_parser('query', help="Potential and E field at points")
+    bench_parser = subparsers.add_parser('bench', help="Interpolation throughput at random points")
+    gradient_parser = subparsers.add_parser('gradient', help="Compute and cache E = -grad V next to the field map")
+    for sub in (info_parser, query_parser, bench_parser, gradient_parser):
+        sub.add_argument('file', help=".efld, RELAX3D_V.OUT or .r3dg file")
+        sub.add_argument('--head', default=None, help="Grid description (default: matching .head / convert.dat)")
+
+    info_parser.add_argument('--plane', type=int, action='append', default=[], help="z plane(s) to summarize")
+    query_parser.add_argument('points', nargs='+', help="Points as x,y,z in mm")
+    query_parser.add_argument('--method', choices=INTERPOLATION_METHODS, default='linear')
+    query_parser.add_argument('--fallback', action='append', default=[],
+                              help="Coarser field map answering points outside FILE (e.g. the L .efld for an S file)")
+    bench_parser.add_argument('--points', type=int, default=BENCHMARK_POINTS)
+    args = parser.parse_args(argv)
+
+    spec = relax3d_io.read_convert_dat(args.head) if args.head else None
+    if args.command == 'query':
+        field_map = CompositeFieldMap.open([args.file] + args.fallback, [spec] + [None] * len(args.fallback))
+        points = np.array([[float(value) for value in point.split(',')] for point in args.points])
+        potential, field = field_map.evaluate(points, args.method)
+        for point, volts, e in zip(points, potential, field):
+            logging.info(f"({point[0]:g}, {point[1]:g}, {point[2]:g}) mm: V = {volts:.6g} V, "
+                         f"E = ({e[0]:.6g}, {e[1]:.6g}, {e[2]:.6g}) V/mm")
+        return 0
+    if args.command == 'gradient':
+        cache_field(args.file, spec)
+        return 0
+    if args.command == 'bench':
+        start_time = time.perf_counter()
+        field_map = FieldMap.open(args.file, spec)
+        logging.info(f"Loaded {field_map} in {time.perf_counter() - start_time:.2f} s")
+        benchmark(field_map, args.points)
+        return 0
+
+    start_time = time.perf_counter()
+    with EfldFile(args.file, spec) as efld:
+        logging.info(f"Opened {efld} in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+        for k in args.plane:
+            start_time = time.perf_counter()
+            plane = efld[k]
+            logging.info(f"z plane {k}: min {plane.min():.6g} V, max {plane.max():.6g} V "
+                         f"({(time.perf_counter() - start_time) * 1000:.1f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
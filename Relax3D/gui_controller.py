@@ -4,15 +4,18 @@ import yaml
 import subprocess
 # Import existing script
 import auto_relax3d
+import relax3d_io
+import relax_solver
+import basis_fields
+import batch_pipeline
+import residual_check
 # Set up logging
 import win32gui
 import win32api
 import win32con
 import time         
-import shutil
 import select 
 import configparser
-from datetime import datetime
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
@@ -154,17 +157,21 @@ class AutoPre3DThread(QThread):
     finished = pyqtSignal()
     log_message = pyqtSignal(str)
     
-    def __init__(self, mode, filename, option):
+    def __init__(self, mode, filename, option, native=False):
         QThread.__init__(self)
         self.mode = mode
         self.filename = filename
         self.option = option
+        self.native = native
         
     def run(self):
         try:
             self.log_message.emit(f"Starting task with mode: {self.mode}, file: {self.filename}, option: {self.option}")
             auto_pre3d = auto_relax3d.AutoPre3D(self.mode)
-            auto_pre3d.run(self.filename, self.option)
+            if self.native:
+                auto_pre3d.run_native(self.filename, self.option)
+            else:
+                auto_pre3d.run(self.filename, self.option)
             self.log_message.emit("Task completed successfully")
         except Exception as e:
             self.log_message.emit(f"Error: {str(e)}")
@@ -176,9 +183,13 @@ class AutoRe3DThread(QThread):
     finished = pyqtSignal()
     log_message = pyqtSignal(str)  # Changed back to just emitting the raw message
     
-    def __init__(self, option):
+    def __init__(self, option, engine='relax2000', nested=False, symmetry=None, warm_start=False):
         QThread.__init__(self)
         self.option = option
+        self.engine = engine  # 'relax2000', 'sor', 'parallel', 'multigrid' or 'slab'
+        self.nested = nested  # S only: boundary and initial guess from the latest L solution
+        self.symmetry = symmetry  # 'off', 'auto' or 'on' (median-plane symmetry)
+        self.warm_start = warm_start  # Start from the last solution of the same area
         self.should_terminate = False
         self.auto_re3d = None  # Will hold our AutoRe3D instance
         
@@ -193,8 +204,12 @@ class AutoRe3DThread(QThread):
             self._setup_logging()
             
             # Run the task
-            self.log_message.emit(f"Running Relax3D with option: {self.option}")
-            result = self.auto_re3d.run_relax2000_task(self.option)
+            self.log_message.emit(f"Running Relax3D with option: {self.option}, engine: {self.engine}")
+            if self.engine == 'relax2000':
+                result = self.auto_re3d.run_relax2000_task(self.option)
+            else:
+                result = self.auto_re3d.run_native_task(self.option, self.engine, self.nested, self.symmetry,
+                                                        self.warm_start)
             
             if result:
                 self.log_message.emit("Relax3D automation completed successfully")
@@ -239,6 +254,83 @@ class AutoRe3DThread(QThread):
             self.auto_re3d.terminate()
 
 
+class BatchPipelineThread(AutoRe3DThread):
+    """Thread for running the batch pipeline (all slices, preprocess .. rename)"""
+    
+    def __init__(self, option_list, native=False, engine='relax2000', label='', nested=False, symmetry=None,
+                 warm_start=False, changed_only=False):
+        AutoRe3DThread.__init__(self, ''.join(option_list), engine, nested, symmetry, warm_start)
+        self.option_list = option_list
+        self.native = native
+        self.label = label  # Rename and move the results with this label ('' keeps them in R3D_PATH)
+        self.changed_only = changed_only  # Only slices changed since the last build (build_manifest.json)
+        self.pipeline = None
+        
+    def run(self):
+        try:
+            self._setup_logging()
+            self.pipeline = batch_pipeline.BatchPipeline(self.option_list, native=self.native, engine=self.engine,
+                                                         label=self.label, nested=self.nested,
+                                                         symmetry=self.symmetry, warm_start=self.warm_start,
+                                                         changed_only=self.changed_only)
+            self.pipeline.describe()
+            if self.should_terminate:
+                self.pipeline.terminate()
+            if self.pipeline.run():
+                self.log_message.emit("Batch pipeline completed successfully")
+            elif self.should_terminate:
+                self.log_message.emit("Batch pipeline was terminated by user")
+            else:
+                self.log_message.emit("Batch pipeline failed to complete")
+        except Exception as e:
+            self.log_message.emit(f"Error running batch pipeline: {str(e)}")
+        finally:
+            self._cleanup_logging()
+            self.finished.emit()
+    
+    def request_termination(self):
+        """Request termination of the batch: no new tasks, running solves stopped"""
+        self.should_terminate = True
+        self.log_message.emit("Process termination requested")
+        if self.pipeline:
+            self.pipeline.terminate()
+
+
+class BasisFieldThread(QThread):
+    """Thread for computing electrode basis fields or composing a potential from them"""
+    finished = pyqtSignal()
+    log_message = pyqtSignal(str)
+    
+    def __init__(self, option, action, voltages=None):
+        QThread.__init__(self)
+        self.option = option
+        self.action = action  # 'compute' or 'compose'
+        self.voltages = voltages or {}
+        
+    def run(self):
+        try:
+            config = load_config('config_main.ini')
+            r3d_path = config.get('Paths', 'R3D_PATH')
+            dat_path = os.path.join(r3d_path, relax3d_io.RELAX3D_DAT)
+            output_dir = basis_fields.basis_folder(r3d_path, self.option)
+            
+            if self.action == 'compute':
+                self.log_message.emit(f"Computing basis fields for option: {self.option}")
+                spec = relax3d_io.load_grid_spec(self.option, config)
+                settings = relax_solver.get_solver_settings(config)
+                basis_fields.compute_basis_fields(dat_path, spec, settings, output_dir,
+                                                  basis_fields.basis_method(config))
+            else:
+                self.log_message.emit(f"Composing potential for option: {self.option}")
+                output_path = os.path.join(r3d_path, relax3d_io.RELAX3D_OUT)
+                basis_fields.compose_to_file(output_dir, self.voltages, output_path, dat_path,
+                                             residual_check.get_verify_tolerance(config))
+            self.log_message.emit("Basis field task completed successfully")
+        except Exception as e:
+            self.log_message.emit(f"Error: {str(e)}")
+        finally:
+            self.finished.emit()
+
 class CustomLogHandler(logging.Handler):
     """Custom logging handler to redirect logs to QThread signals"""
     
@@ -274,43 +366,10 @@ class ChangeFileNameThread(QThread):
         try:
             self.log_message.emit(f"🔹 Starting file renaming with model type: {self.model_type}, label: {self.label}", logging.INFO)
 
-            # Get current date in MMDD format
-            current_date = datetime.now().strftime("%m%d")
-            
-            # Use the thread parameters instead of environment variables
-            Model = self.model_type
-            Label = self.label
-            cyclotron_type = config.get('Paths', 'CYCLOTRON_TYPE')
-            # Define the target directory
-            target_directory = config.get('Paths', 'TARGET_OUTPUT_PATH')
-            
-            # Log parameters for debugging
-            self.log_message.emit(f"🔹 Using Model: {Model}, Label: {Label}, Date: {current_date}", logging.INFO)
-            
-            # Define the file mappings
-            file_mappings = {
-                "RELAX3D_V.OUT": f"cyc_{cyclotron_type}_C{Model}{current_date}{Label}.efld",
-                "convert.dat": f"cyc_{cyclotron_type}_C{Model}{current_date}{Label}.head"
-            }
-            
-            
-            # Create the target directory if it doesn't exist
-            os.makedirs(target_directory, exist_ok=True)
-            
-            # Rename and move the files
-            for old_name, new_name in file_mappings.items():
-                if os.path.exists(old_name):
-                    # Rename the file
-                    os.rename(old_name, new_name)
-                    self.log_message.emit(f"🔹 Renamed '{old_name}' to '{new_name}'", logging.INFO)
-                    
-                    # Move the file to the target directory
-                    target_path = os.path.join(target_directory, new_name)
-                    shutil.move(new_name, target_path)
-                    self.log_message.emit(f"🔹 Moved '{new_name}' to '{target_path}'", logging.INFO)
-                else:
-                    self.log_message.emit(f"❌ File '{old_name}' not found in the current directory", logging.ERROR)
-            
+            # Rename and move RELAX3D_V.OUT, convert.dat and their E field / verification files
+            if not auto_relax3d.publish_outputs(self.model_type, self.label, config, log=self._log):
+                return
+
             self.log_message.emit(f"✅ File renaming and moving completed.", logging.INFO)
                     
         except Exception as e:
@@ -318,6 +377,10 @@ class ChangeFileNameThread(QThread):
         finally:
             self.finished.emit()
 
+    def _log(self, message, level):
+        """Forward a publish_outputs message with the usual marker"""
+        self.log_message.emit(f"{'❌' if level >= logging.ERROR else '🔹'} {message}", level)
+
 class AutoRelax3D(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -456,6 +519,13 @@ class AutoRelax3D(QMainWindow):
         option_layout.addWidget(self.large_radio, 1, 1)
         option_layout.addWidget(self.small_radio, 1, 2)
         
+        # Native preprocessing (DXF reader + rasterizer instead of the WIN32 software)
+        self.native_checkbox = QCheckBox("Native preprocessing (no WIN32 software)")
+        self.native_checkbox.setToolTip("Not yet checked against golden WIN32 layer files "
+                                        "(python electrode_grid.py L --golden <folder>): WIN32 stays the default")
+        self.native_checkbox.setChecked(False)
+        option_layout.addWidget(self.native_checkbox, 2, 0, 1, 3)
+        
         option_group.setLayout(option_layout)
         right_column.addWidget(option_group)
         
@@ -482,6 +552,38 @@ class AutoRelax3D(QMainWindow):
         self.terminate_auto_re3d_btn.setStyleSheet("background-color: #f44336; color: white;")
         self.terminate_auto_re3d_btn.clicked.connect(self.terminate_auto_re3d)
         self.terminate_auto_re3d_btn.setEnabled(False)  # Initially disabled
+        
+        # Solver engine selection
+        engine_label = QLabel("Solver Engine:")
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItem("relax2000 (WIN32)", "relax2000")
+        self.engine_combo.addItem("NumPy SOR", "sor")
+        self.engine_combo.addItem("NumPy Parallel SOR", "parallel")
+        self.engine_combo.addItem("NumPy Multigrid", "multigrid")
+        self.engine_combo.addItem("NumPy Out-of-core SOR", "slab")
+        solver_config = load_config('config_main.ini')
+        default_engine = solver_config.get('Solver', 'ENGINE', fallback='relax2000')
+        engine_index = self.engine_combo.findData(default_engine)
+        if engine_index >= 0:
+            self.engine_combo.setCurrentIndex(engine_index)
+        # Options of the in-process engines
+        solve_options_label = QLabel("NumPy Solve Options:")
+        self.nested_checkbox = QCheckBox("S: boundary from L solution")
+        self.nested_checkbox.setToolTip("Sample the latest L solution onto the S grid's outer faces and interior, "
+                                        "then relax only the S region")
+        self.nested_checkbox.setChecked(solver_config.getboolean('Solver', 'NESTED', fallback=False))
+        self.symmetry_combo = QComboBox()
+        self.symmetry_combo.addItem("No symmetry", "off")
+        self.symmetry_combo.addItem("Symmetry: auto-detect", "auto")
+        self.symmetry_combo.addItem("Symmetric about z = 0", "on")
+        self.symmetry_combo.setToolTip("Solve only the upper half with dV/dz = 0 on the median plane z = 0")
+        self.warm_start_checkbox = QCheckBox("Warm start from last solution")
+        self.warm_start_checkbox.setToolTip("Use the last L/S solution as the initial guess; "
+                                            "small electrode edits converge in a fraction of the iterations")
+        self.warm_start_checkbox.setChecked(solver_config.getboolean('Solver', 'WARM_START', fallback=False))
+        symmetry_index = self.symmetry_combo.findData(solver_config.get('Solver', 'SYMMETRY', fallback='auto'))
+        if symmetry_index >= 0:
+            self.symmetry_combo.setCurrentIndex(symmetry_index)
         # ---------------------------------------------------------------------------- #
         # Change filename options
         change_filename_label = QLabel("Change Output File Names:")
@@ -492,15 +594,55 @@ class AutoRelax3D(QMainWindow):
         self.change_filename_btn = QPushButton("Change Filenames")
         self.change_filename_btn.clicked.connect(self.run_change_filename)
         # ---------------------------------------------------------------------------- #
+        # Batch pipeline options (every slice: preprocess, divide, combine, solve, rename)
+        batch_label = QLabel("Batch (all slices):")
+        self.batch_large_checkbox = QCheckBox("L")
+        self.batch_large_checkbox.setChecked(True)
+        self.batch_small_checkbox = QCheckBox("S")
+        self.batch_small_checkbox.setChecked(True)
+        self.run_batch_btn = QPushButton("Run Batch")
+        self.run_batch_btn.setToolTip("Preprocess every slice of config_layers.yaml, combine, solve with the "
+                                      "selected engine and rename with the label (empty label: no rename)")
+        self.run_batch_btn.clicked.connect(self.run_batch)
+        self.rebuild_changed_btn = QPushButton("Rebuild Changed")
+        self.rebuild_changed_btn.setToolTip("Redo only the slices whose DXF or layer settings changed since the "
+                                            "last batch, then combine and solve")
+        self.rebuild_changed_btn.clicked.connect(lambda: self.run_batch(changed_only=True))
+        # ---------------------------------------------------------------------------- #
+        # Basis field options (solve once per electrode group, then recombine voltages)
+        basis_label = QLabel("Basis Fields:")
+        self.compute_basis_btn = QPushButton("Compute Basis")
+        self.compute_basis_btn.clicked.connect(self.run_compute_basis)
+        self.voltages_input = QLineEdit("1=1, 0=0")
+        self.voltages_input.setPlaceholderText("Group voltages, e.g. 1=45000, 0=0")
+        self.voltages_input.returnPressed.connect(self.run_compose_basis)
+        self.compose_basis_btn = QPushButton("Compose Voltages")
+        self.compose_basis_btn.clicked.connect(self.run_compose_basis)
+        # ---------------------------------------------------------------------------- #
         # Layout grid
         additional_options_layout.addWidget(auto_re3d_label, 0, 0)
         additional_options_layout.addWidget(self.auto_re3d_large_btn, 0, 1)
         additional_options_layout.addWidget(self.auto_re3d_small_btn, 0, 2)
         additional_options_layout.addWidget(self.terminate_auto_re3d_btn, 0, 3)
-        additional_options_layout.addWidget(change_filename_label, 1, 0)
-        additional_options_layout.addWidget(label_label, 1, 1)
-        additional_options_layout.addWidget(self.label_input, 1, 2)
-        additional_options_layout.addWidget(self.change_filename_btn, 1, 3)
+        additional_options_layout.addWidget(engine_label, 1, 0)
+        additional_options_layout.addWidget(self.engine_combo, 1, 1, 1, 2)
+        additional_options_layout.addWidget(change_filename_label, 2, 0)
+        additional_options_layout.addWidget(label_label, 2, 1)
+        additional_options_layout.addWidget(self.label_input, 2, 2)
+        additional_options_layout.addWidget(self.change_filename_btn, 2, 3)
+        additional_options_layout.addWidget(basis_label, 3, 0)
+        additional_options_layout.addWidget(self.compute_basis_btn, 3, 1)
+        additional_options_layout.addWidget(self.voltages_input, 3, 2)
+        additional_options_layout.addWidget(self.compose_basis_btn, 3, 3)
+        additional_options_layout.addWidget(solve_options_label, 4, 0)
+        additional_options_layout.addWidget(self.nested_checkbox, 4, 1, 1, 2)
+        additional_options_layout.addWidget(self.symmetry_combo, 4, 3)
+        additional_options_layout.addWidget(self.warm_start_checkbox, 5, 1, 1, 2)
+        additional_options_layout.addWidget(batch_label, 6, 0)
+        additional_options_layout.addWidget(self.batch_large_checkbox, 6, 1)
+        additional_options_layout.addWidget(self.batch_small_checkbox, 6, 2)
+        additional_options_layout.addWidget(self.run_batch_btn, 6, 3)
+        additional_options_layout.addWidget(self.rebuild_changed_btn, 7, 3)
         
         additional_options_group.setLayout(additional_options_layout)
         top_layout.addWidget(additional_options_group)
@@ -735,7 +877,7 @@ class AutoRelax3D(QMainWindow):
         logging.info(f"Processing layer {layer_name} with mode={mode}, option={option}")
         
         # Start worker thread
-        self.worker = AutoPre3DThread(mode, filename, option)
+        self.worker = AutoPre3DThread(mode, filename, option, self.native_checkbox.isChecked())
         self.worker.finished.connect(self.process_finished)
         self.worker.log_message.connect(self.log_worker_message)
         self.worker.start()
@@ -763,7 +905,7 @@ class AutoRelax3D(QMainWindow):
         logging.info(f"Processing single file {filename} with mode={mode}, option={option}")
         
         # Start worker thread
-        self.worker = AutoPre3DThread(mode, filename, option)
+        self.worker = AutoPre3DThread(mode, filename, option, self.native_checkbox.isChecked())
         self.worker.finished.connect(self.process_finished)
         self.worker.log_message.connect(self.log_worker_message)
         self.worker.start()
@@ -772,10 +914,13 @@ class AutoRelax3D(QMainWindow):
         """Run the auto_relax3d.py script with the specified option"""
         # Disable UI during processing
         self.disable_ui()
-        logging.info(f"Running AutoRe3D with option {option}")
+        engine = self.engine_combo.currentData()
+        logging.info(f"Running AutoRe3D with option {option}, engine {engine}")
         
         # Start worker thread
-        self.auto_re3d_worker = AutoRe3DThread(option)
+        self.auto_re3d_worker = AutoRe3DThread(option, engine, self.nested_checkbox.isChecked(),
+                                               self.symmetry_combo.currentData(),
+                                               self.warm_start_checkbox.isChecked())
         self.auto_re3d_worker.finished.connect(self.auto_re3d_finished)
         self.auto_re3d_worker.log_message.connect(self.handle_auto_re3d_log)
         self.auto_re3d_worker.start()
@@ -783,6 +928,29 @@ class AutoRelax3D(QMainWindow):
         # Enable the terminate button
         self.terminate_auto_re3d_btn.setEnabled(True)
 
+    def run_batch(self, changed_only=False):
+        """Run the batch pipeline over all slices (or only the changed ones) for the checked areas"""
+        option_list = [option for option, checkbox in (('L', self.batch_large_checkbox),
+                                                       ('S', self.batch_small_checkbox)) if checkbox.isChecked()]
+        if not option_list:
+            QMessageBox.warning(self, "Batch", "Check L and/or S first")
+            return
+        self.disable_ui()
+        engine = self.engine_combo.currentData()
+        logging.info(f"Running batch pipeline for {', '.join(option_list)}, engine {engine}"
+                     f"{', changed slices only' if changed_only else ''}")
+        
+        # The batch runs in the AutoRe3D worker slot, so the terminate button stops it too
+        self.auto_re3d_worker = BatchPipelineThread(option_list, self.native_checkbox.isChecked(), engine,
+                                                    self.label_input.text().strip(),
+                                                    self.nested_checkbox.isChecked(),
+                                                    self.symmetry_combo.currentData(),
+                                                    self.warm_start_checkbox.isChecked(), changed_only)
+        self.auto_re3d_worker.finished.connect(self.auto_re3d_finished)
+        self.auto_re3d_worker.log_message.connect(self.handle_auto_re3d_log)
+        self.auto_re3d_worker.start()
+        self.terminate_auto_re3d_btn.setEnabled(True)
+
     def terminate_auto_re3d(self):
         """Terminate the running AutoRe3D process"""
         if hasattr(self, 'auto_re3d_worker') and self.auto_re3d_worker.isRunning():
@@ -879,6 +1047,33 @@ class AutoRelax3D(QMainWindow):
         self.change_filename_worker.log_message.connect(self.log_worker_message)
         self.change_filename_worker.start()
     
+    # ---------------------------------------------------------------------------- #
+    def run_compute_basis(self):
+        """Solve one unit-potential basis field per electrode group of the current relax3d.dat"""
+        option = 'L' if self.large_radio.isChecked() else 'S'
+        self.start_basis_worker(BasisFieldThread(option, 'compute'))
+    
+    def run_compose_basis(self):
+        """Compose RELAX3D_V.OUT from the stored basis fields and the entered group voltages"""
+        option = 'L' if self.large_radio.isChecked() else 'S'
+        try:
+            voltages = basis_fields.parse_voltages(self.voltages_input.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", f"Invalid voltages: {str(e)}")
+            logging.error(f"Invalid voltages: {str(e)}")
+            return
+        self.start_basis_worker(BasisFieldThread(option, 'compose', voltages))
+    
+    def start_basis_worker(self, worker):
+        """Run a basis field thread with the UI disabled"""
+        self.disable_ui()
+        logging.info(f"Running basis field task ({worker.action}, option {worker.option})")
+        
+        self.basis_worker = worker
+        self.basis_worker.finished.connect(self.process_finished)
+        self.basis_worker.log_message.connect(self.log_worker_message)
+        self.basis_worker.start()
+    
     def log_worker_message(self, message):
         """Handle log messages from worker threads"""
         logging.info(message)
@@ -896,6 +1091,10 @@ class AutoRelax3D(QMainWindow):
         else:
             self.terminate_auto_re3d_btn.setEnabled(False)
         self.change_filename_btn.setEnabled(False)
+        self.run_batch_btn.setEnabled(False)
+        self.rebuild_changed_btn.setEnabled(False)
+        self.compute_basis_btn.setEnabled(False)
+        self.compose_basis_btn.setEnabled(False)
         logging.info("UI controls disabled during processing")
     
     def enable_ui(self):
@@ -906,6 +1105,10 @@ class AutoRelax3D(QMainWindow):
         self.auto_re3d_large_btn.setEnabled(True)
         self.auto_re3d_small_btn.setEnabled(True)
         self.change_filename_btn.setEnabled(True)
+        self.run_batch_btn.setEnabled(True)
+        self.rebuild_changed_btn.setEnabled(True)
+        self.compute_basis_btn.setEnabled(True)
+        self.compose_basis_btn.setEnabled(True)
         logging.info("UI controls enabled - ready for next operation")
     
     def process_finished(self):
@@ -923,12 +1126,13 @@ class CombineAutomationThread(QThread):
     finished_signal = pyqtSignal()
     error_signal = pyqtSignal(str)
     
-    def __init__(self, file_type, min_value, max_value, folder_path):
+    def __init__(self, file_type, min_value, max_value, folder_path, backend='exe'):
         super().__init__()
         self.file_type = file_type
         self.min_value = min_value
         self.max_value = max_value
         self.folder_path = folder_path
+        self.backend = backend  # 'native' or 'exe'
         self.running = True
         
     def run(self):
@@ -943,6 +1147,10 @@ class CombineAutomationThread(QThread):
                 
             self.update_progress.emit(0, f"Starting to process {total_files} files...")
             
+            if self.backend == 'native':
+                self.run_native_combine(file_list)
+                return
+            
             # Start combine software
             combine_path = self.findcombine_exe()
             if not combine_path:
@@ -1034,36 +1242,18 @@ class CombineAutomationThread(QThread):
         # Let user select the executable
         return None
     
+    def run_native_combine(self, file_list):
+        """Merge the layer files with the native Python combine backend"""
+        start_time = time.perf_counter()
+        output_path = relax3d_io.combine_layer_files(self.folder_path, file_list)
+        elapsed = time.perf_counter() - start_time
+        
+        self.update_progress.emit(100, f"Combined {len(file_list)} files into {output_path} in {elapsed * 1000:.1f} ms")
+        self.finished_signal.emit()
+    
     def generate_file_list(self):
         """Generate list of files within the specified range"""
-        files = []
-        
-        # Generate all possible numeric values in the range
-        values = []
-        current = self.min_value
-        while current <= self.max_value:
-            values.append(current)
-            # Handle decimal increments (.5, .6 etc.)
-            if current == int(current):
-                # If it's a whole number, next check x.5, x.6 etc.
-                for decimal in [0.5, 0.6]:
-                    if current + decimal <= self.max_value:
-                        values.append(current + decimal)
-            current = int(current) + 1
-        
-        # Create filenames and check if they exist
-        for value in values:
-            # Format with or without decimal part
-            if value == int(value):
-                filename = f"{self.file_type}{int(value)}.txt"
-            else:
-                filename = f"{self.file_type}{value}.txt"
-                
-            full_path = os.path.join(self.folder_path, filename)
-            if os.path.exists(full_path):
-                files.append(filename)
-                
-        return files
+        return relax3d_io.generate_file_list(self.folder_path, self.file_type, self.min_value, self.max_value)
     
     def find_window(self, window_name):
         """Find window by name"""
@@ -1129,22 +1319,14 @@ class CombineAutomationThread(QThread):
                 self.update_progress.emit(95, f"Warning: relax3d.dat file not found in {self.folder_path} or current directory")
                 return
                 
-            # Read the file content
-            with open(dat_file_path, 'r') as file:
-                lines = file.readlines()
+            # Strip the header in place (streamed, atomically replaced)
+            removed_lines = relax3d_io.strip_header_lines(dat_file_path)
                 
-            # Check if we have at least 3 lines
-            if len(lines) < 3:
-                self.update_progress.emit(95, f"Warning: relax3d.dat has fewer than 3 lines ({len(lines)} lines found)")
+            # Check if we had at least 3 lines
+            if len(removed_lines) < relax3d_io.HEADER_LINES:
+                self.update_progress.emit(95, f"Warning: relax3d.dat has fewer than 3 lines ({len(removed_lines)} lines found)")
                 return
                 
-            # Store the first 3 lines for logging
-            removed_lines = lines[:3]
-            
-            # Write back the file without the first 3 lines
-            with open(dat_file_path, 'w') as file:
-                file.writelines(lines[3:])
-                
             # Log the removed lines
             log_message = "Removed the following lines from relax3d.dat:\n"
             for i, line in enumerate(removed_lines):
@@ -1244,6 +1426,24 @@ class CombineAutomationGUI(QMainWindow):
         folder_layout.addWidget(self.folder_button)
         folder_group.setLayout(folder_layout)
         
+        # Combine backend selection
+        backend_group = QGroupBox("Combine Backend")
+        backend_layout = QHBoxLayout()
+        
+        self.backend_group = QButtonGroup()
+        self.radio_native = QRadioButton("Native (Python)")
+        self.radio_exe = QRadioButton("combine.exe")
+        self.radio_native.setToolTip("Not yet checked against relax3d.dat written by combine.exe")
+        # combine.exe stays the default until the native backend matches a golden relax3d.dat
+        self.radio_exe.setChecked(True)
+        
+        self.backend_group.addButton(self.radio_native)
+        self.backend_group.addButton(self.radio_exe)
+        
+        backend_layout.addWidget(self.radio_native)
+        backend_layout.addWidget(self.radio_exe)
+        backend_group.setLayout(backend_layout)
+        
         # Control buttons
         buttons_layout = QHBoxLayout()
         
@@ -1277,6 +1477,7 @@ class CombineAutomationGUI(QMainWindow):
         main_layout.addWidget(l_range_group)
         main_layout.addWidget(s_range_group)
         main_layout.addWidget(folder_group)
+        main_layout.addWidget(backend_group)
         main_layout.addLayout(buttons_layout)
         main_layout.addWidget(self.progress_bar)
         main_layout.addWidget(log_group)
@@ -1331,8 +1532,10 @@ class CombineAutomationGUI(QMainWindow):
             QMessageBox.warning(self, "Warning", "Minimum value cannot be greater than maximum value.")
             return
         
+        backend = "native" if self.radio_native.isChecked() else "exe"
+        
         # Create and start the automation thread
-        self.automation_thread = CombineAutomationThread(file_type, min_value, max_value, self.folder_path)
+        self.automation_thread = CombineAutomationThread(file_type, min_value, max_value, self.folder_path, backend)
         self.automation_thread.update_progress.connect(self.update_progress)
         self.automation_thread.finished_signal.connect(self.automation_finished)
         self.automation_thread.error_signal.connect(self.handle_error)
@@ -1344,7 +1547,7 @@ class CombineAutomationGUI(QMainWindow):
         self.stop_button.setEnabled(True)
         self.folder_button.setEnabled(False)
         
-        self.log_message(f"Starting automation for {file_type} files from {min_value} to {max_value}...")
+        self.log_message(f"Starting automation for {file_type} files from {min_value} to {max_value} ({backend} backend)...")
     
     def stop_automation(self):
         """Stop the automation process"""
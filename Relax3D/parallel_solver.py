@@ -0,0 +1,213 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import List, Tuple
+import numpy as np
+import relax3d_io
+import relax_solver
+import slab_solver
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Configuration
+MIN_BLOCK_PLANES = 2           # z planes per worker block (the mirror plane refresh needs the lowest two)
+POLL_INTERVAL = 0.5            # Seconds between progress / termination checks of the parent
+BENCHMARK_WORKERS = (1, 2, 4, 8, 16)
+BENCHMARK_SWEEPS = 10
+# Shared control slots (written by worker 0 between barriers, ABORT by the parent)
+ABORT, ITERATION, CHANGE, STOP = range(4)
+
+
+def worker_count(workers: int = 0) -> int:
+    """Resolve a WORKERS setting (0 or less means one worker per CPU core)"""
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def split_planes(nz: int, workers: int) -> List[Tuple[int, int]]:
+    """Split the interior z planes [1, nz - 1) into contiguous blocks, one per worker"""
+    interior = nz - 2
+    workers = max(1, min(workers, interior // MIN_BLOCK_PLANES))
+    edges = np.linspace(1, nz - 1, workers + 1).round().astype(int)
+    return [(int(k0), int(k1)) for k0, k1 in zip(edges[:-1], edges[1:])]
+
+
+def _attach(name: str, shape: Tuple[int, ...], dtype) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """Map an existing shared memory block as an array"""
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _worker(index: int, k0: int, k1: int, names: Tuple[str, str], shape: Tuple[int, int, int],
+            spacing: Tuple[float, float, float], omega: float, threshold: float, max_iterations: int,
+            mirror_bottom: bool, barrier, changes, control):
+    """Relax planes [k0, k1) of the shared potential, in lockstep with the other workers.
+
+    Each colour is followed by a barrier, so every worker reads the
+    neighbouring blocks' boundary planes directly from shared memory (no
+    halo copies) only after they are final for that colour. Worker 0
+    gathers the largest update of each sweep and decides when to stop.
+    """
+    potential_block, potential = _attach(names[0], shape, np.float64)
+    fixed_block, fixed = _attach(names[1], shape, np.bool_)
+    checker = np.add.outer(np.arange(1, shape[1] - 1), np.arange(1, shape[2] - 1)) % 2
+    skips = [relax_solver.skip_mask(fixed[k0:k1], k0, colour, checker) for colour in (0, 1)]
+    try:
+        iteration = 0
+        while True:
+            change = 0.0
+            for colour in (0, 1):
+                change = max(change, relax_solver.relax_colour(potential, fixed, 0, k0, k1, colour, checker,
+                                                               spacing, omega, skips[colour]))
+                if mirror_bottom and k0 == 1:
+                    potential[0] = potential[2]
+                barrier.wait()
+            changes[index] = change
+            iteration += 1
+            barrier.wait()
+
+            if index == 0:
+                control[ITERATION] = iteration
+                control[CHANGE] = max(changes)
+                control[STOP] = float(control[CHANGE] < threshold or iteration >= max_iterations or control[ABORT])
+            barrier.wait()
+            if control[STOP]:
+                break
+    finally:
+        del potential, fixed
+        potential_block.close()
+        fixed_block.close()
+
+
+def solve_parallel(potential: np.ndarray, fixed: np.ndarray, spacing: Tuple[float, float, float],
+                   tolerance: float = relax_solver.DEFAULT_TOLERANCE,
+                   max_iterations: int = relax_solver.DEFAULT_MAX_ITERATIONS, omega: float = None,
+                   workers: int = 0, should_terminate=lambda: False,
+                   mirror_bottom: bool = False) -> Tuple[np.ndarray, int, float]:
+    """Relax Laplace's equation in place with red-black SOR split over worker processes.
+
+    The grid is cut into z blocks, one per worker; the potential and the
+    electrode mask live in shared memory. Same arguments, stopping rule and
+    result (bit for bit) as relax_solver.solve_sor.
+    Returns (potential, iterations, max update).
+    """
+    if omega is None:
+        omega = relax_solver.optimal_omega(potential.shape, spacing)
+    threshold = tolerance * max(float(np.abs(potential).max()), 1.0)
+    blocks = split_planes(potential.shape[0], worker_count(workers))
+    nz, ny, nx = potential.shape
+    logging.info(f"Parallel SOR: grid {nx}x{ny}x{nz - mirror_bottom}, omega = {omega:.4f}, {len(blocks)} workers"
+                 f"{', mirror plane at the bottom face' if mirror_bottom else ''}")
+
+    context = multiprocessing.get_context()
+    potential_block = shared_memory.SharedMemory(create=True, size=potential.nbytes)
+    fixed_block = shared_memory.SharedMemory(create=True, size=fixed.nbytes)
+    processes = []
+    shared = None
+    try:
+        shared = np.ndarray(potential.shape, dtype=np.float64, buffer=potential_block.buf)
+        shared[...] = potential
+        np.ndarray(fixed.shape, dtype=np.bool_, buffer=fixed_block.buf)[...] = fixed
+
+        barrier = context.Barrier(len(blocks))
+        changes = context.Array('d', len(blocks), lock=False)
+        control = context.Array('d', 4, lock=False)
+        names = (potential_block.name, fixed_block.name)
+        for index, (k0, k1) in enumerate(blocks):
+            process = context.Process(target=_worker, daemon=True,
+                                      args=(index, k0, k1, names, potential.shape, spacing, omega, threshold,
+                                            max_iterations, mirror_bottom, barrier, changes, control))
+            process.start()
+            processes.append(process)
+
+        logged = 0
+        while any(process.is_alive() for process in processes):
+            processes[0].join(POLL_INTERVAL)
+            if should_terminate():
+                control[ABORT] = 1.0
+            if any(process.exitcode not in (None, 0) for process in processes):
+                barrier.abort()
+                raise RuntimeError("A parallel SOR worker failed")
+            if control[ITERATION] - logged >= relax_solver.LOG_EVERY:
+                logged = int(control[ITERATION]) // relax_solver.LOG_EVERY * relax_solver.LOG_EVERY
+                logging.info(f"Parallel SOR iteration {int(control[ITERATION])}: max update {control[CHANGE]:.3e}")
+
+        potential[...] = shared
+        return potential, int(control[ITERATION]), float(control[CHANGE])
+    finally:
+        shared = None  # Release the buffer before closing the block
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        potential_block.close()
+        potential_block.unlink()
+        fixed_block.close()
+        fixed_block.unlink()
+
+
+def benchmark(potential: np.ndarray, fixed: np.ndarray, spacing: Tuple[float, float, float],
+              worker_counts=BENCHMARK_WORKERS, sweeps: int = BENCHMARK_SWEEPS) -> List[dict]:
+    """Time `sweeps` red-black sweeps at each worker count and compare with the serial solve_sor"""
+    omega = relax_solver.optimal_omega(potential.shape, spacing)
+    points = potential.size
+
+    reference = potential.copy()
+    start_time = time.perf_counter()
+    relax_solver.solve_sor(reference, fixed, spacing, 0.0, sweeps, omega)
+    serial = time.perf_counter() - start_time
+    logging.info(f"serial SOR: {serial:.2f} s for {sweeps} sweeps ({points * sweeps / serial / 1e6:.1f} M point "
+                 f"updates/s), {os.cpu_count()} CPU cores available")
+
+    results = []
+    for workers in worker_counts:
+        trial = potential.copy()
+        start_time = time.perf_counter()
+        solve_parallel(trial, fixed, spacing, 0.0, sweeps, omega, workers)
+        elapsed = time.perf_counter() - start_time
+        result = {'workers': workers, 'blocks': len(split_planes(potential.shape[0], workers)),
+                  'seconds': elapsed, 'points_per_second': points * sweeps / elapsed,
+                  'speedup': serial / elapsed, 'max_difference': float(np.abs(trial - reference).max())}
+        logging.info(f"{workers:2d} workers: {elapsed:.2f} s ({result['points_per_second'] / 1e6:.1f} M point "
+                     f"updates/s), speedup {result['speedup']:.2f}x vs serial, "
+                     f"efficiency {result['speedup'] / result['blocks']:.0%}, "
+                     f"max |difference| {result['max_difference']:.3e} V")
+        results.append(result)
+    return results
+
+
+# Main function for direct script execution
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Parallel (shared-memory) red-black SOR scaling benchmark")
+    parser.add_argument('option', choices=['L', 'S'], help="Grid from [Commands-L] or [Commands-S]")
+    parser.add_argument('--config', default='config_main.ini')
+    parser.add_argument('--input', default=None,
+                        help="relax3d.dat to relax (default: R3D_PATH/relax3d.dat, or a synthetic layout if missing)")
+    parser.add_argument('--workers', type=int, nargs='+', default=list(BENCHMARK_WORKERS))
+    parser.add_argument('--sweeps', type=int, default=BENCHMARK_SWEEPS)
+    args = parser.parse_args(argv)
+
+    config = relax_solver.load_config(args.config)
+    spec = relax3d_io.load_grid_spec(args.option, config)
+    dat_path = args.input or os.path.join(config.get('Paths', 'R3D_PATH', fallback='.'), relax3d_io.RELAX3D_DAT)
+    if os.path.exists(dat_path):
+        fixed, potential = relax3d_io.read_electrodes(dat_path, spec)
+        logging.info(f"Benchmarking on {dat_path}")
+    else:
+        with tempfile.TemporaryDirectory() as work_dir:
+            potential, fixed = slab_solver.synthetic_case(spec, work_dir, args.option)
+            potential, fixed = np.array(potential), np.array(fixed)
+            slab_solver.remove_work_files(work_dir, args.option)
+        logging.info(f"{dat_path} not found, benchmarking on a synthetic electrode layout")
+
+    benchmark(potential, fixed, spec.spacing, args.workers, args.sweeps)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
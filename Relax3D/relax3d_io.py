@@ -0,0 +1,563 @@
+import os
+import sys
+import time
+import hashlib
+import shutil
+import logging
+import argparse
+import tempfile
+import configparser
+from typing import Iterator, List, Tuple
+import numpy as np
+import yaml
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Configuration
+RELAX3D_DAT = 'relax3d.dat'
+HEADER_LINES = 3               # combine.exe writes a 3 line header into relax3d.dat
+COPY_BLOCK_SIZE = 1024 * 1024  # 1 MB blocks for streaming copies
+DECIMAL_STEPS = [0.5, 0.6]     # Layer suffixes such as L2.5 / L2.6
+RELAX3D_OUT = 'RELAX3D_V.OUT'
+# Experimental: the relax3d.dat, RELAX3D_V.OUT and convert.dat layouts are inferred, not yet confirmed
+# against files written by relax2000 / combine.exe (tests/data holds hand-written samples of them)
+VALUES_PER_LINE = 6            # Potential values per line in RELAX3D_V.OUT
+CM_TO_MM = 10.0                # config_layers.yaml and DXF files use cm, INIT_COMMANDS mm
+ELECTRODE_RECORD_FORMAT = '%d %d %d %g\r\n'
+WRITE_BLOCK_RECORDS = 65536    # Records formatted per block when writing layer files
+READ_BLOCK_SIZE = 16 * 1024 * 1024  # relax3d.dat bytes parsed per block when streaming records
+GRID_EXTENSION = '.r3dg'
+GRID_MAGIC = b'R3DGRID\x00'
+GRID_VERSION = 1
+GRID_HEADER_SIZE = 128         # Data starts here, so the array can be memory-mapped directly
+GRID_KIND_POTENTIAL = 0        # Dense potential (RELAX3D_V.OUT)
+GRID_KIND_ELECTRODES = 1       # Electrode potentials, NaN on free points (relax3d.dat)
+GRID_HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('kind', '<u4'),
+    ('itemsize', '<u4'),
+    ('dims', '<u4', (3,)),     # nx, ny, nz
+    ('origin', '<f8', (3,)),   # mm
+    ('spacing', '<f8', (3,)),  # mm
+])
+
+
+class GridSpec:
+    """Relax3D grid description: point counts, spacing (mm) and origin (mm)"""
+
+    def __init__(self, dims: Tuple[int, int, int], spacing: Tuple[float, float, float],
+                 origin: Tuple[float, float, float] = (0.0, 0.0, 0.0)):
+        self.nx, self.ny, self.nz = (int(n) for n in dims)
+        self.hx, self.hy, self.hz = (float(h) for h in spacing)
+        self.x0, self.y0, self.z0 = (float(o) for o in origin)
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        """Array shape in (z, y, x) order, matching the x-fastest file layout"""
+        return (self.nz, self.ny, self.nx)
+
+    @property
+    def spacing(self) -> Tuple[float, float, float]:
+        return (self.hx, self.hy, self.hz)
+
+    @property
+    def origin(self) -> Tuple[float, float, float]:
+        return (self.x0, self.y0, self.z0)
+
+    def axes(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Grid point coordinates (mm) along x, y and z"""
+        return (self.x0 + self.hx * np.arange(self.nx),
+                self.y0 + self.hy * np.arange(self.ny),
+                self.z0 + self.hz * np.arange(self.nz))
+
+    def __repr__(self):
+        return (f"GridSpec(dims=({self.nx}, {self.ny}, {self.nz}), "
+                f"spacing=({self.hx}, {self.hy}, {self.hz}), origin=({self.x0}, {self.y0}, {self.z0}))")
+
+
+def grid_spec_from_exec_cmd(exec_cmd: List[List[str]]) -> GridSpec:
+    """Build a GridSpec from a config_layers.yaml exec_cmd (origin, spacing in cm, interval counts)"""
+    x0, y0, z0, hx, hy, hz, nx, ny = (float(value) for value in exec_cmd[0][:8])
+    nz = float(exec_cmd[1][0])
+    return GridSpec((int(nx) + 1, int(ny) + 1, int(nz) + 1),
+                    (hx * CM_TO_MM, hy * CM_TO_MM, hz * CM_TO_MM),
+                    (x0 * CM_TO_MM, y0 * CM_TO_MM, z0 * CM_TO_MM))
+
+
+def parse_init_commands(init_commands: str, origin: Tuple[float, float, float] = (0.0, 0.0, 0.0)) -> GridSpec:
+    """Build a GridSpec from an INIT_COMMANDS string such as '601 601 66, OPT 1, 0.4 0.4 0.4, INIT'"""
+    numeric_groups = []
+    for cmd in init_commands.split(','):
+        tokens = cmd.split()
+        try:
+            numeric_groups.append([float(token) for token in tokens])
+        except ValueError:
+            continue  # OPT 1 / INIT and other keyword commands
+
+    groups = [group for group in numeric_groups if len(group) == 3]
+    if len(groups) < 2:
+        raise ValueError(f"Cannot read grid dims and spacing from INIT_COMMANDS: {init_commands}")
+    return GridSpec(groups[0], groups[1], origin)
+
+
+def load_grid_spec(option: str, config: configparser.ConfigParser, layers_config_path: str = 'config_layers.yaml') -> GridSpec:
+    """Build the GridSpec of the L or S area from config_main.ini and config_layers.yaml"""
+    init_commands = config.get(f'Commands-{option}', 'INIT_COMMANDS')
+
+    origin = (0.0, 0.0, 0.0)
+    if os.path.exists(layers_config_path):
+        with open(layers_config_path, 'r') as file:
+            layers_config = yaml.safe_load(file)
+        exec_cmd = layers_config.get('options', {}).get(option, {}).get('exec_cmd')
+        if exec_cmd:
+            origin = grid_spec_from_exec_cmd(exec_cmd).origin
+
+    return parse_init_commands(init_commands, origin)
+
+
+def read_electrodes(file_path: str, spec: GridSpec) -> Tuple[np.ndarray, np.ndarray]:
+    """Read relax3d.dat electrode records into (fixed mask, fixed potential) arrays.
+
+    Each record is 'i j k potential' with 1-based grid indices; every listed
+    point is an electrode (Dirichlet) point held at its potential. Binary
+    electrode grids are read as well. Experimental: the record layout is
+    assumed (see the note on the layouts at the top).
+    """
+    if is_grid_file(file_path):
+        _, _, grid = open_grid(file_path)
+        fixed = ~np.isnan(grid)
+        return fixed, np.where(fixed, grid, 0.0)
+
+    records = np.fromfile(file_path, sep=' ')
+    if records.size % 4:
+        raise ValueError(f"{file_path}: expected 'i j k potential' records, got {records.size} values")
+    records = records.reshape(-1, 4)
+
+    i = records[:, 0].astype(np.intp) - 1
+    j = records[:, 1].astype(np.intp) - 1
+    k = records[:, 2].astype(np.intp) - 1
+    inside = (i >= 0) & (i < spec.nx) & (j >= 0) & (j < spec.ny) & (k >= 0) & (k < spec.nz)
+    if not inside.all():
+        logging.warning(f"{file_path}: ignoring {np.count_nonzero(~inside)} records outside the {spec.nx}x{spec.ny}x{spec.nz} grid")
+
+    fixed = np.zeros(spec.shape, dtype=bool)
+    values = np.zeros(spec.shape, dtype=np.float64)
+    fixed[k[inside], j[inside], i[inside]] = True
+    values[k[inside], j[inside], i[inside]] = records[inside, 3]
+    return fixed, values
+
+
+def read_electrode_blocks(file_path: str, block_size: int = READ_BLOCK_SIZE) -> Iterator[np.ndarray]:
+    """Yield the relax3d.dat records as (n, 4) arrays, one block of the file at a time.
+
+    Memory stays bounded by `block_size` however large the file is; blocks
+    are cut at line ends so no record is split.
+    """
+    with open(file_path, 'rb') as file:
+        tail = b''
+        while True:
+            chunk = file.read(block_size)
+            if not chunk:
+                break
+            chunk = tail + chunk
+            cut = chunk.rfind(b'\n') + 1
+            tail = chunk[cut:]
+            if cut:
+                yield _parse_records(file_path, chunk[:cut])
+        if tail.strip():
+            yield _parse_records(file_path, tail)
+
+
+def _parse_records(file_path: str, text: bytes) -> np.ndarray:
+    """Parse whole 'i j k potential' lines into an (n, 4) array"""
+    values = np.fromstring(text.decode('ascii'), sep=' ')
+    if values.size % 4:
+        raise ValueError(f"{file_path}: expected 'i j k potential' records, got a block of {values.size} values")
+    return values.reshape(-1, 4)
+
+
+def write_electrodes(file_path: str, records: np.ndarray):
+    """Write electrode records ('i j k potential', 1-based indices) in the relax3d.dat layout.
+
+    Records are formatted in blocks with one C-level string format per
+    block and written through a large buffer, instead of line by line.
+    """
+    records = np.asarray(records, dtype=np.float64)
+    indices = records[:, :3].astype(np.int64)
+    potentials = records[:, 3]
+    with open(file_path, 'wb', buffering=COPY_BLOCK_SIZE) as file:
+        for start in range(0, len(records), WRITE_BLOCK_RECORDS):
+            stop = min(start + WRITE_BLOCK_RECORDS, len(records))
+            fields = zip(indices[start:stop, 0].tolist(), indices[start:stop, 1].tolist(),
+                         indices[start:stop, 2].tolist(), potentials[start:stop].tolist())
+            block = ELECTRODE_RECORD_FORMAT * (stop - start) % tuple(value for record in fields for value in record)
+            file.write(block.encode('ascii'))
+
+
+def write_potential(file_path: str, potential: np.ndarray):
+    """Write a potential array in RELAX3D_V.OUT layout (x fastest, 6 values per line)"""
+    flat = np.ascontiguousarray(potential, dtype=np.float64).ravel()
+    line_format = '%14.6E' * VALUES_PER_LINE + '\n'
+    block_values = WRITE_BLOCK_RECORDS * VALUES_PER_LINE
+    with open(file_path, 'wb', buffering=COPY_BLOCK_SIZE) as file:
+        for start in range(0, flat.size, block_values):
+            values = flat[start:start + block_values].tolist()
+            full_lines = len(values) // VALUES_PER_LINE
+            text = line_format * full_lines % tuple(values[:full_lines * VALUES_PER_LINE])
+            remainder = values[full_lines * VALUES_PER_LINE:]
+            if remainder:
+                text += '%14.6E' * len(remainder) % tuple(remainder) + '\n'
+            file.write(text.encode('ascii'))
+
+
+def is_grid_file(file_path: str) -> bool:
+    """True if the file is a binary grid container"""
+    with open(file_path, 'rb') as file:
+        return file.read(len(GRID_MAGIC)) == GRID_MAGIC
+
+
+def write_grid(file_path: str, values: np.ndarray, spec: GridSpec, kind: int = GRID_KIND_POTENTIAL,
+               dtype=np.float64):
+    """Write a (z, y, x) array as a binary grid container (header + contiguous little-endian array)"""
+    data_dtype = np.dtype(dtype).newbyteorder('<')
+    with open(file_path, 'wb', buffering=COPY_BLOCK_SIZE) as file:
+        file.write(_grid_header(spec, kind, dtype))
+        # Plane by plane, so a float64 -> float32 conversion never needs a full copy
+        for plane in np.asarray(values).reshape(spec.shape):
+            file.write(np.ascontiguousarray(plane, dtype=data_dtype).tobytes())
+
+
+def create_grid(file_path: str, spec: GridSpec, kind: int = GRID_KIND_POTENTIAL, dtype=np.float64) -> np.memmap:
+    """Create a zero-filled binary grid container and return it memory-mapped for writing.
+
+    The array is never held in memory, so the grid may be larger than RAM.
+    """
+    with open(file_path, 'wb') as file:
+        file.write(_grid_header(spec, kind, dtype))
+        file.truncate(GRID_HEADER_SIZE + spec.nx * spec.ny * spec.nz * np.dtype(dtype).itemsize)
+    return open_grid(file_path, 'r+')[2]
+
+
+def _grid_header(spec: GridSpec, kind: int, dtype) -> bytes:
+    """Binary grid container header, padded to GRID_HEADER_SIZE"""
+    header = np.zeros(1, dtype=GRID_HEADER_DTYPE)
+    header['magic'] = GRID_MAGIC
+    header['version'] = GRID_VERSION
+    header['kind'] = kind
+    header['itemsize'] = np.dtype(dtype).itemsize
+    header['dims'] = (spec.nx, spec.ny, spec.nz)
+    header['origin'] = spec.origin
+    header['spacing'] = spec.spacing
+    return header.tobytes().ljust(GRID_HEADER_SIZE, b'\x00')
+
+
+def open_grid(file_path: str, mode: str = 'r') -> Tuple[GridSpec, int, np.memmap]:
+    """Open a binary grid container as (spec, kind, memory-mapped (z, y, x) array)"""
+    with open(file_path, 'rb') as file:
+        raw = file.read(GRID_HEADER_DTYPE.itemsize)
+    if raw[:len(GRID_MAGIC)] != GRID_MAGIC or len(raw) < GRID_HEADER_DTYPE.itemsize:
+        raise ValueError(f"{file_path} is not a binary grid file")
+    header = np.frombuffer(raw, dtype=GRID_HEADER_DTYPE)[0]
+    if header['version'] > GRID_VERSION:
+        raise ValueError(f"{file_path}: unsupported grid file version {header['version']}")
+
+    spec = GridSpec(header['dims'], header['spacing'], header['origin'])
+    dtype = np.dtype('<f4' if header['itemsize'] == 4 else '<f8')
+    values = np.memmap(file_path, dtype=dtype, mode=mode, offset=GRID_HEADER_SIZE, shape=spec.shape)
+    return spec, int(header['kind']), values
+
+
+def read_convert_dat(file_path: str) -> GridSpec:
+    """Read the grid description from convert.dat (.head).
+
+    The first 9 numbers are taken as origin x y z, spacing x y z (cm) and
+    the x y z interval counts, i.e. the exec_cmd values typed into
+    2_initial. Experimental: this order is a guess from the exec_cmd.
+    """
+    values = np.fromfile(file_path, sep=' ')
+    if values.size < 9:
+        raise ValueError(f"{file_path}: expected origin, spacing and interval counts, got {values.size} values")
+    x0, y0, z0, hx, hy, hz, nx, ny, nz = values[:9]
+    return grid_spec_from_exec_cmd([[x0, y0, z0, hx, hy, hz, nx, ny], [nz]])
+
+
+def potential_to_grid(text_path: str, grid_path: str, spec: GridSpec, dtype=np.float64):
+    """Convert RELAX3D_V.OUT (or a renamed .efld) to a binary grid container"""
+    write_grid(grid_path, read_potential(text_path, spec), spec, GRID_KIND_POTENTIAL, dtype)
+
+
+def grid_to_potential(grid_path: str, text_path: str):
+    """Convert a binary potential grid back to the RELAX3D_V.OUT text layout"""
+    _, kind, values = open_grid(grid_path)
+    if kind != GRID_KIND_POTENTIAL:
+        raise ValueError(f"{grid_path} holds electrodes, not a potential")
+    write_potential(text_path, values)
+
+
+def electrodes_to_grid(dat_path: str, grid_path: str, spec: GridSpec, dtype=np.float64):
+    """Convert relax3d.dat electrode records to a binary grid (NaN on free points)"""
+    fixed, values = read_electrodes(dat_path, spec)
+    write_grid(grid_path, np.where(fixed, values, np.nan), spec, GRID_KIND_ELECTRODES, dtype)
+
+
+def grid_to_electrodes(grid_path: str, dat_path: str):
+    """Convert a binary electrode grid back to relax3d.dat records"""
+    _, kind, values = open_grid(grid_path)
+    if kind != GRID_KIND_ELECTRODES:
+        raise ValueError(f"{grid_path} holds a potential, not electrodes")
+    k, j, i = np.nonzero(~np.isnan(values))
+    write_electrodes(dat_path, np.column_stack((i + 1, j + 1, k + 1, values[k, j, i])))
+
+
+def latest_solution_path(r3d_path: str, option: str) -> str:
+    """Binary copy of the last potential solved on the L or S grid"""
+    return os.path.join(r3d_path, f"RELAX3D_V_{option}{GRID_EXTENSION}")
+
+
+def read_potential(file_path: str, spec: GridSpec) -> np.ndarray:
+    """Read a RELAX3D_V.OUT potential file (text or binary grid) into a (z, y, x) array.
+
+    Experimental for relax2000 output: the x-fastest text order is assumed,
+    and only the value count is checked ([Solver] RELAX2000_CHECKS).
+    """
+    if is_grid_file(file_path):
+        grid_spec, _, values = open_grid(file_path)
+        if grid_spec.shape != spec.shape:
+            raise ValueError(f"{file_path}: grid is {grid_spec.nx}x{grid_spec.ny}x{grid_spec.nz}, expected {spec.nx}x{spec.ny}x{spec.nz}")
+        return np.asarray(values, dtype=np.float64)
+
+    values = np.fromfile(file_path, sep=' ')
+    expected = spec.nx * spec.ny * spec.nz
+    if values.size != expected:
+        raise ValueError(f"{file_path}: expected {expected} potential values, got {values.size}")
+    return values.reshape(spec.shape)
+
+
+def generate_file_list(folder_path: str, file_type: str, min_value: float, max_value: float) -> List[str]:
+    """Generate the list of divided layer files (e.g. L1.txt, L2.5.txt) within the range"""
+    files = []
+
+    # Generate all possible numeric values in the range
+    values = []
+    current = min_value
+    while current <= max_value:
+        values.append(current)
+        # Handle decimal increments (.5, .6 etc.)
+        if current == int(current):
+            # If it's a whole number, next check x.5, x.6 etc.
+            for decimal in DECIMAL_STEPS:
+                if current + decimal <= max_value:
+                    values.append(current + decimal)
+        current = int(current) + 1
+
+    # Create filenames and check if they exist
+    for value in values:
+        # Format with or without decimal part
+        if value == int(value):
+            filename = f"{file_type}{int(value)}.txt"
+        else:
+            filename = f"{file_type}{value}.txt"
+
+        full_path = os.path.join(folder_path, filename)
+        if os.path.exists(full_path):
+            files.append(filename)
+
+    return files
+
+
+def combine_layer_files(folder_path: str, file_list: List[str], output_path: str = None) -> str:
+    """Merge divided layer files into relax3d.dat in one streaming pass.
+
+    This is the native replacement for combine.exe: the layer files are
+    appended in the given order and no header is written, so the result is
+    identical to a combine.exe output after its first 3 lines are removed.
+    """
+    if output_path is None:
+        output_path = os.path.join(folder_path, RELAX3D_DAT)
+
+    with open(output_path, 'wb') as output_file:
+        for file_name in file_list:
+            with open(os.path.join(folder_path, file_name), 'rb') as layer_file:
+                last_byte = b''
+                while True:
+                    block = layer_file.read(COPY_BLOCK_SIZE)
+                    if not block:
+                        break
+                    output_file.write(block)
+                    last_byte = block[-1:]
+            # Keep records of consecutive layers on separate lines
+            if last_byte and last_byte != b'\n':
+                output_file.write(b'\r\n')
+            logging.info(f"Combined {file_name}")
+
+    return output_path
+
+
+def strip_header_lines(file_path: str, count: int = HEADER_LINES) -> List[str]:
+    """Remove the first lines of a file in place and return them.
+
+    The remainder is streamed in large binary blocks into a temporary file in
+    the same folder, which is then atomically renamed over the original, so
+    peak memory does not depend on the file size and an interrupted run leaves
+    the original file untouched. If the file has fewer than `count` lines it
+    is not modified.
+    """
+    folder_path = os.path.dirname(os.path.abspath(file_path))
+
+    with open(file_path, 'rb') as source_file:
+        removed_lines = []
+        for _ in range(count):
+            line = source_file.readline()
+            if not line:
+                break
+            removed_lines.append(line.decode(errors='replace'))
+
+        if len(removed_lines) < count:
+            return removed_lines
+
+        temp_fd, temp_path = tempfile.mkstemp(prefix='.relax3d_', suffix='.tmp', dir=folder_path)
+        try:
+            with os.fdopen(temp_fd, 'wb') as temp_file:
+                shutil.copyfileobj(source_file, temp_file, COPY_BLOCK_SIZE)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            # mkstemp creates the file with mode 0600: keep the original's permissions
+            shutil.copymode(file_path, temp_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    os.replace(temp_path, file_path)
+    return removed_lines
+
+
+def file_digest(file_path: str) -> str:
+    """SHA-256 hex digest of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        while True:
+            block = file.read(COPY_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def files_identical(path_a: str, path_b: str) -> bool:
+    """Compare two files byte for byte"""
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    with open(path_a, 'rb') as file_a, open(path_b, 'rb') as file_b:
+        while True:
+            block_a = file_a.read(COPY_BLOCK_SIZE)
+            block_b = file_b.read(COPY_BLOCK_SIZE)
+            if block_a != block_b:
+                return False
+            if not block_a:
+                return True
+
+
+def link_or_copy(source_path: str, target_path: str) -> str:
+    """Make target_path a hard link to source_path, or a copy where links are not possible.
+
+    Returns 'linked' or 'copied'. Writers of a linked file must replace it
+    (remove, then write) rather than rewrite it in place.
+    """
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    try:
+        os.link(source_path, target_path)
+        return 'linked'
+    except OSError:
+        shutil.copyfile(source_path, target_path)
+        return 'copied'
+
+
+# Main function for direct script execution
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Native Relax3D file tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    combine_parser = subparsers.add_parser('combine', help="Merge L{n}.txt / S{n}.txt files into relax3d.dat")
+    combine_parser.add_argument('folder', help="Folder containing the divided layer files")
+    combine_parser.add_argument('file_type', choices=['L', 'S'])
+    combine_parser.add_argument('min_value', type=float)
+    combine_parser.add_argument('max_value', type=float)
+    combine_parser.add_argument('--output', help="Output path (default: <folder>/relax3d.dat)")
+    combine_parser.add_argument('--reference', help="Reference relax3d.dat to compare against byte for byte")
+
+    strip_parser = subparsers.add_parser('strip', help="Remove the combine.exe header from relax3d.dat in place")
+    strip_parser.add_argument('file', nargs='?', default=RELAX3D_DAT)
+
+    for command, help_text in (('to-binary', "Convert RELAX3D_V.OUT / .efld or relax3d.dat to a binary grid"),
+                               ('to-text', "Convert a binary grid back to RELAX3D_V.OUT or relax3d.dat text")):
+        convert_parser = subparsers.add_parser(command, help=help_text)
+        convert_parser.add_argument('input')
+        convert_parser.add_argument('output', nargs='?', default=None)
+        if command == 'to-binary':
+            convert_parser.add_argument('--kind', choices=['potential', 'electrodes'], default='potential')
+            convert_parser.add_argument('--option', choices=['L', 'S'], default='L',
+                                        help="Grid from config_main.ini / config_layers.yaml")
+            convert_parser.add_argument('--head', default=None, help="convert.dat / .head file describing the grid")
+            convert_parser.add_argument('--float32', action='store_true', help="Store single precision")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'to-binary':
+        if args.head:
+            spec = read_convert_dat(args.head)
+        else:
+            config = configparser.ConfigParser()
+            config.read('config_main.ini')
+            spec = load_grid_spec(args.option, config)
+        output_path = args.output or os.path.splitext(args.input)[0] + GRID_EXTENSION
+        dtype = np.float32 if args.float32 else np.float64
+        start_time = time.perf_counter()
+        if args.kind == 'potential':
+            potential_to_grid(args.input, output_path, spec, dtype)
+        else:
+            electrodes_to_grid(args.input, output_path, spec, dtype)
+        logging.info(f"Converted {args.input} -> {output_path} in {time.perf_counter() - start_time:.2f} s")
+
+    elif args.command == 'to-text':
+        _, kind, _ = open_grid(args.input)
+        default_name = RELAX3D_OUT if kind == GRID_KIND_POTENTIAL else RELAX3D_DAT
+        output_path = args.output or os.path.join(os.path.dirname(args.input), default_name)
+        if kind == GRID_KIND_POTENTIAL:
+            grid_to_potential(args.input, output_path)
+        else:
+            grid_to_electrodes(args.input, output_path)
+        logging.info(f"Converted {args.input} -> {output_path}")
+
+    elif args.command == 'combine':
+        file_list = generate_file_list(args.folder, args.file_type, args.min_value, args.max_value)
+        if not file_list:
+            logging.error("No matching files found in the selected range.")
+            return 1
+
+        start_time = time.perf_counter()
+        output_path = combine_layer_files(args.folder, file_list, args.output)
+        elapsed = time.perf_counter() - start_time
+        logging.info(f"Combined {len(file_list)} files into {output_path} in {elapsed * 1000:.1f} ms")
+
+        if args.reference:
+            if files_identical(output_path, args.reference):
+                logging.info(f"Output matches reference {args.reference}")
+            else:
+                logging.error(f"Output differs from reference {args.reference}")
+                return 1
+
+    elif args.command == 'strip':
+        removed_lines = strip_header_lines(args.file)
+        if len(removed_lines) < HEADER_LINES:
+            logging.warning(f"{args.file} has fewer than {HEADER_LINES} lines ({len(removed_lines)} lines found)")
+            return 1
+        for i, line in enumerate(removed_lines):
+            logging.info(f"Removed line {i+1}: {line.strip()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
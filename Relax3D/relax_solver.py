@@ -0,0 +1,812 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import configparser
+from typing import List, Optional, Tuple
+import numpy as np
+import relax3d_io
+import field_map
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Configuration
+DEFAULT_TOLERANCE = 1e-6       # Max potential change per sweep (relative to max |V|)
+DEFAULT_MAX_ITERATIONS = 20000
+LOG_EVERY = 100                # Log convergence every N iterations
+MULTIGRID_MAX_CYCLES = 50
+MULTIGRID_MAX_LEVELS = 8
+MULTIGRID_COARSEST_POINTS = 20000  # Coarsest level is relaxed directly
+MULTIGRID_SMOOTHING_STEPS = 2      # Red-black Gauss-Seidel sweeps before/after each coarse correction
+MULTIGRID_COARSEST_SWEEPS = 50
+NESTED_INTERPOLATION = 'cubic'     # Sampling of the L solution onto the S grid
+MEDIAN_PLANE_TOLERANCE = 1e-6      # A z plane this close (mm) to z = 0 is the median plane
+SYMMETRY_MODES = ('off', 'auto', 'on')
+CHANGED_ELECTRODE_TOLERANCE = 1e-9  # Relative potential difference counted as an edited electrode point
+
+
+def load_config(config_file: str) -> configparser.ConfigParser:
+    """Load and return the configuration from the specified file."""
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    return config
+
+
+def get_solver_settings(config: configparser.ConfigParser) -> dict:
+    """Read the [Solver] section of config_main.ini (all keys optional)"""
+    omega = config.get('Solver', 'OMEGA', fallback='').strip()
+    return {
+        'tolerance': config.getfloat('Solver', 'TOLERANCE', fallback=DEFAULT_TOLERANCE),
+        'max_iterations': config.getint('Solver', 'MAX_ITERATIONS', fallback=DEFAULT_MAX_ITERATIONS),
+        'omega': float(omega) if omega else None,
+        'multigrid_tolerance': config.getfloat('Solver', 'MULTIGRID_TOLERANCE', fallback=DEFAULT_TOLERANCE),
+        'multigrid_max_cycles': config.getint('Solver', 'MULTIGRID_MAX_CYCLES', fallback=MULTIGRID_MAX_CYCLES),
+        'symmetry': config.get('Solver', 'SYMMETRY', fallback='auto').strip().lower() or 'auto',
+        'workers': config.getint('Solver', 'WORKERS', fallback=0),
+    }
+
+
+def stencil_weights(spacing: Tuple[float, float, float]) -> Tuple[float, float, float]:
+    """Return the 7-point Laplacian weights (1/hx^2, 1/hy^2, 1/hz^2)"""
+    hx, hy, hz = spacing
+    return (1.0 / hx ** 2, 1.0 / hy ** 2, 1.0 / hz ** 2)
+
+
+def optimal_omega(shape: Tuple[int, int, int], spacing: Tuple[float, float, float]) -> float:
+    """Estimate the optimal SOR factor from the Jacobi spectral radius of the grid"""
+    nz, ny, nx = shape
+    wx, wy, wz = stencil_weights(spacing)
+    rho = (wx * np.cos(np.pi / max(nx - 1, 1)) + wy * np.cos(np.pi / max(ny - 1, 1))
+           + wz * np.cos(np.pi / max(nz - 1, 1))) / (wx + wy + wz)
+    return 2.0 / (1.0 + np.sqrt(max(1.0 - rho ** 2, 0.0)))
+
+
+def neighbour_average(potential: np.ndarray, spacing: Tuple[float, float, float]) -> np.ndarray:
+    """Weighted 6-neighbour average over the interior points (the Gauss-Seidel target)"""
+    wx, wy, wz = stencil_weights(spacing)
+    v = potential
+    total = wx * (v[1:-1, 1:-1, 2:] + v[1:-1, 1:-1, :-2])
+    total += wy * (v[1:-1, 2:, 1:-1] + v[1:-1, :-2, 1:-1])
+    total += wz * (v[2:, 1:-1, 1:-1] + v[:-2, 1:-1, 1:-1])
+    total *= 1.0 / (2.0 * (wx + wy + wz))
+    return total
+
+
+def red_black_masks(fixed: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the free interior points of each checkerboard colour"""
+    nz, ny, nx = fixed.shape
+    k, j, i = np.ogrid[1:nz - 1, 1:ny - 1, 1:nx - 1]
+    red = (i + j + k) % 2 == 0
+    free = ~fixed[1:-1, 1:-1, 1:-1]
+    return red & free, ~red & free
+
+
+def relax_colour(window: np.ndarray, window_fixed: np.ndarray, lo: int, p0: int, p1: int, colour: int,
+                 checker: np.ndarray, spacing: Tuple[float, float, float], omega: float,
+                 skip: np.ndarray = None) -> float:
+    """SOR update of one colour on grid planes [p0, p1) of `window`, whose first plane is grid plane `lo`.
+
+    `checker` is (i + j) % 2 over the interior of a plane. Only the planes
+    [p0 - 1, p1 + 1) are read and only [p0, p1) are written, so blocks of
+    planes can be relaxed independently (out-of-core slabs, parallel workers).
+    `skip` is the precomputed skip_mask of these planes, if the caller keeps it.
+    Returns the largest update.
+    """
+    v = window[p0 - 1 - lo:p1 + 1 - lo]
+    interior = v[1:-1, 1:-1, 1:-1]
+    update = neighbour_average(v, spacing)
+    update -= interior
+    update *= omega
+    if skip is None:
+        skip = skip_mask(window_fixed[p0 - lo:p1 - lo], p0, colour, checker)
+    update[skip] = 0.0
+    interior += update
+    return float(np.abs(update).max())
+
+
+def skip_mask(fixed_planes: np.ndarray, k0: int, colour: int, checker: np.ndarray) -> np.ndarray:
+    """Interior points of grid planes k0.. that a `colour` sweep leaves alone (other colour or electrode)"""
+    # (i + j + k) % 2 == colour selects the points of this colour
+    skip = checker != ((np.arange(k0, k0 + len(fixed_planes)) + colour) % 2)[:, None, None]
+    skip |= fixed_planes[:, 1:-1, 1:-1]
+    return skip
+
+
+def residual(potential: np.ndarray, fixed: np.ndarray, spacing: Tuple[float, float, float]) -> np.ndarray:
+    """Discrete Laplace residual over the interior, in volts (zero on electrode points)"""
+    res = neighbour_average(potential, spacing)
+    res -= potential[1:-1, 1:-1, 1:-1]
+    res[fixed[1:-1, 1:-1, 1:-1]] = 0.0
+    return res
+
+
+def solve_sor(potential: np.ndarray, fixed: np.ndarray, spacing: Tuple[float, float, float],
+              tolerance: float = DEFAULT_TOLERANCE, max_iterations: int = DEFAULT_MAX_ITERATIONS,
+              omega: Optional[float] = None, should_terminate=lambda: False,
+              mirror_bottom: bool = False) -> Tuple[np.ndarray, int, float]:
+    """Relax Laplace's equation in place with vectorized red-black SOR.
+
+    `potential` holds the initial guess and the electrode potentials on the
+    `fixed` points; the outer faces of the grid are held at their initial
+    values. With `mirror_bottom`, plane 0 is a fixed ghost plane kept equal
+    to plane 2, so plane 1 is a symmetry plane (dV/dz = 0). Iterates until
+    the largest update is below `tolerance` times the largest electrode
+    potential.
+    Returns (potential, iterations, max update).
+    """
+    if omega is None:
+        omega = optimal_omega(potential.shape, spacing)
+    scale = max(float(np.abs(potential).max()), 1.0)
+    red, black = red_black_masks(fixed)
+    interior = potential[1:-1, 1:-1, 1:-1]
+    nz, ny, nx = potential.shape
+
+    logging.info(f"SOR: grid {nx}x{ny}x{nz - mirror_bottom}, omega = {omega:.4f}"
+                 f"{', mirror plane at the bottom face' if mirror_bottom else ''}")
+
+    change = np.inf
+    iteration = 0
+    while iteration < max_iterations and not should_terminate():
+        iteration += 1
+        change = 0.0
+        for mask in (red, black):
+            update = neighbour_average(potential, spacing)
+            update -= interior
+            update *= omega
+            update[~mask] = 0.0
+            interior += update
+            change = max(change, float(np.abs(update).max()))
+            if mirror_bottom:
+                potential[0] = potential[2]
+
+        if iteration % LOG_EVERY == 0:
+            logging.info(f"SOR iteration {iteration}: max update {change:.3e}")
+        if change < tolerance * scale:
+            break
+
+    return potential, iteration, change
+
+
+def _pad_for_levels(shape: Tuple[int, int, int], levels: int) -> Tuple[int, int, int]:
+    """Smallest shape >= `shape` whose point counts are m * 2**levels + 1 on every axis"""
+    step = 2 ** levels
+    return tuple(-(-(n - 1) // step) * step + 1 for n in shape)
+
+
+def choose_levels(shape: Tuple[int, int, int]) -> int:
+    """Pick the multigrid depth with the least padding whose coarsest grid is small enough"""
+    candidates = []
+    for levels in range(1, MULTIGRID_MAX_LEVELS + 1):
+        padded = _pad_for_levels(shape, levels)
+        coarsest = [(n - 1) // 2 ** levels + 1 for n in padded]
+        if min(coarsest) < 3:
+            break
+        candidates.append((int(np.prod(coarsest)) > MULTIGRID_COARSEST_POINTS, int(np.prod(padded)), levels))
+    if not candidates:
+        return 1
+    # Prefer a small coarsest grid, then the least padding
+    return min(candidates)[2]
+
+
+def apply_laplacian(v: np.ndarray, weights: Tuple[float, float, float], out: np.ndarray = None) -> np.ndarray:
+    """Unscaled 7-point Laplacian over the interior points"""
+    wx, wy, wz = weights
+    interior_shape = tuple(n - 2 for n in v.shape)
+    if out is None:
+        out = np.empty(interior_shape)
+    scratch = np.empty(interior_shape)
+    np.add(v[1:-1, 1:-1, 2:], v[1:-1, 1:-1, :-2], out=out)
+    out *= wx
+    np.add(v[1:-1, 2:, 1:-1], v[1:-1, :-2, 1:-1], out=scratch)
+    scratch *= wy
+    out += scratch
+    np.add(v[2:, 1:-1, 1:-1], v[:-2, 1:-1, 1:-1], out=scratch)
+    scratch *= wz
+    out += scratch
+    np.multiply(v[1:-1, 1:-1, 1:-1], 2.0 * (wx + wy + wz), out=scratch)
+    out -= scratch
+    return out
+
+
+def mirror_plane_laplacian(v: np.ndarray, weights: Tuple[float, float, float]) -> np.ndarray:
+    """Unscaled Laplacian over the bottom plane's interior when that plane is a symmetry plane (V[-1] = V[1])"""
+    wx, wy, wz = weights
+    p0, p1 = v[0], v[1]
+    out = wx * (p0[1:-1, 2:] + p0[1:-1, :-2])
+    out += wy * (p0[2:, 1:-1] + p0[:-2, 1:-1])
+    out += 2.0 * wz * p1[1:-1, 1:-1]
+    out -= 2.0 * (wx + wy + wz) * p0[1:-1, 1:-1]
+    return out
+
+
+def _smooth(v: np.ndarray, rhs: np.ndarray, masks, weights: Tuple[float, float, float], sweeps: int,
+            omega: float = 1.0, mirror=None):
+    """Red-black Gauss-Seidel (or SOR) sweeps for L(v) = rhs; `masks` are 0/1 weights of the free points.
+
+    `mirror` is (rhs, masks) of the bottom plane when it is a symmetry plane;
+    its points are swept with the interior points of the same colour.
+    """
+    inv_diag = omega / (2.0 * sum(weights))
+    interior = v[1:-1, 1:-1, 1:-1]
+    update = np.empty(interior.shape)
+    for _ in range(sweeps):
+        for colour, mask in enumerate(masks):
+            apply_laplacian(v, weights, out=update)
+            update -= rhs
+            update *= mask
+            update *= inv_diag
+            interior += update
+            if mirror is not None:
+                mirror_rhs, mirror_masks = mirror
+                plane_update = mirror_plane_laplacian(v, weights)
+                plane_update -= mirror_rhs
+                plane_update *= mirror_masks[colour]
+                plane_update *= inv_diag
+                v[0, 1:-1, 1:-1] += plane_update
+
+
+def _restrict(fine: np.ndarray, mirror: bool = False) -> np.ndarray:
+    """Full-weighting restriction onto every second point (bottom plane mirrored if `mirror`)"""
+    r = fine.copy()
+    for axis in range(3):
+        r = np.moveaxis(r, axis, 0)
+        smoothed = r.copy()
+        smoothed[1:-1] = 0.5 * r[1:-1] + 0.25 * (r[:-2] + r[2:])
+        if mirror and axis == 0:
+            smoothed[0] = 0.5 * (r[0] + r[1])
+        r = np.moveaxis(smoothed, 0, axis)
+    return np.ascontiguousarray(r[::2, ::2, ::2])
+
+
+def _prolong(coarse: np.ndarray) -> np.ndarray:
+    """Trilinear interpolation onto the next finer grid"""
+    p = coarse
+    for axis in range(3):
+        p = np.moveaxis(p, axis, 0)
+        fine = np.empty((2 * p.shape[0] - 1,) + p.shape[1:])
+        fine[::2] = p
+        fine[1::2] = 0.5 * (p[:-1] + p[1:])
+        p = np.moveaxis(fine, 0, axis)
+    return np.ascontiguousarray(p)
+
+
+def _coarsen_fixed(fixed: np.ndarray) -> np.ndarray:
+    """Coarse electrode mask: a coarse point is fixed if any fine point it restricts from is fixed"""
+    dilated = fixed.copy()
+    for axis in range(3):
+        d = np.moveaxis(dilated, axis, 0)
+        grown = d.copy()
+        grown[1:] |= d[:-1]
+        grown[:-1] |= d[1:]
+        dilated = np.moveaxis(grown, 0, axis)
+    return np.ascontiguousarray(dilated[::2, ::2, ::2])
+
+
+class MultigridHierarchy:
+    """Grid levels of a multigrid solve; electrode points are kept fixed on every level.
+
+    With `mirror` the bottom plane of every level is a free symmetry plane
+    (its ghost neighbour mirrors plane 1), so a half-domain cycle does the
+    same work as a full-domain cycle on the mirrored problem.
+    """
+
+    def __init__(self, fixed: np.ndarray, spacing: Tuple[float, float, float], levels: int, mirror: bool = False):
+        self.mirror = mirror
+        self.fixed = [fixed]
+        self.weights = [stencil_weights(spacing)]
+        for _ in range(levels):
+            self.fixed.append(_coarsen_fixed(self.fixed[-1]))
+            self.weights.append(tuple(w / 4.0 for w in self.weights[-1]))
+        self.masks = [tuple(m.astype(np.float64) for m in red_black_masks(f)) for f in self.fixed]
+        self.free = [~f[1:-1, 1:-1, 1:-1] for f in self.fixed]
+        self.mirror_free = [~f[0, 1:-1, 1:-1] for f in self.fixed]
+        self.mirror_masks = []
+        for free in self.mirror_free:
+            j, i = np.ogrid[1:free.shape[0] + 1, 1:free.shape[1] + 1]
+            red = (i + j) % 2 == 0
+            self.mirror_masks.append(((red & free).astype(np.float64), (~red & free).astype(np.float64)))
+
+    @property
+    def depth(self) -> int:
+        return len(self.fixed) - 1
+
+    def residual(self, level: int, v: np.ndarray, rhs: np.ndarray, mirror_rhs: np.ndarray = None) -> np.ndarray:
+        """rhs - L(v) on the free points of a level, zero on electrodes and faces"""
+        res = np.zeros_like(v)
+        inner = rhs - apply_laplacian(v, self.weights[level])
+        inner[~self.free[level]] = 0.0
+        res[1:-1, 1:-1, 1:-1] = inner
+        if self.mirror:
+            plane = mirror_rhs - mirror_plane_laplacian(v, self.weights[level])
+            plane[~self.mirror_free[level]] = 0.0
+            res[0, 1:-1, 1:-1] = plane
+        return res
+
+    def v_cycle(self, level: int, v: np.ndarray, rhs: np.ndarray, mirror_rhs: np.ndarray = None):
+        """One symmetric V-cycle for L(v) = rhs at the given level"""
+        weights, masks = self.weights[level], self.masks[level]
+        mirror = mirror_reversed = None
+        if self.mirror:
+            mirror = (mirror_rhs, self.mirror_masks[level])
+            mirror_reversed = (mirror_rhs, self.mirror_masks[level][::-1])
+        if level == self.depth:
+            omega = optimal_omega(v.shape, tuple(1.0 / np.sqrt(w) for w in weights))
+            _smooth(v, rhs, masks, weights, MULTIGRID_COARSEST_SWEEPS, omega, mirror)
+            _smooth(v, rhs, masks[::-1], weights, MULTIGRID_COARSEST_SWEEPS, omega, mirror_reversed)
+            return
+
+        _smooth(v, rhs, masks, weights, MULTIGRID_SMOOTHING_STEPS, mirror=mirror)
+        coarse_residual = _restrict(self.residual(level, v, rhs, mirror_rhs), self.mirror)
+        coarse_mirror_rhs = coarse_residual[0, 1:-1, 1:-1] if self.mirror else None
+        correction = np.zeros(self.fixed[level + 1].shape)
+        self.v_cycle(level + 1, correction, coarse_residual[1:-1, 1:-1, 1:-1], coarse_mirror_rhs)
+        correction = _prolong(correction)
+        inner = correction[1:-1, 1:-1, 1:-1]
+        inner[~self.free[level]] = 0.0
+        v[1:-1, 1:-1, 1:-1] += inner
+        if self.mirror:
+            plane = correction[0, 1:-1, 1:-1]
+            plane[~self.mirror_free[level]] = 0.0
+            v[0, 1:-1, 1:-1] += plane
+        _smooth(v, rhs, masks[::-1], weights, MULTIGRID_SMOOTHING_STEPS, mirror=mirror_reversed)
+
+    def precondition(self, r: np.ndarray) -> np.ndarray:
+        """Approximate (-L)^-1 r with one V-cycle from a zero guess (symmetry plane rows of r carry weight 1/2)"""
+        z = np.zeros_like(r)
+        mirror_rhs = -2.0 * r[0, 1:-1, 1:-1] if self.mirror else None
+        self.v_cycle(0, z, -r[1:-1, 1:-1, 1:-1], mirror_rhs)
+        return z
+
+    def full_multigrid(self, level: int, v: np.ndarray):
+        """Initial guess by solving the injected problem on the coarser levels first"""
+        if level < self.depth:
+            coarse = np.ascontiguousarray(v[::2, ::2, ::2])
+            self.full_multigrid(level + 1, coarse)
+            free = ~self.fixed[level]
+            v[free] = _prolong(coarse)[free]
+        mirror_rhs = np.zeros((v.shape[1] - 2, v.shape[2] - 2)) if self.mirror else None
+        self.v_cycle(level, v, np.zeros(tuple(n - 2 for n in v.shape)), mirror_rhs)
+
+
+def solve_multigrid(potential: np.ndarray, fixed: np.ndarray, spacing: Tuple[float, float, float],
+                    tolerance: float = DEFAULT_TOLERANCE, max_cycles: int = MULTIGRID_MAX_CYCLES,
+                    full_multigrid: bool = True, should_terminate=lambda: False,
+                    mirror_bottom: bool = False) -> Tuple[np.ndarray, int, float]:
+    """Solve Laplace's equation with multigrid-preconditioned conjugate gradients.
+
+    Electrode points and the outer faces keep their values, as in
+    solve_sor, but with `mirror_bottom` the bottom face itself is the
+    symmetry plane (no ghost plane). Its equations are weighted by 1/2 so the operator stays
+    symmetric for CG. The grid is padded with fixed points so every
+    axis coarsens by two on each level, and each iteration costs one V-cycle
+    plus one Laplacian, i.e. O(N) work. Using the V-cycle as a CG
+    preconditioner keeps the convergence rate when thin electrodes are lost
+    on the coarse levels. Iterates until the largest residual (in volts) is
+    below `tolerance` times the largest electrode potential.
+    Returns (potential, cycles, max residual).
+    """
+    shape = potential.shape
+    levels = choose_levels(shape)
+    padded_shape = _pad_for_levels(shape, levels)
+    pad = [(0, p - n) for p, n in zip(padded_shape, shape)]
+
+    v = np.pad(potential, pad, mode='edge')
+    fixed_padded = np.pad(fixed, pad, mode='constant', constant_values=True)
+    fixed_padded[[shape[0] - 1] if mirror_bottom else [0, shape[0] - 1], :, :] = True
+    fixed_padded[:, [0, shape[1] - 1], :] = True
+    fixed_padded[:, :, [0, shape[2] - 1]] = True
+
+    hierarchy = MultigridHierarchy(fixed_padded, spacing, levels, mirror_bottom)
+    weights = hierarchy.weights[0]
+    free = hierarchy.free[0]
+    mirror_free = hierarchy.mirror_free[0]
+    scale = max(float(np.abs(potential).max()), 1.0)
+    inv_diag = 1.0 / (2.0 * sum(weights))
+
+    def laplace_residual(values):
+        """L(values) on the free points (the CG residual b - A x with A = -L)"""
+        r = np.zeros(padded_shape)
+        inner = apply_laplacian(values, weights)
+        inner[~free] = 0.0
+        r[1:-1, 1:-1, 1:-1] = inner
+        if mirror_bottom:
+            plane = 0.5 * mirror_plane_laplacian(values, weights)
+            plane[~mirror_free] = 0.0
+            r[0, 1:-1, 1:-1] = plane
+        return r
+
+    logging.info(f"Multigrid: grid {shape[2]}x{shape[1]}x{shape[0]}, {levels} levels, "
+                 f"padded to {padded_shape[2]}x{padded_shape[1]}x{padded_shape[0]}")
+
+    if full_multigrid:
+        hierarchy.full_multigrid(0, v)
+
+    r = laplace_residual(v)
+    max_residual = float(np.abs(r).max()) * inv_diag
+    z = hierarchy.precondition(r)
+    direction = z.copy()
+    rz = float(np.vdot(r, z))
+    cycles = 0
+
+    while max_residual >= tolerance * scale and cycles < max_cycles and not should_terminate():
+        cycles += 1
+        q = -laplace_residual(direction)
+        alpha = rz / float(np.vdot(direction, q))
+        v += alpha * direction
+        r -= alpha * q
+        max_residual = float(np.abs(r).max()) * inv_diag
+        logging.info(f"Multigrid cycle {cycles}: max residual {max_residual:.3e} V")
+        if max_residual < tolerance * scale:
+            break
+
+        z = hierarchy.precondition(r)
+        rz_new = float(np.vdot(r, z))
+        direction *= rz_new / rz
+        direction += z
+        rz = rz_new
+
+    potential[...] = v[:shape[0], :shape[1], :shape[2]]
+    return potential, cycles, max_residual
+
+
+def solve_potential(potential: np.ndarray, fixed: np.ndarray, spacing: Tuple[float, float, float],
+                    settings: dict, method: str = 'sor', should_terminate=lambda: False,
+                    warm_start: bool = False, mirror_bottom: bool = False) -> Tuple[np.ndarray, dict]:
+    """Solve in place with the chosen method ('sor', 'parallel' or 'multigrid') and return (potential, stats).
+
+    With `warm_start` the free points of `potential` are a meaningful
+    initial guess, so multigrid skips its full-multigrid start. With
+    `mirror_bottom`, plane 0 is a fixed ghost plane mirroring plane 2, so
+    plane 1 is a symmetry plane (dV/dz = 0).
+    """
+    start_time = time.perf_counter()
+    if method == 'multigrid':
+        # Multigrid handles the symmetry plane itself and only needs the ghost plane kept up to date
+        above = 1 if mirror_bottom else 0
+        _, iterations, change = solve_multigrid(potential[above:], fixed[above:], spacing,
+                                                settings['multigrid_tolerance'],
+                                                settings['multigrid_max_cycles'],
+                                                full_multigrid=not warm_start,
+                                                should_terminate=should_terminate,
+                                                mirror_bottom=mirror_bottom)
+        if mirror_bottom:
+            potential[0] = potential[2]
+    elif method == 'parallel':
+        import parallel_solver  # Imports this module
+        potential, iterations, change = parallel_solver.solve_parallel(potential, fixed, spacing,
+                                                                       settings['tolerance'],
+                                                                       settings['max_iterations'],
+                                                                       settings['omega'], settings.get('workers', 0),
+                                                                       should_terminate, mirror_bottom)
+    else:
+        potential, iterations, change = solve_sor(potential, fixed, spacing,
+                                                  settings['tolerance'], settings['max_iterations'],
+                                                  settings['omega'], should_terminate, mirror_bottom)
+    elapsed = time.perf_counter() - start_time
+
+    max_residual = float(np.abs(residual(potential, fixed, spacing)).max())
+    stats = {'method': method, 'iterations': iterations, 'max_update': change,
+             'max_residual': max_residual, 'seconds': elapsed}
+    logging.info(f"{method} finished after {iterations} iterations in {elapsed:.2f} s "
+                 f"(last change {change:.3e}, max residual {max_residual:.3e} V)")
+    return potential, stats
+
+
+def median_plane_index(spec: relax3d_io.GridSpec) -> Optional[int]:
+    """Index of the z = 0 plane of the grid, or None if no grid plane lies on it"""
+    k = int(round(-spec.z0 / spec.hz))
+    if 0 <= k < spec.nz and abs(spec.z0 + k * spec.hz) < MEDIAN_PLANE_TOLERANCE:
+        return k
+    return None
+
+
+def is_mirror_symmetric(fixed: np.ndarray, potential: np.ndarray, k: int) -> bool:
+    """True if the electrodes below plane k mirror those above it (the grid may extend further up)"""
+    if k == 0 or potential.shape[0] - 1 - k < k:
+        return False
+    below = slice(k - 1, None, -1)
+    above = slice(k + 1, 2 * k + 1)
+    return (np.array_equal(fixed[below], fixed[above])
+            and np.array_equal(potential[below][fixed[below]], potential[above][fixed[above]]))
+
+
+def solve_symmetric(potential: np.ndarray, fixed: np.ndarray, spec: relax3d_io.GridSpec, settings: dict,
+                    method: str = 'sor', should_terminate=lambda: False,
+                    warm_start: bool = False) -> Tuple[np.ndarray, dict]:
+    """Solve only the part of the grid above the median plane, with dV/dz = 0 on it.
+
+    If the grid starts at z = 0 it already is that half and is solved as
+    is; if it straddles z = 0 the planes below are rebuilt by mirroring.
+    """
+    k = median_plane_index(spec)
+    if k is None:
+        raise ValueError(f"Symmetric mode needs a grid plane at z = 0 ({spec})")
+    if k > 0 and not is_mirror_symmetric(fixed, potential, k):
+        raise ValueError("Electrodes are not mirror-symmetric about the median plane z = 0")
+
+    logging.info(f"Symmetric mode: solving planes {k}..{spec.nz - 1} of {spec.nz} with dV/dz = 0 at z = 0")
+    if k > 0:
+        # Plane k - 1 mirrors plane k + 1, so it serves as the ghost plane of a view of the upper half
+        half, half_fixed = potential[k - 1:], fixed[k - 1:]
+        below = fixed[k - 1].copy()
+    else:
+        # A single buffer one plane taller than the grid, for the ghost plane
+        half = np.empty((spec.nz + 1,) + potential.shape[1:])
+        half_fixed = np.empty(half.shape, dtype=bool)
+        half[1:] = potential
+        half_fixed[1:] = fixed
+    half[0] = half[2]
+    half_fixed[0] = True
+    try:
+        half, stats = solve_potential(half, half_fixed, spec.spacing, settings, method, should_terminate,
+                                      warm_start, mirror_bottom=True)
+    finally:
+        if k > 0:
+            fixed[k - 1] = below
+    if k > 0:
+        potential[:k] = potential[2 * k:k:-1]
+    else:
+        potential[...] = half[1:]
+    stats['symmetric'] = True
+    return potential, stats
+
+
+def use_symmetry(mode: str, fixed: np.ndarray, potential: np.ndarray, spec: relax3d_io.GridSpec) -> bool:
+    """Resolve [Solver] SYMMETRY ('off', 'auto' or 'on') for a loaded relax3d.dat.
+
+    'auto' enables the mode when the grid starts at the median plane (the
+    z = 0 face is then a symmetry plane, as with OPT 1 in relax2000's
+    INIT_COMMANDS) or when it straddles z = 0 and the electrodes are seen
+    to be mirror-symmetric.
+    """
+    if mode == 'on':
+        return True
+    if mode == 'auto':
+        k = median_plane_index(spec)
+        if k == 0:
+            logging.info("Grid starts at the median plane z = 0: bottom face is a symmetry plane")
+            return True
+        if k is not None and is_mirror_symmetric(fixed, potential, k):
+            logging.info("Electrodes are mirror-symmetric about z = 0")
+            return True
+    return False
+
+
+def check_median_plane(spec: relax3d_io.GridSpec, mode: str):
+    """Refuse SYMMETRY 'off' on a grid that starts at z = 0.
+
+    relax2000 (OPT 1 in the shipped INIT_COMMANDS) solves such a grid with
+    a symmetry plane at its bottom face; holding that face at 0 V instead
+    gives a different potential.
+    """
+    if mode == 'off' and median_plane_index(spec) == 0:
+        raise ValueError(f"Grid {spec} starts at the median plane z = 0, which relax2000 (OPT 1) treats as a "
+                         f"symmetry plane: set [Solver] SYMMETRY to auto or on")
+
+
+def solve_grid(potential: np.ndarray, fixed: np.ndarray, spec: relax3d_io.GridSpec, settings: dict,
+               method: str = 'sor', should_terminate=lambda: False,
+               warm_start: bool = False) -> Tuple[np.ndarray, dict]:
+    """Solve in place with settings['symmetry'] resolved for this grid and return (potential, stats)"""
+    check_median_plane(spec, settings.get('symmetry', 'auto'))
+    if use_symmetry(settings.get('symmetry', 'auto'), fixed, potential, spec):
+        return solve_symmetric(potential, fixed, spec, settings, method, should_terminate, warm_start)
+    return solve_potential(potential, fixed, spec.spacing, settings, method, should_terminate, warm_start)
+
+
+def solve_relax3d_dat(dat_path: str, spec: relax3d_io.GridSpec, settings: dict, method: str = 'sor',
+                      should_terminate=lambda: False) -> Tuple[np.ndarray, np.ndarray, dict]:
+    """Load relax3d.dat, solve with the chosen method and return (potential, fixed, stats)"""
+    fixed, potential = relax3d_io.read_electrodes(dat_path, spec)
+    logging.info(f"Loaded {np.count_nonzero(fixed)} electrode points from {dat_path}")
+
+    potential, stats = solve_grid(potential, fixed, spec, settings, method, should_terminate)
+    return potential, fixed, stats
+
+
+def sample_onto_grid(source: field_map.FieldMap, spec: relax3d_io.GridSpec,
+                     method: str = NESTED_INTERPOLATION) -> np.ndarray:
+    """Interpolate a solved field map onto every point of another grid, one z plane at a time"""
+    xs, ys, zs = spec.axes()
+    y, x = np.meshgrid(ys, xs, indexing='ij')
+    plane_points = np.column_stack((x.ravel(), y.ravel(), np.empty(x.size)))
+    values = np.empty(spec.shape)
+    for k, z in enumerate(zs):
+        plane_points[:, 2] = z
+        values[k] = source.potential(plane_points, method).reshape(spec.ny, spec.nx)
+    if np.isnan(values).any():
+        lower, upper = source.bounds()
+        raise ValueError(f"Grid {spec} is not inside the source grid ({lower} .. {upper} mm)")
+    return values
+
+
+def check_nested_source(coarse_path: str, coarse_spec: relax3d_io.GridSpec):
+    """Refuse a coarse solution that cannot be trusted as the boundary of a nested solve.
+
+    Its recorded stats (see save_solution_stats) must show a symmetry plane
+    at z = 0 when the coarse grid starts there, and relax2000 output must
+    have passed verification, the only check that RELAX3D_V.OUT was read
+    with the right layout.
+    """
+    stats = load_solution_stats(coarse_path)
+    if not stats:
+        raise ValueError(f"{coarse_path}: no solve record ({os.path.basename(solution_stats_path(coarse_path))}), "
+                         f"cannot tell how it was solved; solve the L area again first")
+    if median_plane_index(coarse_spec) == 0 and not stats.get('symmetric'):
+        raise ValueError(f"{coarse_path} was solved with the median plane z = 0 held at 0 V instead of as a "
+                         f"symmetry plane; solve the L area again with [Solver] SYMMETRY auto")
+    if stats.get('method') == 'relax2000' and not stats.get('verified'):
+        raise ValueError(f"{coarse_path} is relax2000 output that was not verified; solve L with an in-process "
+                         f"engine, or with [Solver] RELAX2000_CHECKS and VERIFY on")
+
+
+def solve_nested(dat_path: str, spec: relax3d_io.GridSpec, coarse_path: str, coarse_spec: relax3d_io.GridSpec,
+                 settings: dict, method: str = 'sor', should_terminate=lambda: False) -> Tuple[np.ndarray, np.ndarray, dict]:
+    """Solve relax3d.dat on a grid nested inside a solved coarser grid (S inside L).
+
+    The coarse potential is interpolated onto the fine grid: it gives the
+    Dirichlet values of the outer faces and the initial guess of the
+    interior, so only the fine region is relaxed and it agrees with the
+    coarse solution at the seam. The coarse solution must pass
+    check_nested_source. Returns (potential, fixed, stats).
+    """
+    check_nested_source(coarse_path, coarse_spec)
+    fixed, potential = relax3d_io.read_electrodes(dat_path, spec)
+    logging.info(f"Loaded {np.count_nonzero(fixed)} electrode points from {dat_path}")
+
+    # A coarse grid starting at z = 0 was solved with a symmetry plane there (check_nested_source),
+    # so the cubic taps below it are mirrored rather than clamped
+    coarse = field_map.FieldMap.open(coarse_path, coarse_spec, symmetric=median_plane_index(coarse_spec) == 0)
+    seed = sample_onto_grid(coarse, spec)
+    potential = np.where(fixed, potential, seed)
+    logging.info(f"Boundary and initial guess sampled from {coarse_path}")
+
+    potential, stats = solve_grid(potential, fixed, spec, settings, method, should_terminate, warm_start=True)
+    return potential, fixed, stats
+
+
+def solution_stats_path(solution_path: str) -> str:
+    """Solver statistics stored next to a kept solution"""
+    return os.path.splitext(solution_path)[0] + '.json'
+
+
+def load_solution_stats(solution_path: str) -> dict:
+    """Statistics of the solve that produced a kept solution ({} if none were recorded)"""
+    stats_path = solution_stats_path(solution_path)
+    if not os.path.exists(stats_path):
+        return {}
+    with open(stats_path, 'r') as file:
+        return json.load(file)
+
+
+def save_solution_stats(solution_path: str, stats: dict, previous: dict = None):
+    """Record the solve statistics of a kept solution.
+
+    Cold solves set the cold_iterations / cold_seconds baseline; warm
+    starts carry the baseline of the solution they started from, so the
+    saving can be reported against a cold solve of the same method.
+    """
+    record = dict(stats)
+    previous = previous or {}
+    if not stats.get('warm_start'):
+        record['cold_iterations'] = stats.get('iterations')
+        record['cold_seconds'] = stats.get('seconds')
+    elif previous.get('method') == stats.get('method'):
+        record['cold_iterations'] = previous.get('cold_iterations')
+        record['cold_seconds'] = previous.get('cold_seconds')
+    with open(solution_stats_path(solution_path), 'w') as file:
+        json.dump(record, file, indent=2, default=lambda value: value.item())
+
+
+def solve_warm(dat_path: str, spec: relax3d_io.GridSpec, previous_path: str, settings: dict, method: str = 'sor',
+               should_terminate=lambda: False, baseline: dict = None) -> Tuple[np.ndarray, np.ndarray, dict]:
+    """Solve relax3d.dat starting from a previous potential of the same grid.
+
+    The previous solution is the initial guess (and keeps its outer faces);
+    the electrode points of the current relax3d.dat are re-applied on top.
+    After a small edit only the neighbourhood of the change is far from
+    converged. `baseline` (the stats of the previous solution) is used to
+    report the iterations saved against a cold solve.
+    Returns (potential, fixed, stats).
+    """
+    fixed, values = relax3d_io.read_electrodes(dat_path, spec)
+    logging.info(f"Loaded {np.count_nonzero(fixed)} electrode points from {dat_path}")
+
+    previous = relax3d_io.read_potential(previous_path, spec)
+    scale = max(float(np.abs(values).max()), 1.0)
+    changed = int(np.count_nonzero(np.abs(previous[fixed] - values[fixed]) > CHANGED_ELECTRODE_TOLERANCE * scale))
+    logging.info(f"Warm start from {previous_path}: {changed} of {np.count_nonzero(fixed)} electrode points changed")
+
+    potential = np.where(fixed, values, previous)
+    potential, stats = solve_grid(potential, fixed, spec, settings, method, should_terminate, warm_start=True)
+    stats['warm_start'] = True
+    stats['changed_points'] = changed
+    log_warm_start_saving(stats, baseline)
+    return potential, fixed, stats
+
+
+def log_warm_start_saving(stats: dict, baseline: dict = None):
+    """Report the iterations a warm start saved against the last cold solve of the same method"""
+    baseline = baseline or {}
+    method = stats['method']
+    if baseline.get('method') == method and baseline.get('cold_iterations'):
+        saved = baseline['cold_iterations'] - stats['iterations']
+        logging.info(f"Warm start saved {saved} of {baseline['cold_iterations']} iterations "
+                     f"({stats['seconds']:.2f} s vs {baseline['cold_seconds']:.2f} s for the last cold {method} solve)")
+    else:
+        logging.info(f"Warm start took {stats['iterations']} iterations (no cold {method} baseline recorded)")
+
+
+def benchmark(dat_path: str, reference_path: str, spec: relax3d_io.GridSpec, settings: dict,
+              method: str = 'sor') -> dict:
+    """Compare the NumPy solve against a stored relax2000 RELAX3D_V.OUT"""
+    potential, fixed, stats = solve_relax3d_dat(dat_path, spec, settings, method)
+    reference = relax3d_io.read_potential(reference_path, spec)
+
+    stats['reference_max_residual'] = float(np.abs(residual(reference, fixed, spec.spacing)).max())
+    stats['max_difference'] = float(np.abs(potential - reference).max())
+
+    logging.info(f"Wall time:            {stats['seconds']:.2f} s")
+    logging.info(f"Max residual (NumPy): {stats['max_residual']:.3e} V")
+    logging.info(f"Max residual (ref):   {stats['reference_max_residual']:.3e} V")
+    logging.info(f"Max |V - V_ref|:      {stats['max_difference']:.3e} V")
+    return stats
+
+
+# Main function for direct script execution
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="In-process Relax3D Laplace solver")
+    parser.add_argument('option', choices=['L', 'S'], help="Grid from [Commands-L] or [Commands-S]")
+    parser.add_argument('--method', choices=['sor', 'parallel', 'multigrid'], default='sor')
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes of the parallel method (default: [Solver] WORKERS)")
+    parser.add_argument('--config', default='config_main.ini')
+    parser.add_argument('--input', default=None, help="relax3d.dat path (default: R3D_PATH/relax3d.dat)")
+    parser.add_argument('--output', default=None, help="Output path (default: R3D_PATH/RELAX3D_V.OUT)")
+    parser.add_argument('--reference', default=None, help="relax2000 RELAX3D_V.OUT to benchmark against")
+    parser.add_argument('--symmetry', choices=SYMMETRY_MODES, default=None,
+                        help="Median-plane symmetry (default: [Solver] SYMMETRY)")
+    parser.add_argument('--warm-start', nargs='?', const='', default=None, metavar='PREVIOUS',
+                        help="Start from a previous potential of the same grid "
+                             "(default: R3D_PATH/RELAX3D_V_<option>.r3dg)")
+    parser.add_argument('--nested', nargs='?', const='', default=None, metavar='L_POTENTIAL',
+                        help="Take the outer faces and initial guess from a solved L potential "
+                             "(default: R3D_PATH/RELAX3D_V_L.r3dg)")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    r3d_path = config.get('Paths', 'R3D_PATH', fallback='.')
+    spec = relax3d_io.load_grid_spec(args.option, config)
+    settings = get_solver_settings(config)
+    if args.symmetry:
+        settings['symmetry'] = args.symmetry
+    if args.workers is not None:
+        settings['workers'] = args.workers
+    dat_path = args.input or os.path.join(r3d_path, relax3d_io.RELAX3D_DAT)
+
+    if args.reference:
+        benchmark(dat_path, args.reference, spec, settings, args.method)
+        return 0
+
+    if args.warm_start is not None:
+        previous_path = args.warm_start or relax3d_io.latest_solution_path(r3d_path, args.option)
+        potential, _, _ = solve_warm(dat_path, spec, previous_path, settings, args.method,
+                                     baseline=load_solution_stats(previous_path))
+    elif args.nested is not None:
+        coarse_path = args.nested or config.get('Solver', 'NESTED_SOURCE', fallback='').strip() or \
+            relax3d_io.latest_solution_path(r3d_path, 'L')
+        coarse_spec = relax3d_io.load_grid_spec('L', config)
+        potential, _, _ = solve_nested(dat_path, spec, coarse_path, coarse_spec, settings, args.method)
+    else:
+        potential, _, _ = solve_relax3d_dat(dat_path, spec, settings, args.method)
+    output_path = args.output or os.path.join(r3d_path, relax3d_io.RELAX3D_OUT)
+    relax3d_io.write_potential(output_path, potential)
+    logging.info(f"Potential written to {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
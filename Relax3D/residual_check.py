@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import configparser
+from typing import List, Optional, Tuple
+import numpy as np
+import relax3d_io
+import relax_solver
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Configuration
+DEFAULT_VERIFY_TOLERANCE = 1e-4  # Largest residual allowed, relative to the largest electrode potential
+ELECTRODE_TOLERANCE = 1e-5       # Electrode point vs relax3d.dat mismatch, relative (RELAX3D_V.OUT has 7 digits)
+REPORT_SUFFIX = '.verify.json'
+WORST_PLANES = 5                 # z planes listed in the log
+
+
+def report_path(potential_path: str) -> str:
+    """Verification report stored next to a potential (RELAX3D_V.OUT -> RELAX3D_V.verify.json)"""
+    return os.path.splitext(potential_path)[0] + REPORT_SUFFIX
+
+
+def plane_residuals(potential: np.ndarray, fixed: np.ndarray, spacing: Tuple[float, float, float],
+                    planes: int = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Max and RMS Laplace residual (V) and free point count of every z plane.
+
+    The residual is computed in one vectorized pass (or `planes` planes at
+    a time for memory-mapped grids). The outer planes are Dirichlet and
+    report zero.
+    """
+    nz = potential.shape[0]
+    plane_max = np.zeros(nz)
+    plane_rms = np.zeros(nz)
+    plane_free = np.zeros(nz, dtype=np.int64)
+    planes = planes or nz
+    for k0 in range(1, nz - 1, planes):
+        k1 = min(k0 + planes, nz - 1)
+        res = relax_solver.residual(np.asarray(potential[k0 - 1:k1 + 1], dtype=np.float64),
+                                    np.asarray(fixed[k0 - 1:k1 + 1]), spacing)
+        plane_free[k0:k1] = np.count_nonzero(~np.asarray(fixed[k0:k1, 1:-1, 1:-1]), axis=(1, 2))
+        plane_max[k0:k1] = np.abs(res).max(axis=(1, 2))
+        plane_rms[k0:k1] = np.sqrt(np.einsum('kji,kji->k', res, res) / np.maximum(plane_free[k0:k1], 1))
+    return plane_max, plane_rms, plane_free
+
+
+def verify_potential(potential: np.ndarray, fixed: np.ndarray, spacing: Tuple[float, float, float],
+                     tolerance: float = DEFAULT_VERIFY_TOLERANCE, values: np.ndarray = None,
+                     planes: int = None) -> dict:
+    """Check that a potential solves Laplace's equation for the given electrodes.
+
+    Flags non-finite values, electrode points that differ from `values`
+    (wrong or stale output) and a largest residual above `tolerance` times
+    the largest electrode potential (a run that stopped before converging).
+    Returns a report dict; report['ok'] is False if anything was flagged.
+    """
+    planes = planes or potential.shape[0]
+    scale, non_finite, mismatched = 1.0, 0, 0
+    for k0 in range(0, potential.shape[0], planes):
+        block = np.asarray(potential[k0:k0 + planes], dtype=np.float64)
+        block_fixed = np.asarray(fixed[k0:k0 + planes])
+        non_finite += int(np.count_nonzero(~np.isfinite(block)))
+        if values is not None:
+            expected = values[k0:k0 + planes][block_fixed]
+            scale = max(scale, float(np.abs(expected).max(initial=0.0)))
+            mismatched += int(np.count_nonzero(np.abs(block[block_fixed] - expected) >
+                                               ELECTRODE_TOLERANCE * np.maximum(np.abs(expected), 1.0)))
+        else:
+            scale = max(scale, float(np.abs(block[block_fixed]).max(initial=0.0)))
+
+    plane_max, plane_rms, plane_free = plane_residuals(potential, fixed, spacing, planes)
+    max_residual = float(plane_max.max())
+    rms_residual = float(np.sqrt(np.sum(plane_rms ** 2 * plane_free) / max(int(plane_free.sum()), 1)))
+
+    problems = []
+    if non_finite:
+        problems.append(f"{non_finite} non-finite values")
+    if mismatched:
+        problems.append(f"{mismatched} electrode points differ from relax3d.dat")
+    if not max_residual <= tolerance * scale:
+        problems.append(f"max residual {max_residual:.3e} V exceeds {tolerance:.0e} x {scale:g} V "
+                        f"(stopped before convergence)")
+    return {'ok': not problems, 'problems': problems, 'max_residual': max_residual,
+            'rms_residual': rms_residual, 'relative_residual': max_residual / scale, 'scale': scale,
+            'tolerance': tolerance, 'worst_plane': int(np.argmax(plane_max)),
+            'plane_max': plane_max.tolist(), 'plane_rms': plane_rms.tolist()}
+
+
+def verify_files(dat_path: str, potential_path: str, spec: relax3d_io.GridSpec,
+                 tolerance: float = DEFAULT_VERIFY_TOLERANCE, engine: str = None) -> dict:
+    """Verify a RELAX3D_V.OUT (or binary grid) against relax3d.dat and save the report next to it.
+
+    `engine` is recorded in the report as the solver that produced the potential.
+    """
+    fixed, values = relax3d_io.read_electrodes(dat_path, spec)
+    potential = relax3d_io.read_potential(potential_path, spec)
+    report = verify_potential(potential, fixed, spec.spacing, tolerance, values)
+    report.update({'potential': os.path.abspath(potential_path), 'electrodes': os.path.abspath(dat_path),
+                   'digest': relax3d_io.file_digest(potential_path), 'engine': engine})
+    save_report(potential_path, report)
+    return report
+
+
+def save_report(potential_path: str, report: dict):
+    """Write a verification report next to the potential it describes"""
+    with open(report_path(potential_path), 'w') as file:
+        json.dump(report, file, indent=2)
+
+
+def record_unchecked(potential_path: str, engine: str, reason: str):
+    """Record that a potential is kept as `engine` wrote it, without verification"""
+    save_report(potential_path, {'ok': False, 'checked': False, 'problems': [reason], 'engine': engine,
+                                 'digest': relax3d_io.file_digest(potential_path)})
+
+
+def load_report(potential_path: str) -> dict:
+    """Verification report of a potential ({} if it was never verified)"""
+    path = report_path(potential_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def check_verified(potential_path: str) -> Tuple[bool, str]:
+    """Whether a potential passed verification in its current form, with the reason if not"""
+    report = load_report(potential_path)
+    if not report:
+        return False, f"{potential_path} has not been verified"
+    if report.get('digest') and report['digest'] != relax3d_io.file_digest(potential_path):
+        return False, f"{potential_path} changed since it was verified"
+    if not report['ok']:
+        return False, f"{potential_path} failed verification: {'; '.join(report['problems'])}"
+    return True, f"{potential_path} verified (max residual {report['max_residual']:.3e} V)"
+
+
+def recorded_engine(potential_path: str) -> Optional[str]:
+    """Engine recorded as the producer of a potential in its current form (None if unknown)"""
+    report = load_report(potential_path)
+    if not report or report.get('digest') != relax3d_io.file_digest(potential_path):
+        return None
+    return report.get('engine')
+
+
+def log_report(report: dict, worst: int = WORST_PLANES):
+    """Log the summary and the z planes with the largest residuals"""
+    logging.info(f"Residual: max {report['max_residual']:.3e} V ({report['relative_residual']:.2e} of "
+                 f"{report['scale']:g} V), RMS {report['rms_residual']:.3e} V")
+    plane_max, plane_rms = np.array(report['plane_max']), np.array(report['plane_rms'])
+    for k in np.argsort(plane_max)[::-1][:worst]:
+        logging.info(f"   z plane {k + 1:4d}: max {plane_max[k]:.3e} V, RMS {plane_rms[k]:.3e} V")
+    if report['ok']:
+        logging.info("Verification passed")
+    for problem in report['problems']:
+        logging.error(f"Verification failed: {problem}")
+
+
+def get_verify_tolerance(config: configparser.ConfigParser) -> float:
+    """[Solver] VERIFY_TOLERANCE of config_main.ini"""
+    return config.getfloat('Solver', 'VERIFY_TOLERANCE', fallback=DEFAULT_VERIFY_TOLERANCE)
+
+
+# Main function for direct script execution
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Check a solved potential against relax3d.dat (Laplace residual)")
+    parser.add_argument('option', choices=['L', 'S'], help="Grid from [Commands-L] or [Commands-S]")
+    parser.add_argument('--config', default='config_main.ini')
+    parser.add_argument('--input', default=None, help="relax3d.dat path (default: R3D_PATH/relax3d.dat)")
+    parser.add_argument('--potential', default=None, help="Potential to check (default: R3D_PATH/RELAX3D_V.OUT)")
+    parser.add_argument('--tolerance', type=float, default=None,
+                        help="Max residual relative to the largest electrode potential (default: [Solver] VERIFY_TOLERANCE)")
+    parser.add_argument('--planes', action='store_true', help="List the residual of every z plane")
+    args = parser.parse_args(argv)
+
+    config = relax_solver.load_config(args.config)
+    r3d_path = config.get('Paths', 'R3D_PATH', fallback='.')
+    spec = relax3d_io.load_grid_spec(args.option, config)
+    dat_path = args.input or os.path.join(r3d_path, relax3d_io.RELAX3D_DAT)
+    potential_path = args.potential or os.path.join(r3d_path, relax3d_io.RELAX3D_OUT)
+    tolerance = args.tolerance if args.tolerance is not None else get_verify_tolerance(config)
+
+    report = verify_files(dat_path, potential_path, spec, tolerance)
+    if args.planes:
+        for k, (plane_max, plane_rms) in enumerate(zip(report['plane_max'], report['plane_rms'])):
+            logging.info(f"z plane {k + 1:4d}: max {plane_max:.3e} V, RMS {plane_rms:.3e} V")
+    log_report(report)
+    return 0 if report['ok'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
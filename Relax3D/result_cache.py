@@ -0,0 +1,251 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+import configparser
+from typing import Dict, List, Optional
+import relax3d_io
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Configuration
+CACHE_VERSION = 1                   # Bump to invalidate every entry after a key layout change
+DEFAULT_CACHE_DIR = '.result_cache'  # Relative to R3D_PATH unless [Cache] CACHE_DIR is set
+DEFAULT_BUDGET_MB = 4096
+LAYER_FILE = 'layer.txt'            # Entry file name of a divided layer file (L{n}.txt / S{n}.txt)
+ENTRY_FILE = 'entry.json'           # Entry metadata; its mtime is the last use (LRU order)
+STATS_FILE = 'stats.jsonl'          # One line per lookup, appended by every process
+MB = 1024 * 1024
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+NATIVE_PREPROCESS_SOURCES = ['dxf_geometry.py', 'electrode_grid.py', 'relax3d_io.py']
+NATIVE_SOLVE_SOURCES = ['relax_solver.py', 'parallel_solver.py', 'relax3d_io.py']
+
+
+def digest_parts(*parts) -> str:
+    """SHA-256 of JSON-serializable key parts"""
+    text = json.dumps([CACHE_VERSION, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def tool_version(paths: List[str]) -> str:
+    """Version of a tool set: content hash of its executables or sources ('missing' for absent files)"""
+    return digest_parts([(os.path.basename(path), relax3d_io.file_digest(path) if os.path.exists(path) else 'missing')
+                         for path in paths])
+
+
+def native_version(sources: List[str]) -> str:
+    """Version of the native code: content hash of its modules"""
+    return tool_version([os.path.join(SOURCE_DIR, name) for name in sources])
+
+
+def preprocess_key(dxf_path: str, slice_config: dict, exec_cmd: list, option: str, version: str) -> str:
+    """Key of one divided layer file: DXF bytes, zmin/zmax/potential, grid and preprocessing tool"""
+    return digest_parts('preprocess', relax3d_io.file_digest(dxf_path),
+                        {name: slice_config.get(name) for name in ('zmin', 'zmax', 'potential')},
+                        exec_cmd, option, version)
+
+
+def combine_key(layer_keys: List[str]) -> str:
+    """Key of relax3d.dat: the keys of its layer files, in combine order"""
+    return digest_parts('combine', layer_keys)
+
+
+def solve_key(dat_path: str, commands: List[str], engine: str, settings: dict, version: str,
+              source_path: str = None) -> str:
+    """Key of RELAX3D_V.OUT: relax3d.dat bytes, grid commands, engine, its settings and version.
+
+    `source_path` is a solution the solve starts from (nested S solve).
+    """
+    return digest_parts('solve', relax3d_io.file_digest(dat_path), commands, engine, settings, version,
+                        relax3d_io.file_digest(source_path) if source_path else None)
+
+
+class ResultCache:
+    """Content-addressed store of stage outputs, evicted least recently used first under a disk budget"""
+
+    def __init__(self, cache_dir: str, budget_mb: float = DEFAULT_BUDGET_MB):
+        self.cache_dir = cache_dir
+        self.budget = int(budget_mb * MB)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def fetch(self, stage: str, key: str, outputs: Dict[str, str]) -> bool:
+        """Copy the cached files of `key` to their destinations ({name: path}); False on a miss.
+
+        Names are the roles of the files in the entry (e.g. 'layer.txt'), not
+        the destination names, so slices with the same inputs share an entry.
+        """
+        entry_dir = self.entry_dir(key)
+        entry_path = os.path.join(entry_dir, ENTRY_FILE)
+        try:
+            with open(entry_path, 'r') as file:
+                entry = json.load(file)
+            if not set(outputs) <= set(entry['files']):
+                raise FileNotFoundError(entry_path)
+            for name, path in outputs.items():
+                shutil.copyfile(os.path.join(entry_dir, name), path)
+            os.utime(entry_path)
+        except (OSError, ValueError, KeyError):
+            self.record(stage, False)
+            return False
+        self.record(stage, True, entry['seconds'], entry['bytes'])
+        names = ', '.join(os.path.basename(path) for path in outputs.values())
+        logging.info(f"Cache hit ({stage}): {names} restored, ~{entry['seconds']:.1f} s saved")
+        return True
+
+    def entry(self, key: str) -> dict:
+        """Metadata of a cached entry ({} if absent)"""
+        try:
+            with open(os.path.join(self.entry_dir(key), ENTRY_FILE), 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def store(self, stage: str, key: str, outputs: Dict[str, str], seconds: float, extra: dict = None):
+        """Copy produced files ({name: path}) into the entry of `key`, then evict down to the budget"""
+        entry_dir = self.entry_dir(key)
+        if os.path.exists(os.path.join(entry_dir, ENTRY_FILE)):
+            return
+        temp_dir = os.path.join(self.cache_dir, f"tmp-{os.getpid()}-{key[:16]}")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+        try:
+            for name, path in outputs.items():
+                shutil.copyfile(path, os.path.join(temp_dir, name))
+            size = sum(os.path.getsize(os.path.join(temp_dir, name)) for name in outputs)
+            with open(os.path.join(temp_dir, ENTRY_FILE), 'w') as file:
+                json.dump({'stage': stage, 'files': list(outputs), 'bytes': size, 'seconds': seconds,
+                           'created': time.time(), **(extra or {})}, file, indent=2,
+                          default=lambda value: value.item())
+            os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+            os.rename(temp_dir, entry_dir)  # Atomic: a concurrent reader sees all files or none
+        except OSError as e:
+            logging.warning(f"Cache store ({stage}) failed: {e}")
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            return
+        names = ', '.join(os.path.basename(path) for path in outputs.values())
+        logging.info(f"Cached ({stage}): {names}, {size / MB:.1f} MB")
+        self.evict()
+
+    def entries(self) -> List[dict]:
+        """All entries with their key, size and last use, least recently used first"""
+        entries = []
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if len(prefix) != 2 or not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                entry_path = os.path.join(prefix_dir, key, ENTRY_FILE)
+                try:
+                    with open(entry_path, 'r') as file:
+                        entry = json.load(file)
+                    entry.update({'key': key, 'last_used': os.path.getmtime(entry_path)})
+                except (OSError, ValueError):
+                    continue
+                entries.append(entry)
+        return sorted(entries, key=lambda entry: entry['last_used'])
+
+    def evict(self, budget_mb: float = None) -> int:
+        """Remove least recently used entries until the cache fits the budget; returns bytes freed"""
+        budget = self.budget if budget_mb is None else int(budget_mb * MB)
+        entries = self.entries()
+        total = sum(entry['bytes'] for entry in entries)
+        freed = 0
+        for entry in entries:
+            if total - freed <= budget:
+                break
+            shutil.rmtree(self.entry_dir(entry['key']), ignore_errors=True)
+            freed += entry['bytes']
+            logging.info(f"Cache evicted ({entry['stage']}): {entry['key'][:12]}, {entry['bytes'] / MB:.1f} MB")
+        return freed
+
+    def clear(self):
+        """Remove every entry and the statistics"""
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+    def record(self, stage: str, hit: bool, seconds: float = 0.0, size: int = 0):
+        """Append one lookup to the statistics (a single short append, safe across processes)"""
+        line = json.dumps({'time': time.time(), 'stage': stage, 'hit': hit, 'seconds': seconds, 'bytes': size})
+        with open(os.path.join(self.cache_dir, STATS_FILE), 'a') as file:
+            file.write(line + '\n')
+
+    def stats(self, since: float = 0.0) -> Dict[str, dict]:
+        """Hits, misses and time saved per stage, for lookups after `since` (epoch seconds)"""
+        stats = {}
+        try:
+            with open(os.path.join(self.cache_dir, STATS_FILE), 'r') as file:
+                lines = [json.loads(line) for line in file if line.strip()]
+        except OSError:
+            lines = []
+        for line in lines:
+            if line['time'] < since:
+                continue
+            row = stats.setdefault(line['stage'], {'hits': 0, 'misses': 0, 'saved_seconds': 0.0})
+            row['hits' if line['hit'] else 'misses'] += 1
+            row['saved_seconds'] += line['seconds'] if line['hit'] else 0.0
+        return stats
+
+    def log_stats(self, since: float = 0.0):
+        """Log hit/miss statistics per stage and the disk usage"""
+        for stage, row in self.stats(since).items():
+            lookups = row['hits'] + row['misses']
+            logging.info(f"Cache {stage:<10} {row['hits']:4d} hits, {row['misses']:4d} misses "
+                         f"({row['hits'] / lookups:.0%} hit rate), ~{row['saved_seconds']:.0f} s saved")
+        entries = self.entries()
+        logging.info(f"Cache {self.cache_dir}: {len(entries)} entries, "
+                     f"{sum(entry['bytes'] for entry in entries) / MB:.1f} of {self.budget / MB:.0f} MB")
+
+
+def get_cache(config: configparser.ConfigParser) -> Optional[ResultCache]:
+    """Result cache of config_main.ini [Cache] (None when ENABLED = false)"""
+    if not config.getboolean('Cache', 'ENABLED', fallback=True):
+        return None
+    cache_dir = config.get('Cache', 'CACHE_DIR', fallback='').strip() or \
+        os.path.join(config.get('Paths', 'R3D_PATH', fallback='.'), DEFAULT_CACHE_DIR)
+    return ResultCache(cache_dir, config.getfloat('Cache', 'BUDGET_MB', fallback=DEFAULT_BUDGET_MB))
+
+
+# Main function for direct script execution
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Inspect and trim the preprocessing / solve result cache")
+    parser.add_argument('action', choices=['stats', 'list', 'evict', 'clear'])
+    parser.add_argument('--config', default='config_main.ini')
+    parser.add_argument('--budget', type=float, default=None, help="Evict down to this many MB (default: BUDGET_MB)")
+    args = parser.parse_args(argv)
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    cache = get_cache(config)
+    if cache is None:
+        logging.info("Result cache disabled ([Cache] ENABLED = false)")
+        return 0
+
+    if args.action == 'stats':
+        cache.log_stats()
+    elif args.action == 'list':
+        for entry in cache.entries():
+            logging.info(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['last_used']))}  "
+                         f"{entry['stage']:<10} {entry['bytes'] / MB:9.1f} MB  {entry['seconds']:8.1f} s  "
+                         f"{', '.join(entry['files'])}")
+    elif args.action == 'evict':
+        logging.info(f"Freed {cache.evict(args.budget) / MB:.1f} MB")
+    else:
+        cache.clear()
+        logging.info(f"Cleared {cache.cache_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
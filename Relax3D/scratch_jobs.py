@@ -0,0 +1,230 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import threading
+import configparser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+import yaml
+import relax3d_io
+import residual_check
+import field_map
+import parallel_solver
+import electrode_grid
+import auto_relax3d
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Configuration
+DEFAULT_SCRATCH_DIR = '.scratch'         # Under R3D_PATH unless [Scratch] SCRATCH_DIR is set
+DEFAULT_STAGE_FILES = ['convert.dat']    # Linked from R3D_PATH into every job folder when present
+JOB_OUTPUTS = [relax3d_io.RELAX3D_OUT, 'convert.dat']
+
+
+def get_scratch_settings(config: configparser.ConfigParser) -> dict:
+    """[Scratch] section of config_main.ini (all keys optional)"""
+    scratch_dir = config.get('Scratch', 'SCRATCH_DIR', fallback='').strip()
+    stage_files = config.get('Scratch', 'STAGE_FILES', fallback=', '.join(DEFAULT_STAGE_FILES))
+    return {
+        'scratch_dir': scratch_dir or os.path.join(config.get('Paths', 'R3D_PATH', fallback='.'), DEFAULT_SCRATCH_DIR),
+        'stage_files': [name.strip() for name in stage_files.split(',') if name.strip()],
+        'max_jobs': config.getint('Scratch', 'MAX_JOBS', fallback=0),
+    }
+
+
+def job_name(option: str, engine: str = None) -> str:
+    """Name of a solve job: the area, plus the engine when several configurations run side by side"""
+    return f"{option}_{engine}" if engine else option
+
+
+def job_output_name(name: str, job: str) -> str:
+    """Job-specific name of an output (RELAX3D_V.OUT -> RELAX3D_V_L.OUT, convert.dat -> convert_L.dat)"""
+    stem, extension = os.path.splitext(name)
+    return f"{stem}_{job}{extension}"
+
+
+def max_parallel_jobs(requested: int = 0, processes_per_job: int = 1) -> int:
+    """Solve jobs run at once: `requested` (0 = one per core), bounded so all solver processes fit the cores"""
+    cores = os.cpu_count() or 1
+    limit = max(1, cores // max(1, processes_per_job))
+    return max(1, min(requested, limit)) if requested > 0 else limit
+
+
+def processes_per_job(engine: str, config: configparser.ConfigParser) -> int:
+    """Solver processes one job occupies (the parallel engine runs [Solver] WORKERS of them)"""
+    if engine == 'parallel':
+        return parallel_solver.worker_count(config.getint('Solver', 'WORKERS', fallback=0))
+    return 1
+
+
+def layer_files(layers_config: dict, r3d_path: str, option: str) -> List[str]:
+    """Divided layer files of an area present in R3D_PATH, in slice order"""
+    names = [electrode_grid.layer_output_name(f"{name}.dxf", option)
+             for name in sorted(layers_config['slices'], key=lambda name: float(name[1:]))]
+    return [name for name in names if os.path.exists(os.path.join(r3d_path, name))]
+
+
+def stage_job(r3d_path: str, work_dir: str, stage_files: List[str], layer_files: List[str] = None,
+              dat_path: str = None) -> str:
+    """Create an empty job folder and stage its inputs; returns the folder.
+
+    `stage_files` of R3D_PATH are hard-linked (or copied). relax3d.dat is
+    combined from `layer_files` of R3D_PATH, or linked from `dat_path`.
+    """
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    for name in stage_files:
+        source_path = os.path.join(r3d_path, name)
+        if os.path.exists(source_path):
+            relax3d_io.link_or_copy(source_path, os.path.join(work_dir, name))
+    if layer_files is not None:
+        relax3d_io.combine_layer_files(r3d_path, layer_files, os.path.join(work_dir, relax3d_io.RELAX3D_DAT))
+    elif dat_path:
+        relax3d_io.link_or_copy(dat_path, os.path.join(work_dir, relax3d_io.RELAX3D_DAT))
+    return work_dir
+
+
+def collect_outputs(work_dir: str, target_dir: str, job: str) -> List[str]:
+    """Move a job's RELAX3D_V.OUT, convert.dat, verification report and E field to job-specific names.
+
+    The job folder is removed afterwards. Returns the collected paths.
+    """
+    collected = []
+    potential_path = os.path.join(work_dir, relax3d_io.RELAX3D_OUT)
+    target_potential = os.path.join(target_dir, job_output_name(relax3d_io.RELAX3D_OUT, job))
+    moves = [(os.path.join(work_dir, name), os.path.join(target_dir, job_output_name(name, job)))
+             for name in JOB_OUTPUTS]
+    moves.append((residual_check.report_path(potential_path), residual_check.report_path(target_potential)))
+    stem = os.path.splitext(target_potential)[0]
+    for cache_path in field_map.gradient_cache_files(potential_path):
+        moves.append((cache_path, stem + os.path.basename(cache_path)[len("RELAX3D_V"):]))
+    for source_path, target_path in moves:
+        if os.path.exists(source_path):
+            os.replace(source_path, target_path)
+            collected.append(target_path)
+            logging.info(f"Collected '{target_path}'")
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return collected
+
+
+def solve_job(config_file: str, option: str, work_dir: str, engine: str, nested: bool = False,
+              symmetry: str = None, warm_start: bool = False, stop_event=None) -> bool:
+    """Solve relax3d.dat of a staged job folder (entry point of the solver processes).
+
+    Setting `stop_event` (a multiprocessing.Manager Event) terminates the solve.
+    """
+    auto_re3d = auto_relax3d.AutoRe3D(config_file, work_dir)
+
+    def watch():
+        try:
+            if stop_event.wait():
+                auto_re3d.terminate()
+        except (EOFError, OSError):
+            pass
+
+    if stop_event is not None:
+        threading.Thread(target=watch, daemon=True).start()
+    if engine == 'relax2000':
+        return auto_re3d.run_relax2000_task(option)
+    return auto_re3d.run_native_task(option, engine, nested, symmetry, warm_start)
+
+
+class ScratchExecutor:
+    """Solve several areas / configurations at once, each in its own scratch folder.
+
+    Every job gets relax3d.dat and the STAGE_FILES in SCRATCH_DIR/<job>, is
+    solved in its own process, and its outputs come back to R3D_PATH under
+    job-specific names (RELAX3D_V_L.OUT, RELAX3D_V_S_multigrid.OUT, ...).
+    """
+
+    def __init__(self, jobs: List[Tuple[str, str]], config_file: str = 'config_main.ini', max_jobs: int = None,
+                 nested: bool = False, symmetry: str = None, warm_start: bool = False):
+        self.config_file = config_file
+        self.config = auto_relax3d.load_config(config_file)
+        self.r3d_path = self.config.get('Paths', 'R3D_PATH')
+        self.settings = get_scratch_settings(self.config)
+        if any(engine == 'relax2000' for _, engine in jobs):
+            raise ValueError("relax2000 is driven through the desktop and cannot run side by side")
+        if nested and {'L', 'S'} <= {option for option, _ in jobs}:
+            raise ValueError("A nested S solve starts from the L solution: solve L first, then S")
+        engines = {engine for _, engine in jobs}
+        self.jobs = {job_name(option, engine if len(engines) > 1 else None): (option, engine)
+                     for option, engine in jobs}
+        per_job = max(processes_per_job(engine, self.config) for engine in engines)
+        self.max_jobs = max_parallel_jobs(self.settings['max_jobs'] if max_jobs is None else max_jobs, per_job)
+        self.nested = nested
+        self.symmetry = symmetry
+        self.warm_start = warm_start
+
+    def stage(self, layers_config: dict) -> Dict[str, str]:
+        """Combine each job's layer files into its scratch folder"""
+        work_dirs = {}
+        for job, (option, _) in self.jobs.items():
+            file_list = layer_files(layers_config, self.r3d_path, option)
+            work_dirs[job] = stage_job(self.r3d_path, os.path.join(self.settings['scratch_dir'], job),
+                                       self.settings['stage_files'], file_list)
+            logging.info(f"Job {job} staged in {work_dirs[job]} ({len(file_list)} layer files)")
+        return work_dirs
+
+    def run(self, layers_config: dict) -> Dict[str, bool]:
+        """Stage, solve up to max_jobs jobs at once and collect the outputs; returns success per job"""
+        work_dirs = self.stage(layers_config)
+        results = {}
+        start_time = time.perf_counter()
+        logging.info(f"Solving {len(self.jobs)} jobs, {self.max_jobs} at a time")
+        with ProcessPoolExecutor(max_workers=self.max_jobs) as executor:
+            futures = {executor.submit(solve_job, self.config_file, option, work_dirs[job], engine, self.nested,
+                                       self.symmetry, self.warm_start): job
+                       for job, (option, engine) in self.jobs.items()}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    results[job] = bool(future.result())
+                except Exception as e:
+                    logging.error(f"Job {job} failed: {e}")
+                    results[job] = False
+                logging.info(f"Job {job} {'done' if results[job] else 'failed'} "
+                             f"after {time.perf_counter() - start_time:.1f} s")
+                if results[job]:
+                    collect_outputs(work_dirs[job], self.r3d_path, job)
+        logging.info(f"{sum(results.values())} of {len(results)} jobs done in {time.perf_counter() - start_time:.1f} s")
+        return results
+
+
+# Main function for direct script execution
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Solve areas side by side in isolated scratch folders "
+                                                 "from the layer files in R3D_PATH")
+    parser.add_argument('jobs', nargs='+', help="Jobs as AREA or AREA:ENGINE, e.g. L S or L:sor L:multigrid")
+    parser.add_argument('--config', default='config_main.ini')
+    parser.add_argument('--max-jobs', type=int, default=None, help="Jobs run at once (default: [Scratch] MAX_JOBS, "
+                                                                    "0 = one per core)")
+    args = parser.parse_args(argv)
+
+    config = auto_relax3d.load_config(args.config)
+    default_engine = config.get('Solver', 'ENGINE', fallback='relax2000')
+    jobs = []
+    for spec in args.jobs:
+        option, _, engine = spec.partition(':')
+        if option not in ('L', 'S'):
+            parser.error(f"invalid job {spec}: the area must be L or S")
+        jobs.append((option, engine or default_engine))
+    with open(auto_relax3d.CONFIG_PATH, 'r') as file:
+        layers_config = yaml.safe_load(file)
+
+    try:
+        executor = ScratchExecutor(jobs, args.config, args.max_jobs,
+                                   config.getboolean('Solver', 'NESTED', fallback=False), None,
+                                   config.getboolean('Solver', 'WARM_START', fallback=False))
+    except ValueError as e:
+        parser.error(str(e))
+    results = executor.run(layers_config)
+    return 0 if all(results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
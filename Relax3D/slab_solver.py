@@ -0,0 +1,397 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import tracemalloc
+import configparser
+from typing import List, Tuple
+import numpy as np
+import relax3d_io
+import relax_solver
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Configuration
+DEFAULT_MEMORY_BUDGET_MB = 1024
+DEFAULT_SLAB_SWEEPS = 4        # Red-black sweeps per pass through the file (each pass reads and writes it once)
+WINDOW_BYTES_PER_POINT = 9     # float64 potential + bool electrode mask held in the slab window
+SCRATCH_BYTES_PER_POINT = 34   # Temporaries of one colour update (average, sums, |update|, colour mask)
+FIELD_BYTES_PER_POINT = 24     # In-memory E field stage: float64 potential, gradient temporary, output
+MB = 1024 * 1024
+BENCHMARK_SCALES = (1, 4, 8)   # Grid sizes (point counts) relative to the configured grid
+BENCHMARK_SWEEPS = 8
+BENCHMARK_POTENTIAL = 1000.0   # Synthetic electrode potential (V)
+
+
+def get_slab_settings(config: configparser.ConfigParser) -> dict:
+    """Read the out-of-core keys of the [Solver] section of config_main.ini"""
+    work_dir = config.get('Solver', 'SLAB_WORK_DIR', fallback='').strip()
+    return {
+        'memory_budget': config.getint('Solver', 'MEMORY_BUDGET_MB', fallback=DEFAULT_MEMORY_BUDGET_MB) * MB,
+        'sweeps': config.getint('Solver', 'SLAB_SWEEPS', fallback=DEFAULT_SLAB_SWEEPS),
+        'work_dir': work_dir or config.get('Paths', 'R3D_PATH', fallback='.'),
+    }
+
+
+def slab_planes(shape: Tuple[int, int, int], memory_budget: int, sweeps: int) -> int:
+    """Number of z planes relaxed per step so that the slab window fits in `memory_budget` bytes.
+
+    The window holds the planes being updated plus the 2 * `sweeps` planes
+    still lagging behind the front and one halo plane above it.
+    """
+    nz, ny, nx = shape
+    plane_points = ny * nx
+    lag_bytes = (2 * sweeps + 1) * plane_points * WINDOW_BYTES_PER_POINT
+    planes = (memory_budget - lag_bytes) // (plane_points * (WINDOW_BYTES_PER_POINT + SCRATCH_BYTES_PER_POINT))
+    if planes < 1:
+        needed = (lag_bytes + plane_points * (WINDOW_BYTES_PER_POINT + SCRATCH_BYTES_PER_POINT)) / MB
+        raise ValueError(f"Memory budget {memory_budget / MB:.0f} MB is too small for {nx}x{ny} planes "
+                         f"with {sweeps} sweeps per pass (needs {needed:.0f} MB)")
+    return int(min(planes, max(nz - 2, 1)))
+
+
+def work_paths(work_dir: str, option: str) -> Tuple[str, str]:
+    """Memory-mapped potential and electrode mask of an out-of-core solve"""
+    return (os.path.join(work_dir, f"RELAX3D_V_{option}.work{relax3d_io.GRID_EXTENSION}"),
+            os.path.join(work_dir, f"relax3d_{option}.fixed.npy"))
+
+
+def remove_work_files(work_dir: str, option: str):
+    """Delete the scratch files of an out-of-core solve"""
+    for path in work_paths(work_dir, option):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def prepare_work_files(dat_path: str, spec: relax3d_io.GridSpec, work_dir: str, option: str,
+                       previous_path: str = None) -> Tuple[np.memmap, np.memmap]:
+    """Stream relax3d.dat into a memory-mapped potential and electrode mask.
+
+    The potential starts at zero, or plane by plane from `previous_path`
+    (a potential of the same grid) for a warm start; the electrode points
+    are then set. Nothing larger than a plane or a block of records is held
+    in memory. Returns (potential, fixed) memmaps.
+    """
+    potential_path, fixed_path = work_paths(work_dir, option)
+    potential = relax3d_io.create_grid(potential_path, spec)
+    fixed = np.lib.format.open_memmap(fixed_path, mode='w+', dtype=bool, shape=spec.shape)
+
+    if previous_path:
+        previous_spec, _, previous = relax3d_io.open_grid(previous_path)
+        if previous_spec.shape != spec.shape:
+            raise ValueError(f"{previous_path}: grid is {previous_spec.nx}x{previous_spec.ny}x{previous_spec.nz}, "
+                             f"expected {spec.nx}x{spec.ny}x{spec.nz}")
+        for k in range(spec.nz):
+            potential[k] = previous[k]
+        logging.info(f"Initial guess copied from {previous_path}")
+
+    count = 0
+    if relax3d_io.is_grid_file(dat_path):
+        _, _, electrodes = relax3d_io.open_grid(dat_path)
+        for k in range(spec.nz):
+            plane = np.asarray(electrodes[k], dtype=np.float64)
+            fixed[k] = ~np.isnan(plane)
+            potential[k] = np.where(fixed[k], plane, potential[k])
+            count += int(np.count_nonzero(fixed[k]))
+    else:
+        for records in relax3d_io.read_electrode_blocks(dat_path):
+            i, j, k = (records[:, axis].astype(np.intp) - 1 for axis in range(3))
+            inside = (i >= 0) & (i < spec.nx) & (j >= 0) & (j < spec.ny) & (k >= 0) & (k < spec.nz)
+            fixed[k[inside], j[inside], i[inside]] = True
+            potential[k[inside], j[inside], i[inside]] = records[inside, 3]
+            count += int(np.count_nonzero(inside))
+    logging.info(f"Loaded {count} electrode points from {dat_path} into {potential_path}")
+    return potential, fixed
+
+
+def sweep_pass(potential: np.ndarray, fixed: np.ndarray, spacing: Tuple[float, float, float], omega: float,
+               sweeps: int, planes: int, mirror_bottom: bool = False) -> List[float]:
+    """Apply `sweeps` red-black SOR sweeps in one streaming pass over the z planes.
+
+    A window of `planes` planes moves up the grid; within it, sweep s
+    trails sweep s - 1 by two planes (red, then black one plane lower), so
+    every update sees exactly the values it would in a whole-grid
+    red-black sweep and the result is identical to `sweeps` calls of the
+    in-memory SOR. Planes that no sweep needs any more are written back.
+    With `mirror_bottom` the window runs over the grid extended by a fixed
+    ghost plane below plane 0, refreshed from plane 1 after every colour as
+    in relax_solver.solve_sor, so plane 0 is a symmetry plane.
+    Returns the largest update of each sweep.
+    """
+    shift = 1 if mirror_bottom else 0
+    nz, ny, nx = potential.shape[0] + shift, potential.shape[1], potential.shape[2]
+    lag = 2 * sweeps
+    window = np.empty((planes + lag + 1, ny, nx))
+    window_fixed = np.empty((planes + lag + 1, ny, nx), dtype=bool)
+    checker = np.add.outer(np.arange(1, ny - 1), np.arange(1, nx - 1)) % 2
+    changes = [0.0] * sweeps
+
+    lo = hi = 0  # Extended planes [lo, hi) are in the window (grid plane = extended plane - shift)
+    end = nz - 2 + lag
+    for a0 in range(1, end, planes):
+        a1 = min(a0 + planes, end)
+        need_lo, need_hi = max(a0 - lag, 0), min(a1 + 1, nz)
+        if need_lo > lo:
+            first = max(lo, shift)
+            if first < need_lo:
+                potential[first - shift:need_lo - shift] = window[first - lo:need_lo - lo]
+            window[:hi - need_lo] = window[need_lo - lo:hi - lo]
+            window_fixed[:hi - need_lo] = window_fixed[need_lo - lo:hi - lo]
+            lo = need_lo
+        if need_hi > hi:
+            if hi < shift:
+                window[0] = potential[1]
+                window_fixed[0] = True
+                hi = shift
+            window[hi - lo:need_hi - lo] = potential[hi - shift:need_hi - shift]
+            window_fixed[hi - lo:need_hi - lo] = fixed[hi - shift:need_hi - shift]
+            hi = need_hi
+
+        for sweep in range(sweeps):
+            for colour in (0, 1):
+                offset = 2 * sweep + colour
+                p0, p1 = max(a0 - offset, 1), min(a1 - offset, nz - 1)
+                if p0 < p1:
+                    change = relax_solver.relax_colour(window, window_fixed, lo, p0, p1, colour, checker,
+                                                       spacing, omega)
+                    changes[sweep] = max(changes[sweep], change)
+                    if mirror_bottom and lo == 0 and p0 <= 2 < p1:
+                        window[0] = window[2]
+
+    first = max(lo, shift)
+    potential[first - shift:hi - shift] = window[first - lo:hi - lo]
+    return changes
+
+
+def max_residual(potential: np.ndarray, fixed: np.ndarray, spacing: Tuple[float, float, float], planes: int) -> float:
+    """Largest Laplace residual (V), computed slab by slab"""
+    nz = potential.shape[0]
+    largest = 0.0
+    for k0 in range(1, nz - 1, planes):
+        k1 = min(k0 + planes, nz - 1)
+        window = np.asarray(potential[k0 - 1:k1 + 1])
+        res = relax_solver.residual(window, np.asarray(fixed[k0 - 1:k1 + 1]), spacing)
+        largest = max(largest, float(np.abs(res).max()))
+    return largest
+
+
+def max_abs(potential: np.ndarray, planes: int) -> float:
+    """Largest |V| of a memory-mapped grid, read slab by slab"""
+    return max(float(np.abs(potential[k:k + planes]).max()) for k in range(0, potential.shape[0], planes))
+
+
+def solve_out_of_core(potential: np.ndarray, fixed: np.ndarray, spacing: Tuple[float, float, float],
+                      settings: dict, slab_settings: dict, should_terminate=lambda: False,
+                      mirror_bottom: bool = False) -> Tuple[np.ndarray, int, float]:
+    """Relax a memory-mapped potential in z slabs with red-black SOR.
+
+    Same stopping rule and boundary handling as relax_solver.solve_sor
+    (including `mirror_bottom`), with the convergence test made after each
+    pass of slab_settings['sweeps'] sweeps. Returns (potential, iterations, max update).
+    """
+    omega = settings['omega'] or relax_solver.optimal_omega(potential.shape, spacing)
+    sweeps = slab_settings['sweeps']
+    planes = slab_planes(potential.shape, slab_settings['memory_budget'], sweeps)
+    scale = max(max_abs(potential, planes), 1.0)
+    nz, ny, nx = potential.shape
+    logging.info(f"Out-of-core SOR: grid {nx}x{ny}x{nz}, omega = {omega:.4f}, {planes} planes per slab, "
+                 f"{sweeps} sweeps per pass, budget {slab_settings['memory_budget'] / MB:.0f} MB"
+                 f"{', mirror plane at the bottom face' if mirror_bottom else ''}")
+
+    change = np.inf
+    iteration = 0
+    while iteration < settings['max_iterations'] and not should_terminate():
+        pass_sweeps = min(sweeps, settings['max_iterations'] - iteration)
+        change = sweep_pass(potential, fixed, spacing, omega, pass_sweeps, planes, mirror_bottom)[-1]
+        iteration += pass_sweeps
+        if iteration % relax_solver.LOG_EVERY < pass_sweeps:
+            logging.info(f"Out-of-core SOR iteration {iteration}: max update {change:.3e}")
+        if change < settings['tolerance'] * scale:
+            break
+
+    potential.flush()
+    return potential, iteration, change
+
+
+def mirror_bottom_face(spec: relax3d_io.GridSpec, settings: dict) -> bool:
+    """Whether the out-of-core solve treats the bottom face as the median symmetry plane"""
+    mode = settings.get('symmetry', 'auto')
+    relax_solver.check_median_plane(spec, mode)
+    if mode == 'off':
+        return False
+    if relax_solver.median_plane_index(spec) == 0:
+        return True
+    if mode == 'on':
+        logging.warning("The out-of-core engine only mirrors a grid that starts at z = 0: solving the full grid")
+    return False
+
+
+def solve_relax3d_dat_out_of_core(dat_path: str, spec: relax3d_io.GridSpec, settings: dict, slab_settings: dict,
+                                  option: str, previous_path: str = None,
+                                  should_terminate=lambda: False) -> Tuple[np.memmap, dict]:
+    """Solve relax3d.dat with the potential kept in a memory-mapped file.
+
+    The bottom face is a symmetry plane when settings['symmetry'] is not
+    'off' and the grid starts at z = 0 (a grid straddling z = 0 is solved
+    in full). Returns the solved potential (a memmap in
+    slab_settings['work_dir']; call remove_work_files when done with it)
+    and the solve stats.
+    """
+    start_time = time.perf_counter()
+    mirror_bottom = mirror_bottom_face(spec, settings)
+    potential, fixed = prepare_work_files(dat_path, spec, slab_settings['work_dir'], option, previous_path)
+    potential, iterations, change = solve_out_of_core(potential, fixed, spec.spacing, settings, slab_settings,
+                                                      should_terminate, mirror_bottom)
+    elapsed = time.perf_counter() - start_time
+
+    planes = slab_planes(spec.shape, slab_settings['memory_budget'], 1)
+    stats = {'method': 'slab', 'iterations': iterations, 'max_update': change,
+             'max_residual': max_residual(potential, fixed, spec.spacing, planes), 'seconds': elapsed,
+             'warm_start': bool(previous_path)}
+    if mirror_bottom:
+        stats['symmetric'] = True
+    logging.info(f"slab finished after {iterations} iterations in {elapsed:.2f} s "
+                 f"(last change {change:.3e}, max residual {stats['max_residual']:.3e} V)")
+    if previous_path:
+        relax_solver.log_warm_start_saving(stats, relax_solver.load_solution_stats(previous_path))
+    return potential, stats
+
+
+def scaled_spec(spec: relax3d_io.GridSpec, scale: float) -> relax3d_io.GridSpec:
+    """Same extent as `spec` with about `scale` times the points (finer spacing on every axis)"""
+    factor = scale ** (1.0 / 3.0)
+    dims = [int(round((n - 1) * factor)) + 1 for n in (spec.nx, spec.ny, spec.nz)]
+    spacing = [h * (n - 1) / (m - 1) for h, n, m in zip(spec.spacing, (spec.nx, spec.ny, spec.nz), dims)]
+    return relax3d_io.GridSpec(dims, spacing, spec.origin)
+
+
+def synthetic_case(spec: relax3d_io.GridSpec, work_dir: str, option: str) -> Tuple[np.memmap, np.memmap]:
+    """Grounded box with an electrode block over the middle third, written plane by plane"""
+    potential_path, fixed_path = work_paths(work_dir, option)
+    potential = relax3d_io.create_grid(potential_path, spec)
+    fixed = np.lib.format.open_memmap(fixed_path, mode='w+', dtype=bool, shape=spec.shape)
+    face = np.zeros((spec.ny, spec.nx), dtype=bool)
+    face[[0, -1], :] = face[:, [0, -1]] = True
+    block = np.zeros((spec.ny, spec.nx), dtype=bool)
+    block[spec.ny // 3:2 * spec.ny // 3, spec.nx // 3:2 * spec.nx // 3] = True
+    for k in range(spec.nz):
+        if k in (0, spec.nz - 1):
+            fixed[k] = True
+        elif spec.nz // 3 <= k < 2 * spec.nz // 3:
+            fixed[k] = face | block
+            potential[k] = np.where(block, BENCHMARK_POTENTIAL, 0.0)
+        else:
+            fixed[k] = face
+    return potential, fixed
+
+
+def benchmark(spec: relax3d_io.GridSpec, settings: dict, slab_settings: dict, scales=BENCHMARK_SCALES,
+              sweeps: int = BENCHMARK_SWEEPS, option: str = 'bench') -> List[dict]:
+    """Out-of-core sweep throughput on grids `scales` times the size of `spec`.
+
+    Each case runs `sweeps` sweeps from a synthetic electrode layout and
+    reports point updates per second, file traffic and the peak memory
+    allocated by the solver against the budget. On the 1x grid the
+    in-memory SOR is run as well for comparison (results must agree).
+    """
+    results = []
+    for scale in scales:
+        grid = scaled_spec(spec, scale)
+        points = grid.nx * grid.ny * grid.nz
+        potential, fixed = synthetic_case(grid, slab_settings['work_dir'], option)
+        omega = relax_solver.optimal_omega(grid.shape, grid.spacing)
+        planes = slab_planes(grid.shape, slab_settings['memory_budget'], slab_settings['sweeps'])
+
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        done = 0
+        while done < sweeps:
+            pass_sweeps = min(slab_settings['sweeps'], sweeps - done)
+            sweep_pass(potential, fixed, grid.spacing, omega, pass_sweeps, planes)
+            done += pass_sweeps
+        potential.flush()
+        elapsed = time.perf_counter() - start_time
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        passes = -(-sweeps // slab_settings['sweeps'])
+        result = {'scale': scale, 'grid': f"{grid.nx}x{grid.ny}x{grid.nz}", 'points': points,
+                  'seconds': elapsed, 'points_per_second': points * sweeps / elapsed,
+                  'io_mb_per_second': passes * points * (8 + 1 + 8) / MB / elapsed,
+                  'peak_mb': peak / MB, 'budget_mb': slab_settings['memory_budget'] / MB}
+        logging.info(f"{scale}x {result['grid']} ({points / 1e6:.1f} M points, {points * 8 / MB:.0f} MB): "
+                     f"{elapsed:.2f} s for {sweeps} sweeps, {result['points_per_second'] / 1e6:.1f} M point "
+                     f"updates/s, {result['io_mb_per_second']:.0f} MB/s file traffic, "
+                     f"peak {result['peak_mb']:.0f} MB of {result['budget_mb']:.0f} MB budget")
+
+        if scale == 1:
+            reference, reference_fixed = synthetic_case(grid, slab_settings['work_dir'], option + '_ref')
+            reference, reference_fixed = np.array(reference), np.array(reference_fixed)
+            start_time = time.perf_counter()
+            relax_solver.solve_sor(reference, reference_fixed, grid.spacing, 0.0, sweeps, omega)
+            in_memory = time.perf_counter() - start_time
+            result['in_memory_seconds'] = in_memory
+            result['max_difference'] = float(np.abs(reference - potential).max())
+            logging.info(f"   in-memory SOR: {in_memory:.2f} s ({points * sweeps / in_memory / 1e6:.1f} M point "
+                         f"updates/s), max |difference| {result['max_difference']:.3e} V")
+            del reference, reference_fixed
+            remove_work_files(slab_settings['work_dir'], option + '_ref')
+
+        del potential, fixed
+        remove_work_files(slab_settings['work_dir'], option)
+        results.append(result)
+    return results
+
+
+# Main function for direct script execution
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Out-of-core (memory-mapped, z-slab) Relax3D solver")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    solve_parser = subparsers.add_parser('solve', help="Solve relax3d.dat within the memory budget")
+    solve_parser.add_argument('--input', default=None, help="relax3d.dat path (default: R3D_PATH/relax3d.dat)")
+    solve_parser.add_argument('--output', default=None, help="Output path (default: R3D_PATH/RELAX3D_V.OUT)")
+    solve_parser.add_argument('--warm-start', default=None, metavar='PREVIOUS',
+                              help="Binary potential of the same grid to start from")
+
+    bench_parser = subparsers.add_parser('bench', help="Sweep throughput at multiples of the configured grid size")
+    bench_parser.add_argument('--scales', type=float, nargs='+', default=list(BENCHMARK_SCALES))
+    bench_parser.add_argument('--sweeps', type=int, default=BENCHMARK_SWEEPS)
+
+    for sub in (solve_parser, bench_parser):
+        sub.add_argument('option', choices=['L', 'S'], help="Grid from [Commands-L] or [Commands-S]")
+        sub.add_argument('--config', default='config_main.ini')
+        sub.add_argument('--budget', type=int, default=None, help="Memory budget in MB (default: [Solver] MEMORY_BUDGET_MB)")
+        sub.add_argument('--work-dir', default=None, help="Scratch folder (default: [Solver] SLAB_WORK_DIR)")
+    args = parser.parse_args(argv)
+
+    config = relax_solver.load_config(args.config)
+    spec = relax3d_io.load_grid_spec(args.option, config)
+    settings = relax_solver.get_solver_settings(config)
+    slab_settings = get_slab_settings(config)
+    if args.budget:
+        slab_settings['memory_budget'] = args.budget * MB
+    if args.work_dir:
+        slab_settings['work_dir'] = args.work_dir
+
+    if args.command == 'bench':
+        benchmark(spec, settings, slab_settings, [int(s) if float(s).is_integer() else s for s in args.scales],
+                  args.sweeps)
+        return 0
+
+    r3d_path = config.get('Paths', 'R3D_PATH', fallback='.')
+    dat_path = args.input or os.path.join(r3d_path, relax3d_io.RELAX3D_DAT)
+    potential, _ = solve_relax3d_dat_out_of_core(dat_path, spec, settings, slab_settings, args.option,
+                                                 args.warm_start)
+    output_path = args.output or os.path.join(r3d_path, relax3d_io.RELAX3D_OUT)
+    relax3d_io.write_potential(output_path, potential)
+    logging.info(f"Potential written to {output_path}")
+    del potential
+    remove_work_files(slab_settings['work_dir'], args.option)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
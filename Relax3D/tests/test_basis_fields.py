@@ -0,0 +1,43 @@
+import configparser
+import numpy as np
+import pytest
+import basis_fields
+import relax3d_io
+import relax_solver
+import residual_check
+
+SPEC = relax3d_io.GridSpec((7, 7, 7), (1.0, 1.0, 1.0), (-3.0, -3.0, -3.0))
+
+
+@pytest.fixture
+def basis(tmp_path):
+    """Basis fields of a grounded box (marker 0) around two electrode groups (markers 1 and 2)"""
+    fixed = np.zeros(SPEC.shape, dtype=bool)
+    fixed[[0, -1]] = fixed[:, [0, -1]] = fixed[:, :, [0, -1]] = True
+    k, j, i = np.nonzero(fixed)
+    electrodes = np.column_stack((i + 1, j + 1, k + 1, np.zeros(len(i))))
+    dat_path = str(tmp_path / relax3d_io.RELAX3D_DAT)
+    relax3d_io.write_electrodes(dat_path, np.vstack((electrodes, [[3, 4, 4, 1.0], [5, 4, 4, 2.0]])))
+    settings = relax_solver.get_solver_settings(configparser.ConfigParser())
+    settings.update(symmetry='off')
+    output_dir = str(tmp_path / 'basis_L')
+    basis_fields.compute_basis_fields(dat_path, SPEC, settings, output_dir)
+    return dat_path, output_dir
+
+
+def test_composed_potential_is_verified_against_the_voltages(basis, tmp_path):
+    dat_path, output_dir = basis
+    output_path = str(tmp_path / relax3d_io.RELAX3D_OUT)
+    potential = basis_fields.compose_to_file(output_dir, {'1': 45000.0, '2': -1000.0}, output_path, dat_path)
+    assert potential[3, 3, 2] == pytest.approx(45000.0)
+    verified, message = residual_check.check_verified(output_path)
+    assert verified, message
+    assert residual_check.recorded_engine(output_path) == 'basis'
+
+
+def test_stale_relax3d_dat_is_refused(basis, tmp_path):
+    dat_path, output_dir = basis
+    with open(dat_path, 'a') as file:
+        file.write('4 4 4 3\n')
+    with pytest.raises(ValueError, match='recompute'):
+        basis_fields.compose_to_file(output_dir, {'1': 45000.0}, str(tmp_path / relax3d_io.RELAX3D_OUT), dat_path)
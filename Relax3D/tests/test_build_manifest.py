@@ -0,0 +1,76 @@
+import copy
+import os
+import shutil
+import pytest
+import build_manifest
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'golden')
+EXEC_CMD = [['-0.5', '-0.5', '0', '.1', '.1', '.1', '10', '10'], ['3']]
+
+
+def layers_config() -> dict:
+    return {'options': {'L': {'exec_cmd': EXEC_CMD}},
+            'slices': {'L1': {'zmin': 0.0, 'zmax': 0.1, 'potential': [1000, -250]},
+                       'L2': {'zmin': 0.1, 'zmax': 0.2, 'potential': [0, 1]}}}
+
+
+def build(manifest: dict, config: dict, folder: str, backend: str = 'native') -> list:
+    """Rebuild the stale slices (write their layer files) and record them; returns the slices rebuilt"""
+    stale, records = build_manifest.stale_slices(manifest, config, folder, folder, 'L', ['L1', 'L2'], backend)
+    for slice_name in stale:
+        with open(os.path.join(folder, records[slice_name]['output']), 'w') as file:
+            file.write('1 1 1 0\n')
+        build_manifest.record_built(manifest, 'L', slice_name, records[slice_name])
+    build_manifest.save_manifest(folder, manifest)
+    return stale
+
+
+def stale(folder: str, config: dict, backend: str = 'native') -> list:
+    manifest = build_manifest.load_manifest(folder)
+    return build_manifest.stale_slices(manifest, config, folder, folder, 'L', ['L1', 'L2'], backend)[0]
+
+
+def test_only_changed_slices_are_rebuilt(tmp_path):
+    folder = str(tmp_path)
+    for slice_name in ('L1', 'L2'):
+        shutil.copy(os.path.join(GOLDEN, 'L1.dxf'), os.path.join(folder, f'{slice_name}.dxf'))
+    config = layers_config()
+    assert build_manifest.load_manifest(folder) == {}
+    assert build({}, config, folder) == ['L1', 'L2']
+    assert stale(folder, config) == []
+    assert [name for name in os.listdir(folder) if name.endswith('.tmp')] == []
+
+    # Re-saving the same numbers or touching a DXF without changing it is not a change
+    resaved = copy.deepcopy(config)
+    resaved['slices']['L2']['potential'] = [0.0, 1.0]
+    os.utime(os.path.join(folder, 'L1.dxf'), ns=(0, 0))
+    assert stale(folder, resaved) == []
+
+    edited = copy.deepcopy(config)
+    edited['slices']['L2']['zmax'] = 0.3
+    assert stale(folder, edited) == ['L2']
+    with open(os.path.join(folder, 'L1.dxf'), 'a') as file:
+        file.write('0\nEOF\n')
+    assert stale(folder, config) == ['L1']
+    assert stale(folder, config, backend='win32') == ['L1', 'L2']
+    os.remove(os.path.join(folder, 'L2.txt'))
+    assert build(build_manifest.load_manifest(folder), config, folder) == ['L1', 'L2']
+    assert stale(folder, config) == []
+
+
+def test_identical_slices_are_linked_not_built(tmp_path):
+    batch_pipeline = pytest.importorskip('batch_pipeline')
+    folder = str(tmp_path)
+    for slice_name in ('L1', 'L2', 'L3'):
+        shutil.copy(os.path.join(GOLDEN, 'L1.dxf'), os.path.join(folder, f'{slice_name}.dxf'))
+    config = layers_config()
+    config['slices']['L2'] = dict(config['slices']['L1'], potential=[1000.0, -250.0])
+    config['slices']['L3'] = dict(config['slices']['L1'], zmax=0.2)
+    _, records = build_manifest.stale_slices({}, config, folder, folder, 'L', ['L1', 'L2', 'L3'], 'native')
+    assert batch_pipeline.duplicate_slices(records, ['L1', 'L2', 'L3']) == {'L2': 'L1'}
+
+    with open(os.path.join(folder, records['L1']['output']), 'w') as file:
+        file.write('1 1 1 0\n')
+    batch_pipeline.link_layer(os.path.join(folder, records['L1']['output']),
+                              os.path.join(folder, records['L2']['output']))
+    assert os.path.samefile(os.path.join(folder, 'L1.txt'), os.path.join(folder, 'L2.txt'))
@@ -0,0 +1,62 @@
+import sys
+import time
+import subprocess
+import pytest
+import completion
+
+# Writes its file, closes it, then stays alive: only the close can end the wait early
+WRITER = ("import sys, time\n"
+          "with open(sys.argv[1], 'w') as file:\n"
+          "    file.write('x' * 1000)\n"
+          "time.sleep(30)\n")
+
+
+def test_close_of_output_ends_the_phase(tmp_path):
+    process = subprocess.Popen([sys.executable, '-c', WRITER, str(tmp_path / 'RELAX3D_V.OUT')])
+    detector = completion.CompletionDetector(str(tmp_path), process, stable_seconds=60.0)
+    try:
+        if not isinstance(detector.watcher, completion.InotifyWatcher):
+            pytest.skip("file close events need inotify")
+        detector.start(['RELAX3D_V.OUT'])
+        start_time = time.monotonic()
+        assert detector.wait(20.0) == 'output'
+        assert time.monotonic() - start_time < 20.0
+    finally:
+        detector.close()
+        process.kill()
+        process.wait()
+
+
+def test_polling_waits_for_a_stable_output(tmp_path):
+    output = tmp_path / 'RELAX3D_V.OUT'
+    output.write_text('old\n')
+    detector = completion.CompletionDetector(str(tmp_path), stable_seconds=0.2, polling=True)
+    try:
+        detector.start(['RELAX3D_V.OUT'])
+        assert detector.wait(0.3) == 'timeout'  # Unchanged since start(): not this phase's output
+        output.write_text('new\n')
+        start_time = time.monotonic()
+        assert detector.wait(5.0) == 'output'
+        assert time.monotonic() - start_time >= 0.2
+    finally:
+        detector.close()
+
+
+def test_process_exit_and_log_pattern(tmp_path):
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    log_path = tmp_path / 'relax.log'
+    log_path.write_text('iteration 10 converged\n')
+    detector = completion.CompletionDetector(str(tmp_path), process, log_path=str(log_path),
+                                             log_pattern='converged', polling=True)
+    try:
+        detector.start(['RELAX3D_V.OUT'], use_log=True)
+        assert detector.wait(5.0) == 'exit'  # The match was logged before start()
+        with open(log_path, 'a') as file:
+            file.write('iteration 20 conver')
+        assert not detector.log_done()  # Incomplete line
+        with open(log_path, 'a') as file:
+            file.write('ged\n')
+        assert detector.wait(5.0) == 'log'
+    finally:
+        detector.close()
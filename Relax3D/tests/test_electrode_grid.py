@@ -0,0 +1,23 @@
+import os
+import dxf_geometry
+import electrode_grid
+import relax3d_io
+
+# L1.dxf holds a closed LWPOLYLINE rectangle and a square drawn as four
+# LINEs; L1.txt lists the grid points inside them, worked out by hand
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'golden')
+
+
+def test_rasterized_layer_matches_golden_file(tmp_path):
+    layers_config = electrode_grid.load_layers_config(os.path.join(GOLDEN, 'config_layers.yaml'))
+    spec = relax3d_io.grid_spec_from_exec_cmd(layers_config['options']['L']['exec_cmd'])
+    geometry = dxf_geometry.parse_dxf(os.path.join(GOLDEN, 'L1.dxf'))
+    assert len(geometry) == 2
+
+    labels = electrode_grid.polygon_label_map(geometry, spec)
+    assert (labels == 0).sum() == 4 and (labels == 1).sum() == 4
+
+    records = electrode_grid.rasterize_slice(geometry, layers_config['slices']['L1'], spec)
+    output_path = str(tmp_path / electrode_grid.layer_output_name('L1.dxf', 'L'))
+    relax3d_io.write_electrodes(output_path, records)
+    assert electrode_grid.verify_against_golden([output_path], GOLDEN)
@@ -0,0 +1,106 @@
+import numpy as np
+import field_map
+import relax3d_io
+
+
+def quadratic_grid(tmp_path):
+    """Binary grid of V = x^2 + 2 y z, whose cached central differences differ from the interpolant's slope"""
+    spec = relax3d_io.GridSpec((9, 7, 5), (0.5, 1.0, 2.0), (-2.0, -3.0, 1.0))
+    xs, ys, zs = spec.axes()
+    z, y, x = np.meshgrid(zs, ys, xs, indexing='ij')
+    path = str(tmp_path / 'V.r3dg')
+    relax3d_io.write_grid(path, x ** 2 + 2.0 * y * z, spec)
+    return path, spec
+
+
+def test_open_uses_cached_field(tmp_path):
+    path, spec = quadratic_grid(tmp_path)
+    assert field_map.FieldMap.open(path).gradient is None
+
+    field_map.cache_field(path)
+    cached = field_map.FieldMap.open(path)
+    assert cached.gradient is not None
+    xs, ys, zs = spec.axes()
+    nodes = np.array([[xs[3], ys[2], zs[1]], [xs[0], ys[6], zs[4]]])
+    expected = np.array([[-2.0 * xs[3], -2.0 * zs[1], -2.0 * ys[2]],
+                         [-2.0 * xs[0], -2.0 * zs[4], -2.0 * ys[6]]])
+    for method in field_map.INTERPOLATION_METHODS:
+        assert np.allclose(cached.field(nodes, method), expected, atol=1e-5)
+
+
+def test_composite_uses_cached_field(tmp_path):
+    path, spec = quadratic_grid(tmp_path)
+    field_map.cache_field(path)
+    composite = field_map.CompositeFieldMap.open([path])
+    point = np.array([[0.25, 0.5, 4.0]])
+    assert composite.maps[0].gradient is not None
+    assert np.allclose(composite.field(point), field_map.FieldMap.open(path).field(point))
+
+
+def test_stale_cache_is_ignored(tmp_path):
+    path, spec = quadratic_grid(tmp_path)
+    field_map.cache_field(path)
+    relax3d_io.write_grid(path, np.zeros(spec.shape), spec)
+    assert field_map.load_field(path) is None
+    assert field_map.FieldMap.open(path).gradient is None
+
+
+def mirrored_grids(half=relax3d_io.GridSpec((9, 7, 6), (0.5, 1.0, 0.4), (-2.0, -3.0, 0.0))):
+    """A potential even in z on a half grid starting at z = 0 and on the full grid mirrored below it"""
+    full = relax3d_io.GridSpec((half.nx, half.ny, 2 * half.nz - 1), half.spacing,
+                               (half.x0, half.y0, -(half.nz - 1) * half.hz))
+
+    def values(spec):
+        xs, ys, zs = spec.axes()
+        z, y, x = np.meshgrid(zs, ys, xs, indexing='ij')
+        return np.sin(x) + np.cos(y) * np.cos(z) + x * z ** 2
+    return (field_map.FieldMap(values(half), half), field_map.FieldMap(values(full), full))
+
+
+def test_symmetric_half_matches_mirrored_grid():
+    half, full = mirrored_grids()
+    assert half.symmetric and not full.symmetric
+    assert np.array_equal(half.bounds()[0], full.bounds()[0])
+    points = np.random.default_rng(0).uniform(*full.bounds(), size=(500, 3))
+    points[:50, 2] = 0.0
+    points[50:100, 2] = np.linspace(-0.39, 0.39, 50)  # Off the nodes, where the linear slope jumps
+    for method in field_map.INTERPOLATION_METHODS:
+        half_potential, half_field = half.evaluate(points, method)
+        full_potential, full_field = full.evaluate(points, method)
+        assert np.allclose(half_potential, full_potential, rtol=0.0, atol=1e-10)
+        assert np.allclose(half_field, full_field, rtol=0.0, atol=1e-10)
+    # The cubic interpolant is smooth across the median plane
+    assert np.abs(half.field(points[:50], 'cubic')[:, 2]).max() < 1e-12
+
+
+def test_cached_field_of_symmetric_half_matches_mirrored_grid(tmp_path):
+    half, full = mirrored_grids()
+    paths = []
+    for name, grid in (('half', half), ('full', full)):
+        path = str(tmp_path / f'{name}.r3dg')
+        relax3d_io.write_grid(path, grid.values, grid.spec)
+        field_map.cache_field(path)
+        paths.append(path)
+    half, full = (field_map.FieldMap.open(path) for path in paths)
+    assert np.all(half.gradient[2, 0] == 0.0)
+    assert np.allclose(half.gradient, full.gradient[:, 5:], rtol=0.0, atol=1e-6)
+    points = np.random.default_rng(1).uniform(*full.bounds(), size=(500, 3))
+    for method in field_map.INTERPOLATION_METHODS:
+        assert np.allclose(half.field(points, method), full.field(points, method), rtol=0.0, atol=1e-6)
+
+
+def test_composite_of_symmetric_halves_matches_mirrored_grids():
+    small_half, small_full = mirrored_grids(relax3d_io.GridSpec((9, 9, 5), (0.25, 0.25, 0.2), (-1.0, -1.0, 0.0)))
+    large_half, large_full = mirrored_grids()
+    halves = field_map.CompositeFieldMap([small_half, large_half])
+    fulls = field_map.CompositeFieldMap([small_full, large_full])
+    points = np.random.default_rng(2).uniform((-2.0, -3.0, -2.0), (2.0, 3.0, 0.0), size=(500, 3))
+    points[:50, 2] = 0.0
+    region = halves.region(points)
+    assert np.array_equal(region, fulls.region(points))
+    assert set(region) == {0, 1}
+    for method in field_map.INTERPOLATION_METHODS:
+        half_potential, half_field = halves.evaluate(points, method)
+        full_potential, full_field = fulls.evaluate(points, method)
+        assert np.allclose(half_potential, full_potential, rtol=0.0, atol=1e-10)
+        assert np.allclose(half_field, full_field, rtol=0.0, atol=1e-10)
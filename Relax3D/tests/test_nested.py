@@ -0,0 +1,48 @@
+import configparser
+import numpy as np
+import pytest
+import relax3d_io
+import relax_solver
+
+COARSE = relax3d_io.GridSpec((9, 9, 5), (2.0, 2.0, 2.0), (-8.0, -8.0, 0.0))
+FINE = relax3d_io.GridSpec((9, 9, 5), (1.0, 1.0, 1.0), (-4.0, -4.0, 0.0))
+
+
+def coarse_solution(tmp_path, stats: dict) -> str:
+    """A solved L potential with its solve record"""
+    path = str(tmp_path / 'RELAX3D_V_L.r3dg')
+    xs, ys, zs = COARSE.axes()
+    z, y, x = np.meshgrid(zs, ys, xs, indexing='ij')
+    relax3d_io.write_grid(path, 100.0 - x ** 2 - y ** 2 + z ** 2, COARSE)
+    if stats is not None:
+        relax_solver.save_solution_stats(path, stats)
+    return path
+
+
+@pytest.mark.parametrize('stats, message', [
+    (None, 'no solve record'),
+    ({'method': 'sor'}, 'held at 0 V'),
+    ({'method': 'relax2000', 'symmetric': True}, 'not verified'),
+])
+def test_untrusted_coarse_solution_is_refused(tmp_path, stats, message):
+    path = coarse_solution(tmp_path, stats)
+    with pytest.raises(ValueError, match=message):
+        relax_solver.check_nested_source(path, COARSE)
+
+
+@pytest.mark.parametrize('stats', [
+    {'method': 'multigrid', 'symmetric': True},
+    {'method': 'relax2000', 'symmetric': True, 'verified': True},
+])
+def test_nested_solve_from_trusted_coarse_solution(tmp_path, stats):
+    path = coarse_solution(tmp_path, stats)
+    dat_path = str(tmp_path / relax3d_io.RELAX3D_DAT)
+    relax3d_io.write_electrodes(dat_path, np.array([[5, 5, 3, 50.0]]))
+    settings = relax_solver.get_solver_settings(configparser.ConfigParser())
+    potential, fixed, solve_stats = relax_solver.solve_nested(dat_path, FINE, path, COARSE, settings)
+    assert solve_stats['symmetric']
+    assert potential[2, 4, 4] == 50.0
+    # Outer side faces come from the coarse solution (V = 100 - x^2 - y^2 + z^2 at a coarse node)
+    assert potential[2, 4, 0] == pytest.approx(100.0 - 16.0 + 4.0, abs=1e-9)
+    # Between the coarse planes next to z = 0 the cubic taps are mirrored, so the quadratic is still exact
+    assert potential[1, 4, 0] == pytest.approx(100.0 - 16.0 + 1.0, abs=1e-9)
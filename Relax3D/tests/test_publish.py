@@ -0,0 +1,69 @@
+import configparser
+import os
+import numpy as np
+import pytest
+import relax3d_io
+import relax_solver
+import residual_check
+
+SPEC = relax3d_io.GridSpec((7, 7, 7), (1.0, 1.0, 1.0), (-3.0, -3.0, -3.0))
+
+
+def solved_output(tmp_path, engine: str = 'sor') -> str:
+    """RELAX3D_V.OUT of a grounded box around a 100 V point, verified as the output of `engine`"""
+    fixed = np.zeros(SPEC.shape, dtype=bool)
+    fixed[[0, -1]] = fixed[:, [0, -1]] = fixed[:, :, [0, -1]] = True
+    k, j, i = np.nonzero(fixed)
+    electrodes = np.column_stack((i + 1, j + 1, k + 1, np.zeros(len(i))))
+    dat_path = str(tmp_path / relax3d_io.RELAX3D_DAT)
+    relax3d_io.write_electrodes(dat_path, np.vstack((electrodes, [[4, 4, 4, 100.0]])))
+    settings = relax_solver.get_solver_settings(configparser.ConfigParser())
+    settings.update(symmetry='off')
+    potential, _, _ = relax_solver.solve_relax3d_dat(dat_path, SPEC, settings)
+    output_path = str(tmp_path / relax3d_io.RELAX3D_OUT)
+    relax3d_io.write_potential(output_path, potential)
+    residual_check.verify_files(dat_path, output_path, SPEC, engine=engine)
+    return output_path
+
+
+def test_report_records_the_producing_engine(tmp_path):
+    output_path = solved_output(tmp_path, 'multigrid')
+    assert residual_check.check_verified(output_path)[0]
+    assert residual_check.recorded_engine(output_path) == 'multigrid'
+
+    residual_check.record_unchecked(output_path, 'relax2000', 'not checked')
+    assert residual_check.recorded_engine(output_path) == 'relax2000'
+    assert not residual_check.check_verified(output_path)[0]
+
+    with open(output_path, 'a') as file:
+        file.write('0\n')
+    assert residual_check.recorded_engine(output_path) is None
+
+
+def publish_config(tmp_path, checks: bool = False) -> configparser.ConfigParser:
+    config = configparser.ConfigParser()
+    config.read_dict({'Paths': {'CYCLOTRON_TYPE': 'test', 'TARGET_OUTPUT_PATH': str(tmp_path / 'out')},
+                      'Solver': {'VERIFY': 'true', 'RELAX2000_CHECKS': str(checks).lower()}})
+    return config
+
+
+@pytest.mark.parametrize('record, checks, published', [
+    ('unchecked', False, True),
+    ('unchecked', True, False),
+    ('failed', False, False),
+    (None, False, False),
+])
+def test_publish_gates_on_the_recorded_engine(tmp_path, record, checks, published):
+    auto_relax3d = pytest.importorskip('auto_relax3d')
+    output_path = solved_output(tmp_path)
+    if record == 'unchecked':
+        residual_check.record_unchecked(output_path, 'relax2000', 'not checked')
+    elif record == 'failed':
+        report = residual_check.load_report(output_path)
+        report.update(ok=False, problems=['max residual too large'])
+        residual_check.save_report(output_path, report)
+    else:
+        os.remove(residual_check.report_path(output_path))
+    published_path = tmp_path / 'out' / f"cyc_test_CL{auto_relax3d.datetime.now():%m%d}A.efld"
+    assert auto_relax3d.publish_outputs('L', 'A', publish_config(tmp_path, checks), str(tmp_path)) == published
+    assert published_path.exists() == published
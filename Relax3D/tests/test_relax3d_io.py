@@ -0,0 +1,83 @@
+import os
+import numpy as np
+import relax3d_io
+
+# Hand-written in the layouts relax3d_io assumes; not files produced by
+# relax2000 or the WIN32 tools, so they pin the readers and writers to
+# each other, not to the real formats
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+SPEC = relax3d_io.GridSpec((4, 3, 2), (1.0, 1.0, 1.0), (-1.5, -1.0, 0.0))
+
+
+def test_read_convert_dat():
+    spec = relax3d_io.read_convert_dat(os.path.join(DATA, 'convert.dat'))
+    assert spec.shape == SPEC.shape
+    assert np.allclose(spec.spacing, SPEC.spacing)
+    assert np.allclose(spec.origin, SPEC.origin)
+
+
+def test_read_potential_is_x_fastest():
+    potential = relax3d_io.read_potential(os.path.join(DATA, relax3d_io.RELAX3D_OUT), SPEC)
+    k, j, i = np.indices(SPEC.shape)
+    assert np.array_equal(potential, 100.0 * k + 10.0 * j + i)
+
+
+def test_potential_round_trip(tmp_path):
+    source = os.path.join(DATA, relax3d_io.RELAX3D_OUT)
+    potential = relax3d_io.read_potential(source, SPEC)
+    copy = str(tmp_path / relax3d_io.RELAX3D_OUT)
+    relax3d_io.write_potential(copy, potential)
+    assert np.array_equal(relax3d_io.read_potential(copy, SPEC), potential)
+    with open(source) as expected, open(copy) as written:
+        assert written.read().split('\n') == expected.read().split('\n')
+
+
+def test_read_electrodes():
+    fixed, values = relax3d_io.read_electrodes(os.path.join(DATA, relax3d_io.RELAX3D_DAT), SPEC)
+    assert np.count_nonzero(fixed) == 5
+    assert values[0, 1, 1] == 1000.0
+    assert values[1, 1, 2] == 1000.0
+    assert values[1, 2, 0] == -250.5
+    blocks = list(relax3d_io.read_electrode_blocks(os.path.join(DATA, relax3d_io.RELAX3D_DAT), block_size=16))
+    assert sum(len(block) for block in blocks) == 5
+
+
+def test_electrodes_round_trip(tmp_path):
+    source = os.path.join(DATA, relax3d_io.RELAX3D_DAT)
+    fixed, values = relax3d_io.read_electrodes(source, SPEC)
+    k, j, i = np.nonzero(fixed)
+    copy = str(tmp_path / relax3d_io.RELAX3D_DAT)
+    relax3d_io.write_electrodes(copy, np.column_stack((i + 1, j + 1, k + 1, values[fixed])))
+    copy_fixed, copy_values = relax3d_io.read_electrodes(copy, SPEC)
+    assert np.array_equal(copy_fixed, fixed)
+    assert np.array_equal(copy_values, values)
+
+
+def test_combine_layer_files_matches_reference(tmp_path):
+    # L2.txt has no trailing line break: the combiner inserts \r\n before L3.txt
+    layers = os.path.join(DATA, 'layers')
+    output_path = relax3d_io.combine_layer_files(layers, ['L1.txt', 'L2.txt', 'L3.txt'],
+                                                 str(tmp_path / relax3d_io.RELAX3D_DAT))
+    assert relax3d_io.files_identical(output_path, os.path.join(DATA, relax3d_io.RELAX3D_DAT))
+    with open(output_path, 'rb') as file:
+        assert file.read().count(b'\r\n') == 5
+
+
+def test_link_or_copy_replaces_target(tmp_path):
+    source, target = tmp_path / 'L1.txt', tmp_path / 'L2.txt'
+    source.write_text('1 1 1 0\n')
+    target.write_text('stale\n')
+    assert relax3d_io.link_or_copy(str(source), str(target)) == 'linked'
+    assert target.read_text() == '1 1 1 0\n'
+    assert os.path.samefile(source, target)
+
+
+def test_link_or_copy_falls_back_to_copy(tmp_path, monkeypatch):
+    def refuse(source_path, target_path):
+        raise OSError('links not supported')
+    source, target = tmp_path / 'L1.txt', tmp_path / 'L2.txt'
+    source.write_text('1 1 1 0\n')
+    monkeypatch.setattr(os, 'link', refuse)
+    assert relax3d_io.link_or_copy(str(source), str(target)) == 'copied'
+    assert target.read_text() == '1 1 1 0\n'
+    assert not os.path.samefile(source, target)
@@ -0,0 +1,44 @@
+import configparser
+import numpy as np
+import pytest
+import relax3d_io
+import relax_solver
+
+# V = x^2 + y^2 - 2 z^2 + 50 is harmonic and the 7-point Laplacian is exact
+# for quadratics, so the discrete solution is the analytic one. All values
+# are exact in the '%g' electrode records of relax3d.dat.
+SPEC = relax3d_io.GridSpec((9, 7, 9), (1.0, 1.0, 0.5), (-4.0, -3.0, -1.0))
+TOLERANCE = 1e-10
+MATCH_TOLERANCE = 1e-6  # V, of potentials up to 75 V
+
+
+def analytic_potential() -> np.ndarray:
+    xs, ys, zs = SPEC.axes()
+    z, y, x = np.meshgrid(zs, ys, xs, indexing='ij')
+    return x ** 2 + y ** 2 - 2.0 * z ** 2 + 50.0
+
+
+@pytest.fixture(scope='module')
+def reference_case(tmp_path_factory):
+    """relax3d.dat holding the outer faces and one interior electrode, and the analytic RELAX3D_V.OUT"""
+    folder = tmp_path_factory.mktemp('reference')
+    fixed = np.zeros(SPEC.shape, dtype=bool)
+    fixed[[0, -1]] = fixed[:, [0, -1]] = fixed[:, :, [0, -1]] = True
+    fixed[4, 3, 2] = True
+    potential = analytic_potential()
+    k, j, i = np.nonzero(fixed)
+    dat_path = str(folder / relax3d_io.RELAX3D_DAT)
+    relax3d_io.write_electrodes(dat_path, np.column_stack((i + 1, j + 1, k + 1, potential[fixed])))
+    reference_path = str(folder / relax3d_io.RELAX3D_OUT)
+    relax3d_io.write_potential(reference_path, potential)
+    return dat_path, reference_path
+
+
+@pytest.mark.parametrize('method', ['sor', 'multigrid', 'parallel'])
+def test_engine_matches_analytic_reference(method, reference_case):
+    settings = relax_solver.get_solver_settings(configparser.ConfigParser())
+    settings.update(tolerance=TOLERANCE, multigrid_tolerance=TOLERANCE, max_iterations=100000, workers=2)
+    stats = relax_solver.benchmark(*reference_case, SPEC, settings, method)
+    assert not stats.get('symmetric')
+    assert stats['reference_max_residual'] < MATCH_TOLERANCE
+    assert stats['max_difference'] < MATCH_TOLERANCE
@@ -0,0 +1,35 @@
+import os
+import time
+import result_cache
+
+ENTRY_BYTES = 1000
+
+
+def store(cache: result_cache.ResultCache, tmp_path, key: str, last_used: float):
+    """Cache a layer file of ENTRY_BYTES under `key`, last used at `last_used` (epoch seconds)"""
+    path = tmp_path / f'{key}.txt'
+    path.write_bytes(b'0' * ENTRY_BYTES)
+    cache.store('preprocess', key, {result_cache.LAYER_FILE: str(path)}, 1.0)
+    os.utime(os.path.join(cache.entry_dir(key), result_cache.ENTRY_FILE), (last_used, last_used))
+
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path):
+    cache = result_cache.ResultCache(str(tmp_path / 'cache'), budget_mb=3 * ENTRY_BYTES / result_cache.MB)
+    for n, key in enumerate(['aa01', 'bb02', 'cc03']):
+        store(cache, tmp_path, key, last_used=1000.0 + n)
+    assert [entry['key'] for entry in cache.entries()] == ['aa01', 'bb02', 'cc03']
+
+    # A hit makes the oldest entry the most recently used
+    restored = tmp_path / 'L1.txt'
+    assert cache.fetch('preprocess', 'aa01', {result_cache.LAYER_FILE: str(restored)})
+    assert restored.read_bytes() == b'0' * ENTRY_BYTES
+    assert [entry['key'] for entry in cache.entries()] == ['bb02', 'cc03', 'aa01']
+
+    # Storing a fourth entry goes over the budget: only the least recently used one goes
+    store(cache, tmp_path, 'dd04', last_used=time.time() + 60.0)
+    assert sorted(entry['key'] for entry in cache.entries()) == ['aa01', 'cc03', 'dd04']
+    assert not cache.fetch('preprocess', 'bb02', {result_cache.LAYER_FILE: str(restored)})
+
+    assert cache.evict(budget_mb=ENTRY_BYTES / result_cache.MB) == 2 * ENTRY_BYTES
+    assert [entry['key'] for entry in cache.entries()] == ['dd04']
+    assert cache.stats()['preprocess'] == {'hits': 1, 'misses': 1, 'saved_seconds': 1.0}
@@ -0,0 +1,33 @@
+import os
+import shutil
+import pytest
+import relax3d_io
+import residual_check
+
+scratch_jobs = pytest.importorskip('scratch_jobs')
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def test_job_is_staged_and_collected_under_its_name(tmp_path):
+    r3d_path = tmp_path / 'r3d'
+    shutil.copytree(os.path.join(DATA, 'layers'), r3d_path)
+    shutil.copy(os.path.join(DATA, 'convert.dat'), r3d_path)
+    work_dir = scratch_jobs.stage_job(str(r3d_path), str(tmp_path / 'scratch' / 'L_sor'),
+                                      ['convert.dat', 'absent.dat'], ['L1.txt', 'L2.txt', 'L3.txt'])
+    assert sorted(os.listdir(work_dir)) == ['convert.dat', relax3d_io.RELAX3D_DAT]
+    assert relax3d_io.files_identical(os.path.join(work_dir, relax3d_io.RELAX3D_DAT),
+                                      os.path.join(DATA, relax3d_io.RELAX3D_DAT))
+
+    # What a solve leaves in the job folder
+    potential_path = os.path.join(work_dir, relax3d_io.RELAX3D_OUT)
+    shutil.copy(os.path.join(DATA, relax3d_io.RELAX3D_OUT), potential_path)
+    with open(residual_check.report_path(potential_path), 'w') as file:
+        file.write('{}\n')
+    with open(os.path.join(work_dir, 'RELAX3D_V.E-0123abcd.npy'), 'wb') as file:
+        file.write(b'\0')
+    collected = scratch_jobs.collect_outputs(work_dir, str(r3d_path), 'L_sor')
+    assert sorted(os.path.basename(path) for path in collected) == \
+        ['RELAX3D_V_L_sor.E-0123abcd.npy', 'RELAX3D_V_L_sor.OUT', 'RELAX3D_V_L_sor.verify.json', 'convert_L_sor.dat']
+    assert relax3d_io.files_identical(str(r3d_path / 'RELAX3D_V_L_sor.OUT'), os.path.join(DATA, relax3d_io.RELAX3D_OUT))
+    assert (r3d_path / 'convert.dat').exists()  # The staged link goes, R3D_PATH's own file stays
+    assert not os.path.exists(work_dir)
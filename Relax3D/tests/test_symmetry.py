@@ -0,0 +1,96 @@
+import configparser
+import numpy as np
+import pytest
+import relax3d_io
+import relax_solver
+import slab_solver
+
+ELECTRODE_POTENTIAL = 100.0
+TOLERANCE = 1e-11
+MATCH_TOLERANCE = 1e-6  # V
+
+
+def half_case():
+    """Upper half of a grounded box (starting at z = 0) with an electrode block touching the median plane"""
+    spec = relax3d_io.GridSpec((17, 15, 9), (1.0, 1.0, 1.0), (0.0, 0.0, 0.0))
+    fixed = np.zeros(spec.shape, dtype=bool)
+    potential = np.zeros(spec.shape)
+    fixed[:, [0, -1], :] = fixed[:, :, [0, -1]] = True
+    fixed[-1] = True
+    fixed[0:3, 5:9, 6:11] = True
+    potential[0:3, 5:9, 6:11] = ELECTRODE_POTENTIAL
+    fixed[4, 2:4, 2:5] = True
+    potential[4, 2:4, 2:5] = -0.5 * ELECTRODE_POTENTIAL
+    return spec, fixed, potential
+
+
+def full_case(fixed: np.ndarray, potential: np.ndarray):
+    """The same electrodes mirrored below z = 0, with a grounded bottom face"""
+    nz = fixed.shape[0]
+    order = list(range(nz - 1, 0, -1)) + list(range(nz))
+    spec = relax3d_io.GridSpec((fixed.shape[2], fixed.shape[1], 2 * nz - 1), (1.0, 1.0, 1.0),
+                               (0.0, 0.0, -(nz - 1.0)))
+    return spec, fixed[order].copy(), potential[order].copy()
+
+
+def settings(symmetry: str) -> dict:
+    result = relax_solver.get_solver_settings(configparser.ConfigParser())
+    result.update(tolerance=TOLERANCE, multigrid_tolerance=TOLERANCE, max_iterations=100000, symmetry=symmetry,
+                  workers=2)
+    return result
+
+
+@pytest.fixture(scope='module')
+def reference():
+    """Full-height SOR solve of the mirrored problem, cut to the upper half"""
+    _, fixed, potential = half_case()
+    spec, full_fixed, full_potential = full_case(fixed, potential)
+    solved, _ = relax_solver.solve_potential(full_potential, full_fixed, spec.spacing, settings('off'), 'sor')
+    return solved[fixed.shape[0] - 1:]
+
+
+def test_default_symmetry_is_auto():
+    assert relax_solver.get_solver_settings(configparser.ConfigParser())['symmetry'] == 'auto'
+
+
+@pytest.mark.parametrize('method', ['sor', 'multigrid', 'parallel'])
+def test_grid_starting_at_median_plane_matches_mirrored_solve(method, reference):
+    spec, fixed, potential = half_case()
+    solved, stats = relax_solver.solve_grid(potential, fixed, spec, settings('auto'), method)
+    assert stats['symmetric']
+    assert np.abs(solved - reference).max() < MATCH_TOLERANCE
+
+
+@pytest.mark.parametrize('method', ['sor', 'multigrid', 'parallel'])
+def test_straddling_grid_matches_mirrored_solve(method, reference):
+    _, fixed, potential = half_case()
+    spec, full_fixed, full_potential = full_case(fixed, potential)
+    electrodes = full_fixed.copy()
+    solved, stats = relax_solver.solve_grid(full_potential, full_fixed, spec, settings('auto'), method)
+    assert stats['symmetric']
+    assert solved is full_potential
+    assert np.array_equal(full_fixed, electrodes)
+    assert np.abs(solved[fixed.shape[0] - 1:] - reference).max() < MATCH_TOLERANCE
+    assert np.array_equal(solved[:fixed.shape[0]], solved[fixed.shape[0] - 1:][::-1])
+
+
+def test_slab_matches_mirrored_solve(reference, tmp_path):
+    spec, fixed, potential = half_case()
+    k, j, i = np.nonzero(fixed)
+    dat_path = str(tmp_path / relax3d_io.RELAX3D_DAT)
+    relax3d_io.write_electrodes(dat_path, np.column_stack((i + 1, j + 1, k + 1, potential[fixed])))
+    # A budget of a few planes per slab, so the symmetry plane leaves the window during a pass
+    slab_settings = {'memory_budget': 60000, 'sweeps': 4, 'work_dir': str(tmp_path)}
+    solved, stats = slab_solver.solve_relax3d_dat_out_of_core(dat_path, spec, settings('auto'), slab_settings, 'L')
+    assert stats['symmetric']
+    assert np.abs(np.asarray(solved) - reference).max() < MATCH_TOLERANCE
+    del solved
+    slab_solver.remove_work_files(str(tmp_path), 'L')
+
+
+def test_grounded_median_plane_is_refused():
+    spec, fixed, potential = half_case()
+    with pytest.raises(ValueError, match='OPT 1'):
+        relax_solver.solve_grid(potential, fixed, spec, settings('off'), 'sor')
+    with pytest.raises(ValueError, match='OPT 1'):
+        slab_solver.mirror_bottom_face(spec, settings('off'))